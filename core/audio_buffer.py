@@ -0,0 +1,105 @@
+import threading
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Кольцевой буфер для захвата микрофона:
+    - память выделяется один раз (слоты по block_samples отсчётов int16)
+    - callback звуковой карты копирует блок прямо в свободный слот,
+      без создания bytes и без неограниченной очереди
+    - потребитель получает memoryview на слот (без копирования)
+    - при переполнении новые блоки отбрасываются и учитываются в статистике,
+      память не растёт
+
+    Слот, отданный через read(), не перезаписывается до следующего read():
+    один слот всегда остаётся за потребителем.
+    """
+
+    def __init__(self, block_samples: int, capacity_blocks: int):
+        # +1 слот всегда зарезервирован под блок, который сейчас читается
+        self.block_samples = int(block_samples)
+        self.n_slots = max(2, int(capacity_blocks)) + 1
+        self._data = np.zeros((self.n_slots, self.block_samples), dtype=np.int16)
+        self._lengths = np.zeros(self.n_slots, dtype=np.int32)
+
+        self._cond = threading.Condition()
+        self._head = 0        # куда пишем следующий блок
+        self._tail = 0        # откуда читаем следующий блок
+        self._count = 0       # непрочитанных блоков
+
+        # Статистика
+        self.overflows = 0       # сколько раз буфер был полон
+        self.dropped_blocks = 0  # сколько блоков не поместилось
+        self.input_overflows = 0 # переполнения на стороне драйвера (status)
+        self.max_fill = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.n_slots - 1
+
+    def __len__(self) -> int:
+        with self._cond:
+            return self._count
+
+    def write(self, indata, input_overflow: bool = False):
+        """Копирует блок из callback в следующий свободный слот."""
+        samples = np.frombuffer(indata, dtype=np.int16)
+        n = min(samples.size, self.block_samples)
+
+        with self._cond:
+            if input_overflow:
+                self.input_overflows += 1
+
+            if self._count >= self.capacity:
+                # потребитель отстал (например, ждёт LLM) — блок теряется,
+                # а слот, который сейчас читается, не трогаем
+                self.overflows += 1
+                self.dropped_blocks += 1
+                return
+
+            slot = self._head
+            self._data[slot, :n] = samples[:n]
+            self._lengths[slot] = n
+            self._head = self._next(slot)
+            self._count += 1
+            if self._count > self.max_fill:
+                self.max_fill = self._count
+            self._cond.notify()
+
+    def read(self, timeout: float = None):
+        """
+        Возвращает memoryview на следующий блок (int16, little-endian)
+        или None по таймауту. Предыдущий прочитанный слот освобождается.
+        """
+        with self._cond:
+            if not self._count and not self._cond.wait_for(lambda: self._count > 0, timeout):
+                return None
+
+            slot = self._tail
+            self._tail = self._next(slot)
+            self._count -= 1
+            return memoryview(self._data[slot, : self._lengths[slot]]).cast("B")
+
+    def clear(self):
+        """Выбрасывает все непрочитанные блоки."""
+        with self._cond:
+            self._tail = self._head
+            self._count = 0
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "capacity_blocks": self.capacity,
+                "block_samples": self.block_samples,
+                "queued_blocks": self._count,
+                "max_fill": self.max_fill,
+                "overflows": self.overflows,
+                "dropped_blocks": self.dropped_blocks,
+                "input_overflows": self.input_overflows,
+            }
+
+    def _next(self, slot: int) -> int:
+        slot += 1
+        return 0 if slot == self.n_slots else slot
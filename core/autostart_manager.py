@@ -17,6 +17,58 @@ DEFAULT_CONFIG = {
     "hotkey": "Ctrl+Shift+Space",
     "llm_primary": "mistral-7b-instruct-v0.3.Q4_K_M.gguf",
     "llm_secondary": "meta-llama-3-8b-instruct.Q4_K_M.gguf",
+    "llm_generation": {
+        "max_tokens": 256,
+        "temperature": 0.7,
+        "top_p": 0.95
+    },
+    "conversation_memory": True,
+    "response_cache": {
+        "enabled": False,
+        "max_entries": 512,
+        "ttl_seconds": 604800,
+        "cache_sampled": False,
+        "persistent": True,
+        "max_disk_entries": 20000
+    },
+    "llm_prompt_cache": True,
+    "llm_runtime": {
+        "auto_tune": True,
+        "n_ctx": 2048,
+        "n_threads": None,
+        "n_threads_batch": None,
+        "n_batch": None,
+        "use_mmap": None,
+        "use_mlock": None
+    },
+    "llm_standby": {
+        "enabled": True,
+        "min_free_mb": 2048,
+        "check_interval": 60,
+        "failover_wait_seconds": 0,
+        "failed_cooldown_seconds": 600
+    },
+    "llm_speculative": {
+        "enabled": False,
+        "mode": "prompt_lookup",
+        "draft_model": "",
+        "num_pred_tokens": 10,
+        "max_ngram_size": 2,
+        "draft_tokens": 4
+    },
+    "llm_scheduler": {
+        "enabled": True,
+        "max_queue": {"interactive": 4, "vip": 8, "background": 16},
+        "deadline_seconds": {"interactive": 30, "vip": 60, "background": 300},
+        "aging_seconds": 20
+    },
+    "cascade": {
+        "enabled": True,
+        "small_model": "",
+        "small_max_score": 0.45,
+        "min_confidence": 0.55,
+        "small_max_tokens": 96
+    },
     "languages_supported": {
         "ru": "vosk-model-ru-0.42",
         "uz": "vosk-model-small-uz-0.22",
@@ -25,6 +77,51 @@ DEFAULT_CONFIG = {
         "cn": "vosk-model-cn-0.22"
     },
     "auto_language_detect": True,
+    "intents_path": "config/intents.json",
+    "language_id": {
+        "candidates": ["ru", "uz", "en"],
+        "pin_confidence": 0.8,
+        "drop_confidence": 0.6,
+        "text_tie_margin": 0.05,
+        "max_workers": 0
+    },
+    "stt_pool": {
+        "memory_budget_mb": 6144,
+        "preload": []
+    },
+    "audio": {
+        "block_ms": 30,
+        "buffer_seconds": 10
+    },
+    "vad": {
+        "enabled": True,
+        "frame_ms": 30,
+        "energy_threshold": 0.01,
+        "noise_ratio": 3.0,
+        "zcr_max": 0.35,
+        "min_speech_ms": 90,
+        "hangover_ms": 600,
+        "padding_ms": 300
+    },
+    "barge_in": {
+        "enabled": False,
+        "min_words": 2,
+        "echo_guard_ms": 800
+    },
+    "tts_cache": {
+        "enabled": True,
+        "path": "data/cache/tts",
+        "max_disk_mb": 128,
+        "max_memory_mb": 16,
+        "max_text_chars": 300,
+        "prerender": True
+    },
+    "server": {
+        "host": "127.0.0.1",
+        "port": 8765,
+        "components": ["stt", "tts", "nlp"],
+        "wait_ready_seconds": 0
+    },
     "auto_repair_config": True,
     "auto_start_listening": True,
     "internet_access_button": True,
@@ -0,0 +1,256 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from core.conversation import CHAT_FORMATS, chat_format_for
+from core.language_id import LANGUAGE_ID
+
+
+class CascadeDecision:
+    """Куда отправить реплику и почему."""
+
+    def __init__(self, tier: str, score: float, language: str, features: dict, reply: str = None):
+        self.tier = tier          # "template" | "small" | "large"
+        self.score = score        # сложность 0..1
+        self.language = language
+        self.features = features
+        self.reply = reply        # готовый ответ для tier == "template"
+
+
+class CascadeRouter:
+    """
+    Каскад по стоимости ответа:
+    - template — короткие реплики (привет, спасибо, как дела) по шаблону, без LLM
+    - small    — несложные вопросы — маленькой GGUF-модели (cascade.small_model)
+    - large    — всё остальное и всё, что зависит от истории, — основной LLM
+    Ответ маленькой модели с низкой уверенностью (средняя вероятность токенов,
+    обрезка по длине) переходит к большой. Каждое решение и задержка по
+    уровням пишутся в logs/cascade.jsonl — по ним подбираются пороги.
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        "small_model": "",
+        "small_max_score": 0.45,
+        "min_confidence": 0.55,
+        "small_max_tokens": 96,
+        "log_path": os.path.join("logs", "cascade.jsonl"),
+    }
+
+    TEMPLATES = {
+        "greeting": {
+            "ru": ["Привет! Чем могу помочь?", "Здравствуйте! Слушаю вас."],
+            "uz": ["Salom! Qanday yordam bera olaman?"],
+            "en": ["Hi! How can I help?"],
+        },
+        "thanks": {
+            "ru": ["Пожалуйста!", "Всегда рад помочь."],
+            "uz": ["Arzimaydi!"],
+            "en": ["You're welcome!"],
+        },
+        "how_are_you": {
+            "ru": ["Всё отлично, спасибо! А у вас?", "Хорошо! Чем займёмся?"],
+            "uz": ["Yaxshi, rahmat! O'zingiz-chi?"],
+            "en": ["I'm doing great, thanks! And you?"],
+        },
+        "bye": {
+            "ru": ["До встречи!", "Пока! Зовите, если понадоблюсь."],
+            "uz": ["Xayr! Ko'rishguncha."],
+            "en": ["Goodbye! Talk to you later."],
+        },
+        "ack": {
+            "ru": ["Хорошо."],
+            "uz": ["Yaxshi."],
+            "en": ["Okay."],
+        },
+    }
+
+    # признаки сложного запроса: рассуждение, генерация текста, сравнение
+    HARD_MARKERS = re.compile(
+        r"\b(почему|зачем|объясни|расскажи подробно|сравни|докажи|напиши|составь|переведи|"
+        r"посчитай|вычисли|код|программ\w*|план|анализ\w*|"
+        r"nima uchun|nega|tushuntir|yozib ber|tarjima|"
+        r"why|explain|compare|write|translate|calculate|analy[sz]e|code|plan)\b",
+        re.IGNORECASE,
+    )
+    QUESTION_MARKERS = re.compile(
+        r"\b(что|кто|где|когда|сколько|какой|какая|какие|как|ли|"
+        r"nima|kim|qayer\w*|qachon|qancha|qanday|"
+        r"what|who|where|when|how|which)\b|\?",
+        re.IGNORECASE,
+    )
+    # ссылки на предыдущие реплики — без истории диалога не ответить
+    ANAPHORA = re.compile(
+        r"\b(это|этот|эта|эти|он|она|оно|они|его|её|их|там|тогда|ещё|еще|а если|"
+        r"bu|u|ular|yana|"
+        r"it|this|that|they|them|those|also|more)\b",
+        re.IGNORECASE,
+    )
+
+    def __init__(self, config: dict = None, intent_router=None):
+        settings = dict(self.DEFAULTS)
+        settings.update((config or {}).get("cascade", {}) or {})
+        self.settings = settings
+
+        self.enabled = bool(settings["enabled"])
+        self.small_max_score = float(settings["small_max_score"])
+        self.min_confidence = float(settings["min_confidence"])
+        self.intent_router = intent_router
+        self.small = None  # SmallModelTier, грузится в фоне
+
+        self._log_path = settings["log_path"]
+        self._log_lock = threading.Lock()
+        self._rotation = {}
+
+    # -----------------------------
+    # Решение
+    # -----------------------------
+    def route(self, text: str, history_turns: int = 0) -> CascadeDecision:
+        language = self.guess_language(text)
+        words = text.split()
+        features = {
+            "words": len(words),
+            "question": bool(self.QUESTION_MARKERS.search(text)),
+            "hard": bool(self.HARD_MARKERS.search(text)),
+            "anaphora": bool(self.ANAPHORA.search(text)),
+            "history": history_turns,
+            "digits": bool(re.search(r"\d", text)),
+        }
+
+        if not self.enabled:
+            return CascadeDecision("large", 1.0, language, features)
+
+        category = self.intent_router.detect_smalltalk(text) if self.intent_router else None
+        if category:
+            features["smalltalk"] = category
+            return CascadeDecision("template", 0.0, language, features, self._template(category, language))
+
+        score = self.score(features, language)
+        small_ready = self.small is not None and self.small.ready
+        tier = "small" if small_ready and score <= self.small_max_score else "large"
+        return CascadeDecision(tier, score, language, features)
+
+    @staticmethod
+    def score(features: dict, language: str) -> float:
+        """Оценка сложности 0..1 (чем больше, тем нужнее большая модель)."""
+        score = min(features["words"] / 40.0, 0.4)
+        if features["hard"]:
+            score += 0.45
+        elif features["question"]:
+            score += 0.1
+        if features["digits"]:
+            score += 0.1
+        # продолжение разговора: маленькая модель истории не видит
+        if features["history"] and features["anaphora"]:
+            score += 0.5
+        elif features["history"]:
+            score += 0.1
+        # маленькие модели хуже всего с узбекским и редкими письменностями
+        if language not in ("ru", "en"):
+            score += 0.2
+        return round(min(score, 1.0), 3)
+
+    @staticmethod
+    def guess_language(text: str) -> str:
+        return LANGUAGE_ID.detect(text, default="en")
+
+    def _template(self, category: str, language: str) -> str:
+        variants = self.TEMPLATES[category].get(language) or self.TEMPLATES[category]["ru"]
+        index = self._rotation.get((category, language), 0)
+        self._rotation[(category, language)] = index + 1
+        return variants[index % len(variants)]
+
+    # -----------------------------
+    # Лог решений
+    # -----------------------------
+    def log(self, decision: CascadeDecision, final_tier: str, latency_ms: dict, confidence: float = None):
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "tier": decision.tier,
+            "final_tier": final_tier,
+            "escalated": final_tier != decision.tier,
+            "score": decision.score,
+            "language": decision.language,
+            "features": decision.features,
+            "confidence": None if confidence is None else round(confidence, 3),
+            "latency_ms": {k: round(v, 1) for k, v in latency_ms.items()},
+        }
+        try:
+            with self._log_lock:
+                os.makedirs(os.path.dirname(self._log_path) or ".", exist_ok=True)
+                with open(self._log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"⚠️ Не удалось записать лог каскада: {e}")
+
+
+class ConfidenceTracker:
+    """
+    logits_processor для llama.cpp: запоминает распределение на каждом шаге
+    и на следующем берёт вероятность реально выбранного токена.
+    """
+
+    def __init__(self):
+        self.probs = []
+        self._prev = None
+
+    def __call__(self, input_ids, scores):
+        if self._prev is not None and len(input_ids):
+            self.probs.append(float(self._prev[int(input_ids[-1])]))
+        shifted = np.exp(scores - np.max(scores))
+        self._prev = shifted / shifted.sum()
+        return scores
+
+    def confidence(self) -> float:
+        return float(np.mean(self.probs)) if self.probs else 0.0
+
+
+class SmallModelTier:
+    """Маленькая GGUF-модель для несложных вопросов (без истории диалога)."""
+
+    def __init__(self, model_path: str, loader, system_prompt: str, max_tokens: int = 96, temperature: float = 0.7, top_p: float = 0.95):
+        self.model_path = model_path
+        self.name = os.path.basename(model_path)
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.format = CHAT_FORMATS[chat_format_for(self.name)]
+        self.lock = threading.Lock()
+        self.llm = None
+        self.ready = False
+        self._loader = loader
+
+    def load(self):
+        print(f"🧠 Загружаю малую модель каскада: {self.model_path}")
+        self.llm = self._loader(self.model_path)
+        self.ready = True
+
+    def answer(self, text: str):
+        """Возвращает (ответ, уверенность 0..1)."""
+        prompt = self.format["prefix"].format(system=self.system_prompt)
+        prompt += self.format["turn"].format(text=text.strip())
+        tracker = ConfidenceTracker()
+        with self.lock:
+            tokens = self.llm.tokenize(prompt.encode("utf-8"), add_bos=False, special=True)
+            result = self.llm.create_completion(
+                tokens,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                top_p=self.top_p,
+                stop=self.format["stop"],
+                logits_processor=tracker,
+            )
+        choice = result["choices"][0]
+        response = choice["text"].strip()
+        confidence = tracker.confidence()
+        # пусто или обрезано по длине — вопрос явно не для малой модели
+        if not response:
+            confidence = 0.0
+        elif choice.get("finish_reason") == "length":
+            confidence *= 0.5
+        return response, confidence
@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class ComponentLoader:
+    """
+    Фоновая загрузка тяжёлых компонентов (STT, TTS, LLM):
+    - каждый компонент создаётся своей фабрикой в отдельном потоке,
+      поэтому окно появляется сразу, а модели грузятся параллельно
+    - тяжёлые библиотеки импортируются внутри фабрик, а не при старте
+    - статус каждого компонента: pending → loading → ready / error
+    - on_status(name, status, detail) вызывается из фонового потока
+    """
+
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    ERROR = "error"
+
+    def __init__(self, on_status: Optional[Callable[[str, str, str], None]] = None):
+        self.on_status = on_status
+        self._factories = {}
+        self._objects = {}
+        self._status = {}
+        self._errors = {}
+        self._timings = {}
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, factory: Callable[[], object]):
+        with self._lock:
+            self._factories[name] = factory
+            self._status[name] = self.PENDING
+            self._events[name] = threading.Event()
+
+    def start(self):
+        """Запускает загрузку всех добавленных компонентов в фоне."""
+        for name in list(self._factories):
+            if self._status.get(name) != self.PENDING:
+                continue
+            thread = threading.Thread(target=self._load, args=(name,), name=f"load-{name}", daemon=True)
+            thread.start()
+
+    def get(self, name: str, timeout: float = None):
+        """Возвращает компонент, при необходимости дожидаясь загрузки (None — ошибка/таймаут)."""
+        event = self._events.get(name)
+        if event is None or not event.wait(timeout):
+            return None
+        return self._objects.get(name)
+
+    def is_ready(self, name: str) -> bool:
+        return self._status.get(name) == self.READY
+
+    def status(self, name: str) -> str:
+        return self._status.get(name, self.PENDING)
+
+    def error(self, name: str):
+        return self._errors.get(name)
+
+    def statuses(self) -> dict:
+        with self._lock:
+            return dict(self._status)
+
+    def timings(self) -> dict:
+        """Время загрузки каждого компонента, сек."""
+        with self._lock:
+            return dict(self._timings)
+
+    def _load(self, name: str):
+        self._set_status(name, self.LOADING, "")
+        started = time.perf_counter()
+        try:
+            obj = self._factories[name]()
+        except Exception as e:
+            with self._lock:
+                self._errors[name] = e
+                self._timings[name] = time.perf_counter() - started
+            self._events[name].set()
+            self._set_status(name, self.ERROR, str(e))
+            return
+
+        with self._lock:
+            self._objects[name] = obj
+            self._timings[name] = time.perf_counter() - started
+        self._events[name].set()
+        self._set_status(name, self.READY, "")
+
+    def _set_status(self, name: str, status: str, detail: str):
+        with self._lock:
+            self._status[name] = status
+        if self.on_status:
+            try:
+                self.on_status(name, status, detail)
+            except Exception:
+                pass
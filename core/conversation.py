@@ -0,0 +1,180 @@
+import threading
+import time
+
+
+# Форматы промпта для многоходового диалога.
+# prefix — начало контекста (системная часть), turn — реплика пользователя
+# с заголовком ответа ассистента, end — закрытие ответа ассистента.
+CHAT_FORMATS = {
+    "llama-3": {
+        "prefix": "<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n\n{system}<|eot_id|>",
+        "turn": "<|start_header_id|>user<|end_header_id|>\n\n{text}<|eot_id|>"
+                "<|start_header_id|>assistant<|end_header_id|>\n\n",
+        "end": "<|eot_id|>",
+        "stop": ["<|eot_id|>"],
+    },
+    "mistral": {
+        "prefix": "<s>",
+        "turn": "[INST] {text} [/INST]",
+        "end": "</s>",
+        "stop": ["</s>"],
+    },
+    "plain": {
+        "prefix": "{system}\n",
+        "turn": "\nПользователь: {text}\nАссистент:",
+        "end": "\n",
+        "stop": ["\nПользователь:"],
+    },
+}
+
+
+def chat_format_for(model_name: str) -> str:
+    name = model_name.lower()
+    if "mistral" in name:
+        return "mistral"
+    if "llama" in name:
+        return "llama-3"
+    return "plain"
+
+
+class ConversationSession:
+    """
+    Диалог с памятью поверх одного экземпляра llama.cpp:
+    - хранит токены всей переписки; в каждом ходе к KV-кэшу
+      досчитываются только новые токены (совпадающий префикс переиспользуется)
+    - при приближении к n_ctx выкидывает самые старые ходы и сдвигает
+      оставшийся KV-кэш на месте, без полного пересчёта
+    - системная часть (prefix) никогда не выкидывается
+    - новый ход попадает в историю только в commit(): если генерация
+      упала, история остаётся прежней (без реплики без ответа)
+    - ходы, на которые ответила не LLM (шаблон, малая модель), добавляются
+      текстом (add_text_turn) и токенизируются при следующем build_prompt
+    """
+
+    def __init__(self, session_id: str, chat_format: str, system_prompt: str):
+        self.session_id = session_id
+        self.chat_format = chat_format
+        self.system_prompt = system_prompt
+        self.format = CHAT_FORMATS[chat_format]
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Очищает историю (например, по просьбе пользователя)."""
+        self.tokens = []        # вся переписка в токенах
+        self.prefix_len = 0     # длина системной части
+        self.turn_starts = []   # индексы начала каждого хода в self.tokens
+        self.turns = 0
+        self.slides = 0
+        self.pending = None     # (промпт хода, начало хода) до commit()
+        self.text_turns = []    # [(реплика, ответ)] ещё не в self.tokens
+        self.last_used = time.monotonic()
+
+    # -----------------------------
+    # Ход диалога
+    # -----------------------------
+    def add_text_turn(self, text: str, reply: str):
+        """Ход без генерации LLM: в KV не попадает, но виден в истории."""
+        self.text_turns.append((text.strip(), reply.strip()))
+        self.turns += 1
+        self.last_used = time.monotonic()
+
+    def build_prompt(self, llm, text: str, max_tokens: int) -> list:
+        """
+        Возвращает токены промпта для нового хода (с учётом окна контекста).
+        Сам ход запоминается только в commit().
+        """
+        fmt = self.format
+
+        if not self.tokens:
+            prefix = fmt["prefix"].format(system=self.system_prompt)
+            self.tokens = llm.tokenize(prefix.encode("utf-8"), add_bos=False, special=True)
+            self.prefix_len = len(self.tokens)
+
+        # ходы шаблона / малой модели уже состоялись — переводим в токены
+        for user_text, reply in self.text_turns:
+            turn = fmt["turn"].format(text=user_text) + reply
+            if len(self.tokens) > self.prefix_len:
+                turn = fmt["end"] + turn
+            self.turn_starts.append(len(self.tokens))
+            self.tokens = self.tokens + llm.tokenize(turn.encode("utf-8"), add_bos=False, special=True)
+        self.text_turns = []
+
+        # предыдущий ответ ассистента закрываем маркером конца
+        turn = fmt["turn"].format(text=text.strip())
+        if len(self.tokens) > self.prefix_len:
+            turn = fmt["end"] + turn
+        new_tokens = llm.tokenize(turn.encode("utf-8"), add_bos=False, special=True)
+
+        self._fit(llm, len(new_tokens) + max_tokens)
+
+        prompt = self.tokens + new_tokens
+        self.pending = (prompt, len(self.tokens))
+        self.last_used = time.monotonic()
+        return list(prompt)
+
+    def commit(self, llm):
+        """
+        После генерации запоминаем ход и то, что реально лежит в KV-кэше:
+        промпт + сгенерированные токены (без повторной токенизации текста).
+        """
+        if self.pending is None:
+            return
+        prompt, start = self.pending
+        self.pending = None
+        n = int(llm.n_tokens)
+        evaluated = [int(t) for t in llm.input_ids[:n]]
+        self.tokens = evaluated if evaluated[: len(prompt)] == prompt else prompt
+        self.turn_starts.append(start)
+        self.turns += 1
+
+    # -----------------------------
+    # Окно контекста
+    # -----------------------------
+    def _fit(self, llm, needed: int):
+        """Выкидывает старые ходы, пока новый ход не помещается в n_ctx."""
+        n_ctx = llm.n_ctx()
+        overflow = len(self.tokens) + needed - n_ctx
+        if overflow <= 0:
+            return
+
+        # сколько целых ходов нужно выкинуть
+        drop = 0
+        cut = self.prefix_len
+        while drop < len(self.turn_starts) and cut - self.prefix_len < overflow:
+            drop += 1
+            cut = self.turn_starts[drop] if drop < len(self.turn_starts) else len(self.tokens)
+
+        removed = cut - self.prefix_len
+        if removed <= 0:
+            return
+
+        self._shift_kv(llm, self.prefix_len, cut)
+
+        self.tokens = self.tokens[: self.prefix_len] + self.tokens[cut:]
+        self.turn_starts = [s - removed for s in self.turn_starts[drop:]]
+        self.slides += 1
+
+    def _shift_kv(self, llm, start: int, cut: int):
+        """
+        Удаляет из KV позиции [start, cut) и сдвигает хвост влево
+        (RoPE пересчитывается llama.cpp при следующем decode).
+        Если в KV сейчас другой диалог — просто ничего не делаем:
+        совпадающий префикс будет пересчитан при следующем ходе.
+        """
+        n = int(llm.n_tokens)
+        if n < cut or [int(t) for t in llm.input_ids[:n]] != self.tokens[:n]:
+            return
+
+        removed = cut - start
+        try:
+            llm._ctx.kv_cache_seq_rm(0, start, cut)
+            llm._ctx.kv_cache_seq_shift(0, cut, n, -removed)
+        except Exception as e:
+            print(f"⚠️ Сдвиг KV-кэша не удался, контекст будет пересчитан: {e}")
+            llm.n_tokens = start
+            return
+
+        tail = llm.input_ids[cut:n].copy()
+        llm.input_ids[start : n - removed] = tail
+        llm.n_tokens = n - removed
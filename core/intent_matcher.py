@@ -0,0 +1,168 @@
+import re
+import unicodedata
+from collections import deque
+
+
+class IntentMatch:
+    """Результат сопоставления: намерение, навык, оценка и что именно совпало."""
+
+    def __init__(self, intent: str, skill: str, score: float, pattern: str, language: str, start: int, end: int):
+        self.intent = intent
+        self.skill = skill
+        self.score = score
+        self.pattern = pattern
+        self.language = language
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"IntentMatch({self.intent}/{self.skill}, score={self.score}, pattern={self.pattern!r})"
+
+
+class _Pattern:
+    __slots__ = ("text", "intent", "skill", "language", "weight", "stem", "exact")
+
+    def __init__(self, text, intent, skill, language, weight, stem, exact):
+        self.text = text
+        self.intent = intent
+        self.skill = skill
+        self.language = language
+        self.weight = weight
+        self.stem = stem
+        self.exact = exact
+
+
+class IntentMatcher:
+    """
+    Автомат Ахо–Корасик по всем шаблонам намерений сразу:
+    - строится один раз; поиск — один проход по тексту, время линейно
+      от длины текста (плюс число совпадений) и не зависит от числа шаблонов
+    - совпадение только по границам слов: «удали» не найдётся в «удалить»,
+      если шаблон не стем
+    - стем: шаблон со звёздочкой в конце («запуст*») совпадает с любым
+      окончанием слова («запусти», «запустите»)
+    - exact: шаблон должен покрывать всю реплику (короткие фразы вроде «спасибо»)
+    - иероглифы считаются отдельными «словами» (в китайском нет пробелов)
+    """
+
+    _APOSTROPHES = re.compile(r"[ʻʼ‘’`]")
+    _PUNCT = re.compile(r"[^\w\s']", re.UNICODE)
+
+    def __init__(self):
+        self._goto = [{}]      # узел -> {символ: узел}
+        self._fail = [0]
+        self._out = [[]]       # узел -> индексы шаблонов, оканчивающихся здесь
+        self._patterns = []
+        self._built = False
+
+    # -----------------------------
+    # Построение
+    # -----------------------------
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        text = unicodedata.normalize("NFKC", text).lower().replace("ё", "е")
+        text = cls._APOSTROPHES.sub("'", text)
+        text = cls._PUNCT.sub(" ", text)
+        return " ".join(text.split())
+
+    def add(self, pattern: str, intent: str, skill: str = None, language: str = "", weight: float = 1.0, exact: bool = False):
+        stem = pattern.endswith("*")
+        text = self.normalize(pattern.rstrip("*"))
+        if not text:
+            return
+        node = 0
+        for ch in text:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(len(self._patterns))
+        self._patterns.append(_Pattern(text, intent, skill, language, float(weight), stem, exact))
+        self._built = False
+
+    def build(self):
+        """Ссылки неудач (BFS); вызывается автоматически перед первым поиском."""
+        queue = deque()
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            queue.append(node)
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                # выходы суффиксов — сразу в узел, чтобы поиск не ходил по цепочке
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def __len__(self):
+        return len(self._patterns)
+
+    # -----------------------------
+    # Поиск
+    # -----------------------------
+    def find_all(self, text: str, normalized: bool = False) -> list:
+        """Все совпадения по границам слов: список IntentMatch."""
+        if not self._built:
+            self.build()
+        if not normalized:
+            text = self.normalize(text)
+
+        matches = []
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        node = 0
+        length = len(text)
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+            for index in out[node]:
+                pattern = patterns[index]
+                start = i - len(pattern.text) + 1
+                if start > 0 and self._is_word(text[start - 1]) and self._is_word(pattern.text[0]):
+                    continue
+                end = i + 1
+                if pattern.stem:
+                    while end < length and self._is_word(text[end]):
+                        end += 1
+                elif end < length and self._is_word(text[end]) and self._is_word(pattern.text[-1]):
+                    continue
+                if pattern.exact and (start != 0 or end != length):
+                    continue
+                matches.append(self._score(pattern, start, end, length))
+        return matches
+
+    def match(self, text: str, intent: str = None, normalized: bool = False, at_start: bool = False):
+        """Лучшее совпадение (по оценке, затем по длине) или None; at_start — только с начала текста."""
+        best = None
+        for m in self.find_all(text, normalized):
+            if intent is not None and m.intent != intent:
+                continue
+            if at_start and m.start != 0:
+                continue
+            if best is None or (m.score, m.end - m.start) > (best.score, best.end - best.start):
+                best = m
+        return best
+
+    @staticmethod
+    def _score(pattern: _Pattern, start: int, end: int, length: int) -> IntentMatch:
+        # чем большую часть реплики покрывает шаблон, тем увереннее совпадение
+        coverage = (end - start) / max(length, 1)
+        score = round(pattern.weight * (0.5 + 0.5 * coverage), 3)
+        return IntentMatch(pattern.intent, pattern.skill, score, pattern.text, pattern.language, start, end)
+
+    @staticmethod
+    def _is_word(ch: str) -> bool:
+        if "\u4e00" <= ch <= "\u9fff":
+            return False  # иероглиф — сам по себе граница
+        return ch.isalnum() or ch == "'"
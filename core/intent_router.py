@@ -1,27 +1,117 @@
-﻿class IntentRouter:
+﻿import json
+import os
+import re
+
+from core.intent_matcher import IntentMatcher
+
+
+class IntentRouter:
     """
-    Простейший роутер намерений:
-    - 'command' — если фраза похожа на команду
+    Роутер намерений на скомпилированном автомате (IntentMatcher):
+    - 'command' — если фраза похожа на команду (match() даёт и навык):
+      шаблон команды должен стоять в начале реплики (императив), после
+      вежливых слов вроде «пожалуйста» / «can you»; вопросы («почему он
+      удалил файл?», «запустил ли ты») командами не считаются
     - 'chat'    — обычный разговор
+    - detect_smalltalk — короткие реплики (привет, спасибо, как дела...),
+      на которые можно ответить шаблоном без LLM
+    Шаблоны берутся из config/intents.json (путь — intents_path в настройках)
+    только для языков из languages_supported и компилируются один раз.
+    Без файла шаблонов роутер не создаётся.
     """
 
-    def detect_intent(self, text: str) -> str:
+    _FILLERS = re.compile(r"\b(ассистент|assistant|ну|а|и|тебе|вам|please|пожалуйста)\b")
+
+    # вежливое начало просьбы: после него команда всё ещё в начале реплики
+    _COMMAND_PREFIX = re.compile(
+        r"^(?:(?:ассистент|assistant|пожалуйста|please|iltimos|ну|а|и|давай|можешь|можете"
+        r"|can you|could you|would you|hey)\s+|请\s*)+"
+    )
+    # признаки вопроса: знак вопроса, частица «ли», вопросительное слово в начале
+    _QUESTION_MARKS = ("?", "؟", "？", "吗")
+    _QUESTION_PARTICLES = {"ли"}
+    _QUESTION_WORDS = {
+        "почему", "зачем", "как", "что", "когда", "где", "кто", "какой", "какая", "какие", "сколько", "разве",
+        "nega", "nima", "nimaga", "qachon", "qayerda", "qanday", "kim",
+        "why", "how", "what", "when", "where", "who", "which", "is", "are", "do", "does", "did", "was", "were",
+        "لماذا", "هل", "كيف", "ماذا", "متى", "أين",
+    }
+
+    def __init__(self, config: dict = None):
+        config = config or {}
+        self.intents_path = config.get("intents_path", os.path.join("config", "intents.json"))
+        languages = config.get("languages_supported") or {}
+        self.languages = set(languages) if languages else None  # None — все языки
+
+        self.matcher = IntentMatcher()
+        for entry in self._load_intents():
+            for language, patterns in (entry.get("patterns") or {}).items():
+                if self.languages is not None and language not in self.languages:
+                    continue
+                for pattern in patterns:
+                    self.matcher.add(
+                        pattern,
+                        entry["intent"],
+                        skill=entry.get("skill"),
+                        language=language,
+                        weight=entry.get("weight", 1.0),
+                        exact=entry.get("exact", False),
+                    )
+        self.matcher.build()
+
+    def _load_intents(self) -> list:
+        return load_intents(self.intents_path)
+
+    def match(self, text: str):
+        """Лучшее совпадение с командой: IntentMatch (intent, skill, score) или None."""
+        phrase, question = self._command_phrase(text)
+        if not phrase:
+            return None
+        found = self.matcher.match(phrase, intent="command", normalized=True, at_start=True)
+        # вопрос — команда, только если шаблон покрывает его целиком («который час?»)
+        if found is not None and question and found.end < len(phrase):
+            return None
+        return found
+
+    def _command_phrase(self, text: str):
+        """
+        (нормализованная реплика без вежливого начала, похожа ли она на вопрос).
+        С вежливым началом («can you open the folder?») знак вопроса не мешает.
+        """
         if not text:
-            return "chat"
+            return "", False
+        phrase = self.matcher.normalize(text)
+        prefix = self._COMMAND_PREFIX.match(phrase)
+        if prefix:
+            return phrase[prefix.end():], False
+        words = phrase.split()
+        question = (
+            any(mark in text for mark in self._QUESTION_MARKS)
+            or bool(words and words[0] in self._QUESTION_WORDS)
+            or bool(self._QUESTION_PARTICLES.intersection(words))
+        )
+        return phrase, question
 
-        lowered = text.lower()
+    def detect_intent(self, text: str) -> str:
+        return "command" if self.match(text) else "chat"
 
-        command_keywords = [
-            "открой",
-            "запусти",
-            "создай",
-            "удали",
-            "очисти",
-            "покажи папку",
-            "открой папку",
-        ]
+    def detect_smalltalk(self, text: str):
+        """Категория короткой реплики ('greeting', 'thanks', ...) или None."""
+        if not text:
+            return None
+        phrase = " ".join(self._FILLERS.sub(" ", self.matcher.normalize(text)).split())
+        if not phrase or len(phrase.split()) > 5:
+            return None
+        found = self.matcher.match(phrase, intent="smalltalk", normalized=True)
+        return found.skill if found else None
 
-        if any(word in lowered for word in command_keywords):
-            return "command"
 
-        return "chat"
+def load_intents(path: str) -> list:
+    """Записи intents.json; без файла или с ошибкой в нём — исключение."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Нет файла шаблонов намерений: {path}")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["intents"]
+    except (ValueError, KeyError) as e:
+        raise ValueError(f"Ошибка в {path}: {e}") from e
@@ -0,0 +1,189 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+
+
+# Короткие обучающие тексты для символьных n-грамм. Модель компактная
+# (несколько тысяч триграмм) и строится при импорте за миллисекунды;
+# результат детерминирован — никакой случайности, как в langdetect.
+_SEED_TEXT = {
+    "ru": (
+        "привет как дела что ты делаешь сегодня хорошая погода открой папку с документами "
+        "запусти браузер пожалуйста который час сколько времени скажи мне почему небо голубое "
+        "расскажи подробно как это работает спасибо большое до свидания я ничего не услышал "
+        "команда не распознана временные файлы очищены открываю текущую папку это очень интересно "
+        "мне нужно написать письмо другу он живёт в другом городе и часто звонит по вечерам "
+        "давай поговорим о чём нибудь другом где находится ближайшая аптека включи музыку погромче "
+        "выключи компьютер через час напомни мне позвонить маме завтра утром я хочу узнать новости "
+        "какой сегодня день недели переведи это предложение на английский язык посчитай сумму чисел "
+        "у нас в доме живёт кошка она любит спать на солнце дети играют во дворе после школы "
+        "хорошо понятно конечно нет да может быть очень хорошо здравствуйте доброе утро спокойной ночи"
+    ),
+    "uz": (
+        "salom qalaysan ishlar qalay bugun havo yaxshi hujjatlar papkasini och iltimos brauzerni ishga tushir "
+        "soat necha bo'ldi menga ayt nima uchun osmon ko'k batafsil tushuntirib ber bu qanday ishlaydi "
+        "katta rahmat xayr ko'rishguncha men hech narsa eshitmadim buyruq tanilmadi vaqtinchalik fayllar tozalandi "
+        "joriy papkani ochyapman bu juda qiziq menga do'stimga xat yozish kerak u boshqa shaharda yashaydi "
+        "kechqurun tez tez qo'ng'iroq qiladi keling boshqa narsa haqida gaplashaylik eng yaqin dorixona qayerda "
+        "musiqani balandroq qo'y kompyuterni bir soatdan keyin o'chir ertaga ertalab onamga qo'ng'iroq qilishni "
+        "eslatib qo'y men yangiliklarni bilmoqchiman bugun haftaning qaysi kuni bu gapni ingliz tiliga tarjima qil "
+        "sonlar yig'indisini hisobla uyimizda mushuk yashaydi u quyoshda uxlashni yaxshi ko'radi bolalar maktabdan "
+        "keyin hovlida o'ynashadi yaxshi tushunarli albatta yo'q ha balki juda yaxshi assalomu alaykum xayrli tong "
+        "xayrli tun o'zbekiston toshkent shahri chiroyli qanday yordam bera olaman"
+    ),
+    "en": (
+        "hello how are you what are you doing today the weather is nice open the documents folder "
+        "please launch the browser what time is it tell me why the sky is blue explain in detail how this works "
+        "thank you very much goodbye i did not hear anything the command was not recognized temporary files cleared "
+        "opening the current folder this is very interesting i need to write a letter to my friend who lives "
+        "in another city and often calls in the evening let us talk about something else where is the nearest "
+        "pharmacy turn the music up shut down the computer in an hour remind me to call my mother tomorrow morning "
+        "i want to know the news what day of the week is it today translate this sentence into russian "
+        "calculate the sum of the numbers a cat lives in our house she likes to sleep in the sun children play "
+        "in the yard after school okay got it of course no yes maybe very good good morning good night"
+    ),
+}
+
+# письменности, которые однозначно указывают на язык
+_SCRIPT_LANGUAGE = {"arab": "ar", "hani": "cn"}
+# языки, которые модель различает внутри письменности
+_SCRIPT_CANDIDATES = {"cyrl": ("ru", "uz"), "latn": ("uz", "en")}
+# узбекская кириллица: буквы, которых нет в русском
+_UZ_CYRILLIC = set("ўқғҳ")
+# узбекская латиница oʻ/gʻ (после normalize — o'/g') перед строчной буквой:
+# так не пишутся O'Brien/O'Neil; o'clock, g'day, g'night — английские
+_UZ_APOSTROPHE = re.compile(r"[OoGg]'(?!(?:clock|day|night)\b)(?=[a-z])")
+
+
+class LanguageIdentifier:
+    """
+    Быстрое определение языка текста (общее для STT, TTS и NLP):
+    - сначала письменность: арабица → ar, иероглифы → cn
+    - внутри кириллицы и латиницы — символьные триграммы ru/uz/en
+      (наивный Байес со сглаживанием); узбекские буквы ў/қ/ғ/ҳ решают сразу,
+      oʻ/gʻ лишь добавляют узбекскому баллы (в английском бывает o'clock)
+    - одинаковый текст — всегда одинаковый ответ; результаты кэшируются
+    """
+
+    ORDER = 3
+    UZ_APOSTROPHE_BONUS = 0.3  # к среднему логарифму uz за каждое oʻ/gʻ (не больше трёх)
+
+    def __init__(self, languages: list = None, cache_size: int = 2048):
+        self.languages = list(languages or ["ru", "uz", "en", "ar", "cn"])
+        self._profiles = {}
+        for lang, text in _SEED_TEXT.items():
+            counts = Counter(self._ngrams(self.normalize(text)))
+            total = sum(counts.values())
+            vocab = len(counts) + 1
+            self._profiles[lang] = (
+                {gram: math.log((n + 1) / (total + vocab)) for gram, n in counts.items()},
+                math.log(1 / (total + vocab)),
+            )
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Публичное
+    # -----------------------------
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = unicodedata.normalize("NFKC", text).lower().replace("ё", "е")
+        text = re.sub(r"[ʻʼ‘’`]", "'", text)
+        return " ".join(re.sub(r"[^\w\s']", " ", text).split())
+
+    def detect(self, text: str, default: str = "ru") -> str:
+        return self.detect_with_confidence(text, default)[0]
+
+    def detect_with_confidence(self, text: str, default: str = "ru"):
+        """(язык, уверенность 0..1). Пустой текст — (default, 0.0)."""
+        if not text:
+            return default, 0.0
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                return cached
+        result = self._detect(text, default)
+        with self._lock:
+            self._cache[text] = result
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def scores(self, text: str, languages: tuple) -> dict:
+        """Средний логарифм вероятности триграммы для каждого языка."""
+        grams = list(self._ngrams(self.normalize(text)))
+        if not grams:
+            return {lang: 0.0 for lang in languages}
+        result = {}
+        for lang in languages:
+            table, unseen = self._profiles[lang]
+            result[lang] = sum(table.get(g, unseen) for g in grams) / len(grams)
+        return result
+
+    # -----------------------------
+    # Внутреннее
+    # -----------------------------
+    @staticmethod
+    def script(text: str) -> str:
+        """Преобладающая письменность: cyrl / latn / arab / hani или ''."""
+        counts = Counter()
+        for ch in text:
+            if "\u0400" <= ch <= "\u04ff":
+                counts["cyrl"] += 1
+            elif "\u0600" <= ch <= "\u06ff":
+                counts["arab"] += 1
+            elif "\u4e00" <= ch <= "\u9fff":
+                counts["hani"] += 1
+            elif ch.isascii() and ch.isalpha():
+                counts["latn"] += 1
+        return counts.most_common(1)[0][0] if counts else ""
+
+    def _detect(self, text: str, default: str):
+        script = self.script(text)
+        if not script:
+            return default, 0.0
+        if script in _SCRIPT_LANGUAGE:
+            lang = _SCRIPT_LANGUAGE[script]
+            return (lang, 1.0) if lang in self.languages else (default, 0.0)
+
+        candidates = tuple(lang for lang in _SCRIPT_CANDIDATES[script] if lang in self.languages)
+        if not candidates:
+            return default, 0.0
+        if len(candidates) == 1:
+            return candidates[0], 1.0
+
+        lowered = text.lower()
+        if "uz" in candidates:
+            if script == "cyrl" and _UZ_CYRILLIC & set(lowered):
+                return "uz", 1.0
+
+        scores = self.scores(text, candidates)
+        if "uz" in candidates and script == "latn":
+            # регистр важен (O'Brien), поэтому без lower() из normalize
+            apostrophes = re.sub(r"[ʻʼ‘’`]", "'", unicodedata.normalize("NFKC", text))
+            hits = len(_UZ_APOSTROPHE.findall(apostrophes))
+            scores["uz"] += self.UZ_APOSTROPHE_BONUS * min(hits, 3)
+        ranked = sorted(candidates, key=lambda lang: (-scores[lang], candidates.index(lang)))
+        best, second = ranked[0], ranked[1]
+        # разница средних логарифмов → вероятность (логистическая функция)
+        margin = (scores[best] - scores[second]) * max(len(self.normalize(text)), 1) ** 0.5
+        confidence = 1.0 / (1.0 + math.exp(-margin))
+        return best, round(confidence, 3)
+
+    @classmethod
+    def _ngrams(cls, text: str):
+        for word in text.split():
+            padded = f" {word} "
+            if len(padded) < cls.ORDER:
+                yield padded
+                continue
+            for i in range(len(padded) - cls.ORDER + 1):
+                yield padded[i:i + cls.ORDER]
+
+
+# общий экземпляр для всех компонентов
+LANGUAGE_ID = LanguageIdentifier()
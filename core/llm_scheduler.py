@@ -0,0 +1,196 @@
+import collections
+import contextlib
+import itertools
+import threading
+import time
+from typing import Callable, Optional
+
+
+class SchedulerRejected(RuntimeError):
+    """Запрос к LLM не выполнен: очередь переполнена, дедлайн истёк или запрос отменён."""
+
+    QUEUE_FULL = "queue_full"
+    DEADLINE = "deadline"
+    CANCELLED = "cancelled"
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class _Ticket:
+    __slots__ = ("priority", "rank", "seq", "enqueued", "deadline", "started")
+
+    def __init__(self, priority: str, rank: int, seq: int, deadline: Optional[float]):
+        self.priority = priority
+        self.rank = rank
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.deadline = deadline
+        self.started = None
+
+
+class LlmScheduler:
+    """
+    Очередь к общему экземпляру LLM (llama.cpp обслуживает один запрос за раз):
+    - классы приоритета: interactive (голос) → vip (vip_users и владелец)
+      → background (всё остальное)
+    - у каждого класса своя предельная глубина очереди: лишние запросы
+      отклоняются сразу, а не ждут бесконечно
+    - дедлайн ожидания: не успел начаться — SchedulerRejected, модель не тратится
+    - cancelled() проверяется всё время ожидания: брошенные запросы
+      уходят из очереди
+    - старение: за каждые aging_seconds ожидания запрос поднимается на класс
+      выше, поэтому фоновые не голодают вечно
+    - статистика ожидания в очереди по классам (среднее, p95, максимум)
+    """
+
+    PRIORITIES = ("interactive", "vip", "background")
+
+    DEFAULTS = {
+        "enabled": True,
+        "max_queue": {"interactive": 4, "vip": 8, "background": 16},
+        "deadline_seconds": {"interactive": 30, "vip": 60, "background": 300},
+        "aging_seconds": 20,
+    }
+
+    def __init__(self, config: dict = None):
+        config = config or {}
+        settings = dict(self.DEFAULTS)
+        settings.update(config.get("llm_scheduler", {}) or {})
+        self.settings = settings
+
+        self.enabled = bool(settings["enabled"])
+        self.max_queue = {**self.DEFAULTS["max_queue"], **(settings["max_queue"] or {})}
+        self.deadlines = {**self.DEFAULTS["deadline_seconds"], **(settings["deadline_seconds"] or {})}
+        self.aging = float(settings["aging_seconds"] or 0)
+
+        self.owner_id = config.get("owner_id")
+        self.vip_users = set(config.get("vip_users", []) or [])
+
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._running = None
+        self._seq = itertools.count()
+
+        self._counters = {
+            p: {"admitted": 0, "rejected": 0, "timed_out": 0, "cancelled": 0} for p in self.PRIORITIES
+        }
+        self._waits = {p: collections.deque(maxlen=500) for p in self.PRIORITIES}
+
+    # -----------------------------
+    # Классы
+    # -----------------------------
+    def classify(self, priority: str = None, user_id: str = None) -> str:
+        """Явный приоритет важнее; иначе VIP/владелец — vip, остальные — background."""
+        if priority in self.PRIORITIES:
+            return priority
+        if user_id is not None and (user_id == self.owner_id or user_id in self.vip_users):
+            return "vip"
+        return "background"
+
+    # -----------------------------
+    # Очередь
+    # -----------------------------
+    @contextlib.contextmanager
+    def slot(
+        self,
+        priority: str = "interactive",
+        deadline: float = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ):
+        """
+        Ждёт своей очереди к модели и держит её до выхода из блока.
+        deadline — сколько секунд запрос готов ждать начала
+        (по умолчанию deadline_seconds своего класса).
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        ticket = self._admit(priority, deadline)
+        self._wait(ticket, cancelled)
+        try:
+            yield ticket
+        finally:
+            with self._cond:
+                self._running = None
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            result = {
+                "running": self._running.priority if self._running else None,
+                "queued": {p: sum(1 for t in self._waiting if t.priority == p) for p in self.PRIORITIES},
+            }
+            for p in self.PRIORITIES:
+                waits = sorted(self._waits[p])
+                result[p] = dict(self._counters[p])
+                result[p]["wait_ms_avg"] = round(sum(waits) / len(waits), 1) if waits else 0.0
+                result[p]["wait_ms_p95"] = round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 1) if waits else 0.0
+                result[p]["wait_ms_max"] = round(waits[-1], 1) if waits else 0.0
+            return result
+
+    # -----------------------------
+    # Внутреннее
+    # -----------------------------
+    def _admit(self, priority: str, deadline: Optional[float]) -> _Ticket:
+        if priority not in self.PRIORITIES:
+            priority = "background"
+        if deadline is None:
+            deadline = self.deadlines.get(priority)
+        with self._cond:
+            queued = sum(1 for t in self._waiting if t.priority == priority)
+            if queued >= int(self.max_queue.get(priority, 0)) and self._running is not None:
+                self._counters[priority]["rejected"] += 1
+                raise SchedulerRejected(
+                    SchedulerRejected.QUEUE_FULL,
+                    "Языковая модель перегружена, попробуйте чуть позже.",
+                )
+            ticket = _Ticket(
+                priority,
+                self.PRIORITIES.index(priority),
+                next(self._seq),
+                time.monotonic() + deadline if deadline else None,
+            )
+            self._waiting.append(ticket)
+            return ticket
+
+    def _wait(self, ticket: _Ticket, cancelled: Optional[Callable[[], bool]]):
+        with self._cond:
+            try:
+                while True:
+                    if cancelled is not None and cancelled():
+                        self._counters[ticket.priority]["cancelled"] += 1
+                        raise SchedulerRejected(SchedulerRejected.CANCELLED, "Запрос отменён.")
+                    now = time.monotonic()
+                    if ticket.deadline is not None and now >= ticket.deadline:
+                        self._counters[ticket.priority]["timed_out"] += 1
+                        raise SchedulerRejected(
+                            SchedulerRejected.DEADLINE,
+                            "Не дождался очереди к языковой модели, попробуйте чуть позже.",
+                        )
+                    if self._running is None and self._next(now) is ticket:
+                        self._waiting.remove(ticket)
+                        self._running = ticket
+                        ticket.started = now
+                        self._counters[ticket.priority]["admitted"] += 1
+                        self._waits[ticket.priority].append((now - ticket.enqueued) * 1000.0)
+                        return
+                    # cancelled() не умеет будить — проверяем его по таймеру
+                    timeout = 0.1 if ticket.deadline is None else min(0.1, max(ticket.deadline - now, 0.0))
+                    self._cond.wait(timeout)
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    self._cond.notify_all()
+                raise
+
+    def _next(self, now: float) -> Optional[_Ticket]:
+        def key(t: _Ticket):
+            rank = t.rank
+            if self.aging > 0:
+                rank = max(0, rank - int((now - t.enqueued) / self.aging))
+            return rank, t.seq
+
+        return min(self._waiting, key=key) if self._waiting else None
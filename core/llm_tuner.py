@@ -0,0 +1,352 @@
+import hashlib
+import json
+import os
+import platform
+import socket
+import threading
+import time
+from datetime import datetime
+
+import psutil
+
+
+class LlamaTuner:
+    """
+    Подбор параметров llama.cpp под железо:
+    - железо: физические/логические ядра, RAM, возможности CPU (AVX2, AVX512...)
+    - калибровка при первой загрузке модели на этом компьютере: короткие
+      замеры токенов/с для вариантов n_threads_batch и n_batch (обработка
+      промпта) и n_threads (генерация) на уже загруженной модели —
+      потоки меняются через llama_set_n_threads без перезагрузки
+    - use_mmap / use_mlock выбираются по RAM и размеру файла модели
+    - лучший профиль хранится по ключу «файл модели + компьютер»
+      (data/cache/llm_tuning.json), следующие загрузки берут его сразу
+    - значения из settings.json (llm_runtime) важнее подобранных
+    """
+
+    DEFAULTS = {
+        "auto_tune": True,
+        "n_ctx": 2048,
+        "n_threads": None,
+        "n_threads_batch": None,
+        "n_batch": None,
+        "use_mmap": None,
+        "use_mlock": None,
+        "calibration_prompt_tokens": 128,
+        "calibration_gen_tokens": 16,
+        "profiles_path": os.path.join("data", "cache", "llm_tuning.json"),
+    }
+
+    # параметры, которые можно задать вручную (None — подобрать)
+    TUNABLE = ("n_threads", "n_threads_batch", "n_batch", "use_mmap", "use_mlock")
+
+    VERSION = 1
+
+    _CALIBRATION_TEXT = (
+        "Ассистент помогает пользователю: отвечает на вопросы, ставит напоминания, "
+        "открывает программы и рассказывает о погоде. The assistant speaks Russian, "
+        "Uzbek and English. Yordamchi savollarga qisqa va aniq javob beradi. "
+    )
+
+    def __init__(self, config: dict = None):
+        settings = dict(self.DEFAULTS)
+        settings.update((config or {}).get("llm_runtime", {}) or {})
+        self.settings = settings
+
+        self.n_ctx = int(settings["n_ctx"])
+        self.auto_tune = bool(settings["auto_tune"])
+        self.profiles_path = settings["profiles_path"]
+        self.overrides = {k: settings[k] for k in self.TUNABLE if settings.get(k) is not None}
+
+        self._lock = threading.Lock()
+        self._profiles = self._read_profiles()
+        self.hardware = self.detect_hardware()
+
+    # -----------------------------
+    # Железо
+    # -----------------------------
+    @staticmethod
+    def detect_hardware() -> dict:
+        logical = psutil.cpu_count(logical=True) or 1
+        physical = psutil.cpu_count(logical=False) or logical
+        memory = psutil.virtual_memory()
+
+        features = []
+        try:
+            import llama_cpp
+
+            info = llama_cpp.llama_print_system_info().decode("utf-8", "ignore")
+            for item in info.split("|"):
+                name, _, value = item.partition("=")
+                if value.strip() == "1":
+                    features.append(name.strip())
+        except Exception:
+            pass
+
+        return {
+            "host": socket.gethostname(),
+            "machine": platform.machine(),
+            "cpu": platform.processor(),
+            "physical_cores": physical,
+            "logical_cores": logical,
+            "ram_total_mb": memory.total // (1024 * 1024),
+            "ram_available_mb": memory.available // (1024 * 1024),
+            "cpu_features": sorted(features),
+        }
+
+    def host_id(self) -> str:
+        hw = self.hardware
+        raw = json.dumps(
+            [hw["host"], hw["machine"], hw["cpu"], hw["physical_cores"], hw["logical_cores"],
+             hw["ram_total_mb"] // 1024, hw["cpu_features"]],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def model_id(model_path: str) -> str:
+        try:
+            st = os.stat(model_path)
+            return f"{os.path.basename(model_path)}:{st.st_size}:{int(st.st_mtime)}"
+        except OSError:
+            return os.path.basename(model_path)
+
+    def profile_key(self, model_path: str) -> str:
+        return f"v{self.VERSION}|{self.model_id(model_path)}|{self.host_id()}|{self.n_ctx}"
+
+    # -----------------------------
+    # Профиль
+    # -----------------------------
+    def default_profile(self, model_path: str) -> dict:
+        """Профиль без калибровки: по числу ядер и объёму памяти."""
+        hw = self.hardware
+        try:
+            model_mb = os.path.getsize(model_path) // (1024 * 1024)
+        except OSError:
+            model_mb = 0
+
+        # mlock держит модель в RAM (нет подкачки между репликами),
+        # но только когда памяти с большим запасом
+        use_mlock = bool(model_mb) and hw["ram_total_mb"] >= model_mb * 4 and self._supports("mlock")
+        return {
+            # генерация упирается в память: больше физических ядер не помогает
+            "n_threads": max(1, hw["physical_cores"]),
+            # обработка промпта — вычисления, выигрывает от всех потоков
+            "n_threads_batch": max(1, hw["logical_cores"]),
+            "n_batch": min(512, self.n_ctx),
+            "use_mmap": self._supports("mmap"),
+            "use_mlock": use_mlock,
+        }
+
+    def profile_for(self, model_path: str) -> dict:
+        """Сохранённый (или по умолчанию) профиль с учётом ручных настроек."""
+        with self._lock:
+            saved = self._profiles.get(self.profile_key(model_path))
+        profile = self.default_profile(model_path)
+        if saved:
+            profile.update({k: saved[k] for k in self.TUNABLE if k in saved})
+        profile.update(self.overrides)
+        return profile
+
+    def needs_calibration(self, model_path: str) -> bool:
+        if not self.auto_tune:
+            return False
+        if all(k in self.overrides for k in ("n_threads", "n_threads_batch", "n_batch")):
+            return False
+        with self._lock:
+            return self.profile_key(model_path) not in self._profiles
+
+    # -----------------------------
+    # Загрузка
+    # -----------------------------
+    def load(self, model_path: str, draft_model=None):
+        """
+        Загружает Llama с подобранными параметрами (калибрует при первой загрузке).
+        draft_model — черновая модель для спекулятивного декодирования.
+        """
+        from llama_cpp import Llama
+
+        profile = self.profile_for(model_path)
+        calibrate = self.needs_calibration(model_path)
+        n_batch = profile["n_batch"]
+        if calibrate and "n_batch" not in self.overrides:
+            # контекст создаётся с максимальным n_batch, меньшие проверяются на нём же
+            n_batch = min(512, self.n_ctx)
+
+        llm = Llama(
+            model_path=model_path,
+            n_ctx=self.n_ctx,
+            n_batch=n_batch,
+            n_threads=profile["n_threads"],
+            n_threads_batch=profile["n_threads_batch"],
+            use_mmap=profile["use_mmap"],
+            use_mlock=profile["use_mlock"],
+            draft_model=draft_model,
+            verbose=False,
+        )
+
+        if calibrate:
+            try:
+                profile = self.calibrate(llm, model_path, profile)
+            except Exception as e:
+                print(f"⚠️ Калибровка llama.cpp не удалась, использую параметры по умолчанию: {e}")
+        self.apply(llm, profile)
+        print(
+            f"⚙️ llama.cpp: n_threads={profile['n_threads']}, n_threads_batch={profile['n_threads_batch']}, "
+            f"n_batch={profile['n_batch']}, mmap={profile['use_mmap']}, mlock={profile['use_mlock']}"
+        )
+        return llm
+
+    @staticmethod
+    def apply(llm, profile: dict):
+        """Применяет потоки и размер пакета к уже загруженной модели."""
+        import llama_cpp
+
+        llm.n_threads = int(profile["n_threads"])
+        llm.n_threads_batch = int(profile["n_threads_batch"])
+        llm.context_params.n_threads = llm.n_threads
+        llm.context_params.n_threads_batch = llm.n_threads_batch
+        llama_cpp.llama_set_n_threads(llm._ctx.ctx, llm.n_threads, llm.n_threads_batch)
+        # буфер пакета выделен под n_batch контекста — уменьшать можно, увеличивать нет
+        llm.n_batch = min(int(profile["n_batch"]), llm.context_params.n_batch)
+
+    # -----------------------------
+    # Калибровка
+    # -----------------------------
+    def calibrate(self, llm, model_path: str, profile: dict) -> dict:
+        """Короткий замер токенов/с; лучший профиль сохраняется на диск."""
+        print("⏱ Калибровка llama.cpp под этот компьютер (один раз для модели)...")
+        started = time.perf_counter()
+        profile = dict(profile)
+        prompt = self._calibration_tokens(llm)
+        gen_tokens = int(self.settings["calibration_gen_tokens"])
+
+        # прогрев: первый проход подгружает веса с диска (mmap), его не считаем
+        self._measure_prompt(llm, prompt, profile["n_threads"], profile["n_threads_batch"], profile["n_batch"])
+
+        # 1) потоки для обработки промпта
+        if "n_threads_batch" not in self.overrides:
+            best = None
+            for n in self._thread_candidates(batch=True):
+                tps = self._measure_prompt(llm, prompt, profile["n_threads"], n, profile["n_batch"])
+                if best is None or tps > best[1]:
+                    best = (n, tps)
+            profile["n_threads_batch"] = best[0]
+
+        # 2) размер пакета
+        if "n_batch" not in self.overrides:
+            best = None
+            for n in self._batch_candidates(llm):
+                tps = self._measure_prompt(llm, prompt, profile["n_threads"], profile["n_threads_batch"], n)
+                if best is None or tps > best[1]:
+                    best = (n, tps)
+            profile["n_batch"] = best[0]
+
+        prompt_tps = self._measure_prompt(
+            llm, prompt, profile["n_threads"], profile["n_threads_batch"], profile["n_batch"]
+        )
+
+        # 3) потоки для генерации (по одному токену)
+        gen_tps = None
+        if "n_threads" not in self.overrides:
+            best = None
+            for n in self._thread_candidates(batch=False):
+                tps = self._measure_generation(llm, prompt, n, profile["n_threads_batch"], gen_tokens)
+                if best is None or tps > best[1]:
+                    best = (n, tps)
+            profile["n_threads"], gen_tps = best
+        else:
+            gen_tps = self._measure_generation(
+                llm, prompt, profile["n_threads"], profile["n_threads_batch"], gen_tokens
+            )
+
+        llm.reset()
+        elapsed = time.perf_counter() - started
+        record = {k: profile[k] for k in self.TUNABLE}
+        record.update({
+            "prompt_tokens_per_s": round(prompt_tps, 1),
+            "gen_tokens_per_s": round(gen_tps, 1),
+            "calibration_s": round(elapsed, 1),
+            "calibrated": datetime.now().isoformat(timespec="seconds"),
+            "model": os.path.basename(model_path),
+            "hardware": {k: v for k, v in self.hardware.items() if k != "ram_available_mb"},
+        })
+        with self._lock:
+            self._profiles[self.profile_key(model_path)] = record
+            self._write_profiles()
+
+        print(
+            f"✅ Калибровка за {elapsed:.1f} с: промпт {prompt_tps:.0f} ток/с, "
+            f"генерация {gen_tps:.1f} ток/с"
+        )
+        return profile
+
+    def _thread_candidates(self, batch: bool) -> list:
+        physical = self.hardware["physical_cores"]
+        logical = self.hardware["logical_cores"]
+        if batch:
+            values = {physical, logical}
+        else:
+            values = {max(1, physical // 2), max(1, physical - 1), physical}
+        return sorted(values)
+
+    def _batch_candidates(self, llm) -> list:
+        limit = llm.context_params.n_batch
+        return sorted({n for n in (128, 256, 512) if n <= limit} or {limit})
+
+    def _calibration_tokens(self, llm) -> list:
+        tokens = llm.tokenize(self._CALIBRATION_TEXT.encode("utf-8"), add_bos=True)
+        count = int(self.settings["calibration_prompt_tokens"])
+        while len(tokens) < count:
+            tokens += tokens[1:]
+        return tokens[:count]
+
+    def _measure_prompt(self, llm, tokens: list, n_threads: int, n_threads_batch: int, n_batch: int) -> float:
+        self.apply(llm, {"n_threads": n_threads, "n_threads_batch": n_threads_batch, "n_batch": n_batch})
+        llm.reset()
+        started = time.perf_counter()
+        llm.eval(tokens)
+        return len(tokens) / max(time.perf_counter() - started, 1e-6)
+
+    def _measure_generation(self, llm, tokens: list, n_threads: int, n_threads_batch: int, count: int) -> float:
+        self.apply(llm, {"n_threads": n_threads, "n_threads_batch": n_threads_batch, "n_batch": llm.n_batch})
+        # промпт уже в KV-кэше (совпадающий префикс), считаем только одиночные токены
+        llm.n_tokens = min(llm.n_tokens, len(tokens) // 2)
+        tail = tokens[llm.n_tokens : llm.n_tokens + count]
+        started = time.perf_counter()
+        for token in tail:
+            llm.eval([token])
+        return len(tail) / max(time.perf_counter() - started, 1e-6)
+
+    @staticmethod
+    def _supports(feature: str) -> bool:
+        try:
+            import llama_cpp
+
+            return bool(getattr(llama_cpp, f"llama_supports_{feature}")())
+        except Exception:
+            return feature == "mmap"
+
+    # -----------------------------
+    # Хранилище профилей
+    # -----------------------------
+    def _read_profiles(self) -> dict:
+        if not os.path.exists(self.profiles_path):
+            return {}
+        try:
+            with open(self.profiles_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            print(f"⚠️ Профили llama.cpp повреждены, калибровка будет заново: {e}")
+            return {}
+
+    def _write_profiles(self):
+        try:
+            os.makedirs(os.path.dirname(self.profiles_path) or ".", exist_ok=True)
+            tmp = self.profiles_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._profiles, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.profiles_path)
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить профиль llama.cpp: {e}")
@@ -0,0 +1,364 @@
+import contextlib
+import gc
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import psutil
+
+
+class ModelHandle:
+    """
+    Загруженный экземпляр LLM и его состояние.
+
+    lock — RLock: его берёт и отпускает один и тот же поток. Потоковая
+    генерация держит lock между токенами, поэтому генератор ответа нужно
+    читать и закрывать в одном потоке (так делает и сервер —
+    _iterate_in_thread); закрытие из другого потока — RuntimeError
+    и навсегда занятая модель. _release ждёт этот же lock.
+    """
+
+    def __init__(self, path: str, llm):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.llm = llm
+        self.lock = threading.RLock()  # llama.cpp: один запрос к экземпляру за раз
+        self.in_flight = 0
+        self.healthy = True
+        self.retired = False
+        self.failures = 0
+        self.loaded_at = time.time()
+        self.prefix_key = None  # ключ кэша системного промпта (NlpProcessor)
+
+
+class LlmModelManager:
+    """
+    Управление экземплярами LLM:
+    - активная модель + «тёплая» резервная (следующая по приоритету), если
+      свободной RAM хватает с запасом; при нехватке памяти резерв выгружается
+    - переключение атомарное: запросы, уже начатые на старой модели,
+      дорабатывают на ней, новые сразу идут на резерв; старая выгружается,
+      когда последний её запрос закончился
+    - если тёплого резерва нет, замена грузится в фоне — запрос не ждёт
+      многогигабайтную загрузку (кроме failover_wait_seconds)
+    - фоновая проверка: резерв периодически «прогревается» одним токеном
+      (страницы mmap не вытесняются) и проверяется на работоспособность
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        "min_free_mb": 2048,
+        "check_interval": 60,
+        "failover_wait_seconds": 0,
+        "failed_cooldown_seconds": 600,
+    }
+
+    def __init__(
+        self,
+        models_root: str,
+        candidates: list,
+        loader: Callable[[str], object],
+        config: dict = None,
+        on_loaded: Optional[Callable[[ModelHandle], None]] = None,
+        on_swap: Optional[Callable[[ModelHandle], None]] = None,
+    ):
+        settings = dict(self.DEFAULTS)
+        settings.update((config or {}).get("llm_standby", {}) or {})
+        self.settings = settings
+
+        self.models_root = models_root
+        self.candidates = list(candidates)
+        self.loader = loader
+        self.on_loaded = on_loaded
+        self.on_swap = on_swap
+
+        self.standby_enabled = bool(settings["enabled"])
+        self.min_free_mb = float(settings["min_free_mb"])
+        self.check_interval = float(settings["check_interval"])
+        self.failover_wait = float(settings["failover_wait_seconds"])
+        self.failed_cooldown = float(settings["failed_cooldown_seconds"])
+
+        self.active: Optional[ModelHandle] = None
+        self.standby: Optional[ModelHandle] = None
+        self._failed = {}  # путь -> время сбоя; через failed_cooldown_seconds модель снова в ротации
+        self._lock = threading.Lock()
+        self._loading = None  # путь модели, которая грузится в фоне
+        self._swapped = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._monitor = None
+
+        self.swaps = 0
+        self.warm_swaps = 0
+        self.last_swap_ms = None
+
+    # -----------------------------
+    # Запуск / остановка
+    # -----------------------------
+    def start(self):
+        """Загружает первую доступную модель (блокирующе) и запускает фоновый монитор."""
+        tried = []
+        for path in self._paths():
+            tried.append(path)
+            if not os.path.exists(path):
+                continue
+            handle = self._load(path)
+            if handle is not None:
+                with self._lock:
+                    self.active = handle
+                break
+
+        if self.active is None:
+            raise FileNotFoundError(
+                "❌ Не удалось загрузить ни одну модель.\n"
+                "Проверенные пути:\n  " + "\n  ".join(tried)
+            )
+
+        self._monitor = threading.Thread(target=self._monitor_loop, name="llm-monitor", daemon=True)
+        self._monitor.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    # -----------------------------
+    # Использование
+    # -----------------------------
+    @contextlib.contextmanager
+    def acquire(self):
+        """Берёт активную модель на время запроса (она не выгрузится до конца запроса)."""
+        with self._lock:
+            handle = self.active
+            if handle is None:
+                raise RuntimeError("LLM не загружена")
+            handle.in_flight += 1
+        try:
+            yield handle
+        finally:
+            with self._lock:
+                handle.in_flight -= 1
+                release = handle.retired and handle.in_flight == 0
+            if release:
+                self._release(handle)
+
+    def report_success(self, handle: ModelHandle):
+        handle.failures = 0
+        self._failed.pop(handle.path, None)
+
+    def failover(self, handle: ModelHandle, error: Exception = None) -> bool:
+        """
+        Модель дала сбой. True — активной уже стала другая модель и запрос
+        можно повторить; False — замена грузится в фоне (или её нет).
+        """
+        with self._lock:
+            if handle is not self.active:
+                return self.active is not None and self.active.healthy
+            handle.healthy = False
+            handle.failures += 1
+            self._mark_failed(handle.path)
+
+            standby = self.standby
+            if standby is not None and standby.healthy:
+                started = time.perf_counter()
+                self.standby = None
+                self._swap_locked(standby, warm=True)
+                self.last_swap_ms = round((time.perf_counter() - started) * 1000.0, 3)
+                print(f"🔁 Переключение на тёплый резерв {standby.name} за {self.last_swap_ms} мс")
+                swapped = True
+            else:
+                swapped = False
+
+        if swapped:
+            self._notify_swap(standby)
+            return True
+
+        # резерва нет: грузим замену в фоне, запрос не держим
+        replacement = self._next_candidate(exclude=handle.path)
+        if replacement is None:
+            print("⚠️ Резервной модели нет — остаюсь на текущей.")
+            handle.healthy = True
+            return False
+        self._load_in_background(replacement, promote=True)
+
+        if self.failover_wait > 0:
+            deadline = time.monotonic() + self.failover_wait
+            with self._swapped:
+                while self.active is handle:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._swapped.wait(left)
+                return self.active is not handle
+        return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self.active.name if self.active else None,
+                "standby": self.standby.name if self.standby else None,
+                "loading": os.path.basename(self._loading) if self._loading else None,
+                "failed": sorted(os.path.basename(p) for p in list(self._failed) if self._is_failed(p)),
+                "swaps": self.swaps,
+                "warm_swaps": self.warm_swaps,
+                "last_swap_ms": self.last_swap_ms,
+                "available_mb": psutil.virtual_memory().available // (1024 * 1024),
+            }
+
+    # -----------------------------
+    # Резерв и память
+    # -----------------------------
+    def ensure_standby(self):
+        """Грузит тёплый резерв в фоне, если он включён и памяти хватает."""
+        if not self.standby_enabled:
+            return
+        with self._lock:
+            if self.standby is not None or self._loading or self.active is None:
+                return
+            active_path = self.active.path
+        path = self._next_candidate(exclude=active_path)
+        if path is None or not self._memory_allows(path):
+            return
+        self._load_in_background(path, promote=False)
+
+    def _memory_allows(self, path: str) -> bool:
+        try:
+            need_mb = os.path.getsize(path) / (1024 * 1024) * 1.1
+        except OSError:
+            return False
+        available_mb = psutil.virtual_memory().available / (1024 * 1024)
+        return available_mb - need_mb >= self.min_free_mb
+
+    def _check_memory_pressure(self):
+        """Под нехваткой памяти резерв выгружается первым."""
+        available_mb = psutil.virtual_memory().available / (1024 * 1024)
+        if available_mb >= self.min_free_mb:
+            return
+        with self._lock:
+            standby, self.standby = self.standby, None
+        if standby is not None:
+            print(f"🧹 Мало памяти ({available_mb:.0f} МБ) — выгружаю резервную модель {standby.name}")
+            self._release(standby)
+
+    def _ping(self, handle: ModelHandle) -> bool:
+        """Один токен через модель: держит страницы в памяти и проверяет, что она жива."""
+        if not handle.lock.acquire(blocking=False):
+            return True  # занята запросом — значит работает
+        try:
+            llm = handle.llm
+            llm.reset()
+            llm.eval([llm.token_bos()])
+            llm.reset()
+            return True
+        except Exception as e:
+            print(f"⚠️ Резервная модель {handle.name} не отвечает: {e}")
+            return False
+        finally:
+            handle.lock.release()
+
+    def _monitor_loop(self):
+        self.ensure_standby()
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self._check_memory_pressure()
+                with self._lock:
+                    standby = self.standby
+                if standby is not None and not self._ping(standby):
+                    with self._lock:
+                        if self.standby is standby:
+                            self.standby = None
+                    self._mark_failed(standby.path)
+                    self._release(standby)
+                self.ensure_standby()
+            except Exception as e:
+                print(f"⚠️ Ошибка проверки моделей: {e}")
+
+    # -----------------------------
+    # Внутреннее
+    # -----------------------------
+    def _paths(self) -> list:
+        return [os.path.join(self.models_root, name) for name in self.candidates]
+
+    def _next_candidate(self, exclude: str):
+        """Следующая по приоритету существующая модель после exclude (по кругу)."""
+        paths = self._paths()
+        start = paths.index(exclude) + 1 if exclude in paths else 0
+        for path in paths[start:] + paths[:start]:
+            if path == exclude or self._is_failed(path) or not os.path.exists(path):
+                continue
+            return path
+        return None
+
+    def _load(self, path: str) -> Optional[ModelHandle]:
+        try:
+            print(f"🧠 Загружаю LLM модель: {path}")
+            handle = ModelHandle(path, self.loader(path))
+            if self.on_loaded:
+                self.on_loaded(handle)
+            self._failed.pop(path, None)
+            return handle
+        except Exception as e:
+            print(f"⚠️ Ошибка при загрузке {os.path.basename(path)}: {e}")
+            self._mark_failed(path)
+            return None
+
+    def _mark_failed(self, path: str):
+        self._failed[path] = time.monotonic()
+
+    def _is_failed(self, path: str) -> bool:
+        """Сбой был недавно; по истечении failed_cooldown_seconds модель пробуется снова."""
+        failed_at = self._failed.get(path)
+        if failed_at is None:
+            return False
+        if time.monotonic() - failed_at >= self.failed_cooldown:
+            self._failed.pop(path, None)
+            return False
+        return True
+
+    def _load_in_background(self, path: str, promote: bool):
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = path
+
+        def run():
+            handle = self._load(path)
+            with self._lock:
+                self._loading = None
+                if handle is None:
+                    if promote and self.active is not None:
+                        self.active.healthy = True  # замены нет — работаем на прежней
+                    return
+                if not promote:
+                    self.standby = handle
+                    print(f"🔥 Резервная модель готова: {handle.name}")
+                    return
+                self._swap_locked(handle, warm=False)
+            self._notify_swap(handle)
+
+        threading.Thread(target=run, name="llm-load", daemon=True).start()
+
+    def _swap_locked(self, handle: ModelHandle, warm: bool):
+        old = self.active
+        self.active = handle
+        self.swaps += 1
+        if warm:
+            self.warm_swaps += 1
+        if old is not None:
+            old.retired = True
+            if old.in_flight == 0:
+                threading.Thread(target=self._release, args=(old,), daemon=True).start()
+        self._swapped.notify_all()
+
+    def _notify_swap(self, handle: ModelHandle):
+        if self.on_swap:
+            try:
+                self.on_swap(handle)
+            except Exception as e:
+                print(f"⚠️ Ошибка после переключения модели: {e}")
+        # новый резерв взамен использованного
+        threading.Thread(target=self.ensure_standby, daemon=True).start()
+
+    def _release(self, handle: ModelHandle):
+        with handle.lock:
+            handle.llm = None
+        gc.collect()
+        print(f"🧹 Модель выгружена: {handle.name}")
@@ -0,0 +1,175 @@
+import collections
+import gc
+import os
+import threading
+
+import psutil
+
+
+class VoskModelPool:
+    """
+    Пул моделей Vosk для нескольких языков:
+    - модель загружается при первом обращении к языку
+    - недавно использованные модели остаются в памяти
+    - при превышении бюджета RAM выгружаются давно не использованные (LRU)
+
+    Размер модели оценивается по размеру папки на диске до загрузки
+    и по приросту RSS процесса (psutil) после неё.
+    """
+
+    def __init__(self, models_root: str, model_dirs: dict, memory_budget_mb: int = 0):
+        self.models_root = models_root
+        self.model_dirs = dict(model_dirs)
+        self.memory_budget = int(memory_budget_mb) * 1024 * 1024  # 0 — без ограничения
+
+        self._models = collections.OrderedDict()  # lang -> модель (в конце — самая свежая)
+        self._sizes = {}                          # lang -> байт
+        self._pinned = set()
+        self._lock = threading.RLock()
+        self._loading = {}                        # lang -> Lock, чтобы не грузить дважды
+        self._process = psutil.Process()
+
+        self.loads = 0
+        self.evictions = 0
+
+    # -----------------------------
+    # Публичный интерфейс
+    # -----------------------------
+    def model_path(self, lang: str) -> str:
+        name = self.model_dirs.get(lang)
+        if not name:
+            raise KeyError(f"Нет модели для языка: {lang}")
+        return os.path.join(self.models_root, name)
+
+    def disk_size(self, lang: str) -> int:
+        """Размер папки модели в байтах — оценка памяти до загрузки."""
+        return self._dir_size(self.model_path(lang))
+
+    def available_languages(self) -> list:
+        return [lang for lang in self.model_dirs if os.path.exists(self.model_path(lang))]
+
+    def is_loaded(self, lang: str) -> bool:
+        with self._lock:
+            return lang in self._models
+
+    def loaded_languages(self) -> list:
+        with self._lock:
+            return list(self._models)
+
+    def get(self, lang: str):
+        """Возвращает модель языка, при необходимости загружая её."""
+        with self._lock:
+            model = self._models.get(lang)
+            if model is not None:
+                self._models.move_to_end(lang)
+                return model
+            load_lock = self._loading.setdefault(lang, threading.Lock())
+
+        # Загрузка идёт без общего замка: другие языки остаются доступны
+        with load_lock:
+            with self._lock:
+                model = self._models.get(lang)
+                if model is not None:
+                    self._models.move_to_end(lang)
+                    return model
+
+            path = self.model_path(lang)
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Модель не найдена: {path}")
+
+            estimate = self._dir_size(path)
+            self._make_room(estimate, keep=lang)
+
+            rss_before = self._process.memory_info().rss
+            print(f"🎧 Загружаю модель Vosk [{lang}]: {path}")
+            model = self._load(path)
+            grown = self._process.memory_info().rss - rss_before
+
+            with self._lock:
+                self._models[lang] = model
+                self._sizes[lang] = grown if grown > 0 else estimate
+                self.loads += 1
+            self._make_room(0, keep=lang)
+            return model
+
+    def preload(self, languages, background: bool = True):
+        """Заранее загружает «горячие» языки (по умолчанию — в фоне)."""
+        def _run():
+            for lang in languages:
+                try:
+                    self.get(lang)
+                except Exception as e:
+                    print(f"⚠️ Не удалось предзагрузить модель [{lang}]: {e}")
+
+        if not background:
+            _run()
+            return None
+        thread = threading.Thread(target=_run, daemon=True)
+        thread.start()
+        return thread
+
+    def pin(self, lang: str):
+        """Запрещает выгружать модель языка (например, активного)."""
+        with self._lock:
+            self._pinned.add(lang)
+
+    def unpin(self, lang: str):
+        with self._lock:
+            self._pinned.discard(lang)
+
+    def evict(self, lang: str) -> bool:
+        with self._lock:
+            if lang not in self._models:
+                return False
+            del self._models[lang]
+            self._sizes.pop(lang, None)
+            self.evictions += 1
+        print(f"🧹 Модель Vosk [{lang}] выгружена из памяти.")
+        gc.collect()
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": list(self._models),
+                "resident_mb": round(sum(self._sizes.values()) / 1024 / 1024, 1),
+                "budget_mb": round(self.memory_budget / 1024 / 1024, 1),
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    # -----------------------------
+    # Внутреннее
+    # -----------------------------
+    def _load(self, path: str):
+        import vosk
+        return vosk.Model(path)
+
+    def _make_room(self, incoming: int, keep: str = None):
+        """Выгружает LRU-модели, пока новая модель не помещается в бюджет и в свободную RAM."""
+        while True:
+            with self._lock:
+                resident = sum(self._sizes.values())
+                over_budget = self.memory_budget and resident + incoming > self.memory_budget
+                low_ram = incoming and psutil.virtual_memory().available < incoming
+                if not (over_budget or low_ram):
+                    return
+
+                victim = next(
+                    (lang for lang in self._models if lang != keep and lang not in self._pinned),
+                    None,
+                )
+            if victim is None:
+                return
+            self.evict(victim)
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        total = 0
+        for root, _dirs, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
@@ -0,0 +1,128 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from core.language_id import LANGUAGE_ID
+
+
+class LanguageResult:
+    """Итог распознавания одной фразы на одном языке."""
+
+    __slots__ = ("language", "text", "confidence", "words")
+
+    def __init__(self, language: str, text: str, confidence: float, words: list):
+        self.language = language
+        self.text = text
+        self.confidence = confidence
+        self.words = words
+
+    def __repr__(self):
+        return f"LanguageResult({self.language!r}, {self.text!r}, conf={self.confidence:.2f})"
+
+
+class MultiLanguageDecoder:
+    """
+    Параллельное распознавание одной фразы несколькими моделями Vosk:
+    - на каждый язык свой KaldiRecognizer с SetWords(True)
+    - звук подаётся всем распознавателям одновременно из пула потоков
+      (Kaldi отпускает GIL, поэтому ядра реально работают параллельно)
+    - побеждает язык с наибольшей средней уверенностью по словам
+
+    Модели берутся из VoskModelPool, поэтому языки грузятся по мере надобности.
+    """
+
+    def __init__(self, pool, sample_rate: int, languages: list, max_workers: int = None):
+        self.pool = pool
+        self.sample_rate = sample_rate
+        self.languages = list(languages)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(1, len(self.languages)),
+            thread_name_prefix="stt-langid",
+        )
+        self._recognizers = {}
+
+    @property
+    def active(self) -> bool:
+        return bool(self._recognizers)
+
+    def start(self, languages: list = None):
+        """Готовит распознаватели для новой фразы."""
+        import vosk
+
+        self._recognizers = {}
+        for lang in languages or self.languages:
+            try:
+                model = self.pool.get(lang)
+            except Exception as e:
+                print(f"⚠️ Язык {lang} пропущен при автоопределении: {e}")
+                continue
+            rec = vosk.KaldiRecognizer(model, self.sample_rate)
+            rec.SetWords(True)
+            self._recognizers[lang] = rec
+
+    def accept(self, chunk: bytes):
+        """Подаёт кусок звука всем распознавателям параллельно."""
+        recs = list(self._recognizers.values())
+        if len(recs) == 1:
+            recs[0].AcceptWaveform(chunk)
+            return
+        list(self._executor.map(lambda rec: rec.AcceptWaveform(chunk), recs))
+
+    def finish(self) -> list:
+        """Завершает фразу и возвращает результаты по убыванию уверенности."""
+        items = list(self._recognizers.items())
+        self._recognizers = {}
+        results = list(
+            self._executor.map(
+                lambda item: self.parse_result(item[0], item[1].FinalResult()),
+                items,
+            )
+        )
+        results.sort(key=lambda r: r.confidence, reverse=True)
+        return results
+
+    def decode(self, audio: bytes, languages: list = None) -> list:
+        """Распознаёт уже записанную фразу на всех языках сразу."""
+        self.start(languages)
+        self.accept(audio)
+        return self.finish()
+
+    def reset(self):
+        """Бросает незаконченную фразу."""
+        self._recognizers = {}
+
+    def close(self):
+        self._recognizers = {}
+        self._executor.shutdown(wait=False)
+
+    @staticmethod
+    def break_tie(results: list, margin: float = 0.05) -> LanguageResult:
+        """
+        Выбор из результатов, отсортированных по уверенности. Уверенности
+        моделей почти равны — решает текст: побеждает модель, чей текст
+        LanguageIdentifier относит к её же языку.
+        """
+        best = results[0]
+        close = [r for r in results if r.text and best.confidence - r.confidence <= margin]
+        if len(close) < 2:
+            return best
+        for result in close:
+            if LANGUAGE_ID.detect(result.text, default="") == result.language:
+                return result
+        return best
+
+    @staticmethod
+    def parse_result(language: str, raw: str) -> LanguageResult:
+        """Разбирает JSON Vosk; уверенность — средняя conf слов, взвешенная по длительности."""
+        result = json.loads(raw) if isinstance(raw, str) else raw
+        text = result.get("text", "").strip()
+        words = result.get("result", []) or []
+
+        if not text or not words:
+            return LanguageResult(language, text, 0.0, words)
+
+        total = weight = 0.0
+        for w in words:
+            duration = max(float(w.get("end", 0)) - float(w.get("start", 0)), 0.01)
+            total += float(w.get("conf", 0)) * duration
+            weight += duration
+        return LanguageResult(language, text, total / weight, words)
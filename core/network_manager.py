@@ -29,15 +29,18 @@ class NetworkManager:
         """
         Запуск фоновой проверки сети.
         callback(is_online: bool) будет вызываться при изменении состояния.
+        Первая проверка (до 3 с) тоже идёт в фоне и не задерживает запуск.
         """
-        self.is_online = self._check_once()
-        if callback:
-            try:
-                callback(self.is_online)
-            except Exception:
-                pass
 
         def _loop():
+            self.is_online = self._check_once()
+            if callback:
+                try:
+                    callback(self.is_online)
+                except Exception:
+                    pass
+            self._stop_event.wait(self.check_interval)
+
             while not self._stop_event.is_set():
                 status = self._check_once()
                 if status != self.is_online:
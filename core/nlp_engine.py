@@ -1,5 +1,17 @@
-﻿import os
-from llama_cpp import Llama
+﻿import contextlib
+import os
+import threading
+import time
+
+from core.cascade import CascadeRouter, SmallModelTier
+from core.conversation import ConversationSession, chat_format_for
+from core.intent_router import IntentRouter
+from core.llm_scheduler import LlmScheduler, SchedulerRejected
+from core.llm_tuner import LlamaTuner
+from core.model_manager import LlmModelManager, ModelHandle
+from core.prompt_cache import PromptPrefixCache
+from core.response_cache import ResponseCache
+from core.speculative import SpeculativeDecoding
 
 
 class NlpProcessor:
@@ -7,12 +19,21 @@ class NlpProcessor:
     Модуль локального NLP (офлайн без API).
     Поддерживает:
     - Mistral, LLaMA и другие GGUF модели
-    - автоматический выбор и резервное переключение
+    - параметры llama.cpp (потоки, n_batch, mmap/mlock) подбираются под железо
+    - автоматический выбор и резервное переключение (тёплый резерв,
+      переключение без ожидания загрузки — см. LlmModelManager)
+    - кэш вычисленного системного промпта (в памяти и на диске)
+    - диалоги с памятью (session_id) с повторным использованием KV-кэша
+    - кэш готовых ответов на повторяющиеся вопросы
+    - спекулятивное декодирование (prompt lookup / черновая GGUF-модель)
+    - каскад: шаблон / малая модель / основная (stream_reply)
+    - очередь к основной модели с приоритетами (голос → VIP → фон),
+      дедлайнами и отменой (LlmScheduler)
     """
 
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, router: IntentRouter = None, models_root: str = None):
         self.config = config
-        self.models_root = os.path.join("models", "llm")
+        self.models_root = models_root or os.path.join("models", "llm")
 
         # Кандидаты в порядке приоритета
         candidates = [
@@ -22,107 +43,436 @@ class NlpProcessor:
             "mistral-7b-instruct-v0.3.Q4_K_M.gguf",
             "meta-llama-3-8b-instruct.Q4_K_M.gguf",
         ]
-        self.candidates = [x for x in candidates if x]
-
-        # Текущая активная модель
-        self.active_model = None
-        self.llm = None
-
-        self._load_first_available_model()
-
-    def _load_first_available_model(self):
-        """Загружает первую доступную модель."""
-        tried = []
-
-        for name in self.candidates:
-            path = os.path.join(self.models_root, name)
-            tried.append(path)
-            if os.path.exists(path):
-                try:
-                    print(f"🧠 Загружаю LLM модель: {path}")
-                    self.llm = Llama(model_path=path, n_ctx=2048, n_threads=8, verbose=False)
-                    self.active_model = path
-                    return
-                except Exception as e:
-                    print(f"⚠️ Ошибка при загрузке {name}: {e}")
-
-        raise FileNotFoundError(
-            "❌ Не удалось загрузить ни одну модель.\n"
-            "Проверенные пути:\n  " + "\n  ".join(tried)
+        self.candidates = list(dict.fromkeys(x for x in candidates if x))
+
+        # Параметры генерации
+        gen = config.get("llm_generation", {}) or {}
+        self.max_tokens = gen.get("max_tokens", 256)
+        self.temperature = gen.get("temperature", 0.7)
+        self.top_p = gen.get("top_p", 0.95)
+
+        # Потоки/пакет/память llama.cpp: профиль под этот компьютер
+        self.tuner = LlamaTuner(config)
+
+        # Спекулятивное декодирование (llm_speculative) и статистика скорости
+        self.speculative = SpeculativeDecoding(config, self.models_root)
+
+        # KV-состояние системного промпта: считается один раз на модель
+        self.prompt_cache = PromptPrefixCache(enabled=config.get("llm_prompt_cache", True))
+
+        # Диалоги: session_id -> ConversationSession
+        self.sessions = {}
+
+        # Готовые ответы (только для запросов без истории диалога)
+        self.response_cache = ResponseCache(config)
+        if self.response_cache.enabled and not self.response_cache.is_cacheable(self._generation_params()):
+            print("ℹ️ Кэш ответов включён, но не используется: temperature > 0 и cache_sampled выключен")
+
+        # Один запрос к модели за раз: очередь с приоритетами и дедлайнами
+        self.scheduler = LlmScheduler(config)
+
+        # Активная модель и тёплый резерв
+        self.models = LlmModelManager(
+            self.models_root,
+            self.candidates,
+            loader=self._load_llm,
+            config=config,
+            on_loaded=self._prepare_prompt_cache,
+            on_swap=self._on_model_swap,
+        )
+        self.models.start()
+
+        # Каскад по стоимости: шаблоны и малая модель для простых реплик
+        self.cascade = CascadeRouter(config, router or IntentRouter(config))
+        small_name = self.cascade.settings["small_model"]
+        if self.cascade.enabled and small_name:
+            self._start_small_model(os.path.join(self.models_root, small_name))
+
+    @property
+    def llm(self):
+        return self.models.active.llm if self.models.active else None
+
+    @property
+    def active_model(self):
+        return self.models.active.path if self.models.active else None
+
+    def _load_llm(self, path: str):
+        llm = self.tuner.load(path, draft_model=self.speculative.make_draft(path))
+        self.speculative.validate(llm)
+        return llm
+
+    def generation_stats(self) -> dict:
+        """Скорость генерации и доля принятых токенов черновика."""
+        stats = self.speculative.stats.snapshot()
+        llm = self.llm
+        stats["mode"] = self.speculative.active_mode(llm) if llm is not None else "off"
+        return stats
+
+    def _start_small_model(self, path: str):
+        if not os.path.exists(path):
+            print(f"⚠️ Малая модель каскада не найдена: {path}")
+            return
+        small = SmallModelTier(
+            path,
+            loader=self.tuner.load,
+            system_prompt=self.SYSTEM_PROMPT,
+            max_tokens=int(self.cascade.settings["small_max_tokens"]),
+            temperature=self.temperature,
+            top_p=self.top_p,
         )
+        self.cascade.small = small
+
+        def load():
+            try:
+                small.load()
+            except Exception as e:
+                print(f"⚠️ Малая модель каскада не загрузилась: {e}")
+
+        # основная модель уже готова — малая догружается, не задерживая старт
+        threading.Thread(target=load, name="llm-small", daemon=True).start()
+
+    def _on_model_swap(self, handle: ModelHandle):
+        # токены диалогов относились к словарю и KV-кэшу старой модели
+        self.sessions.clear()
+
+    SYSTEM_PROMPT = (
+        "Ты локальный мультиязычный голосовой ассистент. "
+        "Отвечай естественно, кратко и понятно. "
+        "Поддерживаешь русский, узбекский, английский и арабский языки."
+    )
+
+    def _chat_messages(self, text: str) -> list:
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": text.strip()},
+        ]
+
+    def _prepare_prompt_cache(self, handle: ModelHandle):
+        """Восстанавливает (или вычисляет и сохраняет) KV системного промпта."""
+        handle.prefix_key = None
+        model_name = handle.name.lower()
+        if "llama" not in model_name or "mistral" in model_name:
+            return  # системный промпт есть только в чат-формате LLaMA
+
+        def warmup(llm, user_text):
+            llm.create_chat_completion(
+                messages=self._chat_messages(user_text),
+                max_tokens=1,
+                temperature=0.0,
+            )
+
+        key = self.prompt_cache.make_key(handle.path, handle.llm.n_ctx(), self.SYSTEM_PROMPT)
+        try:
+            if self.prompt_cache.prepare(handle.llm, key, warmup):
+                handle.prefix_key = key
+        except Exception as e:
+            print(f"⚠️ Кэш промпта недоступен: {e}")
+
+    # -----------------------------
+    # Диалоги
+    # -----------------------------
+    def get_session(self, session_id: str = "default", handle: ModelHandle = None) -> ConversationSession:
+        """Возвращает диалог пользователя (создаёт при первом обращении)."""
+        model_path = handle.path if handle is not None else self.active_model
+        chat_format = chat_format_for(os.path.basename(model_path or ""))
+        session = self.sessions.get(session_id)
+        if session is None or session.chat_format != chat_format:
+            session = ConversationSession(session_id, chat_format, self.SYSTEM_PROMPT)
+            self.sessions[session_id] = session
+        return session
 
-    def _switch_to_backup_model(self):
-        """Автоматически переключается на следующую модель, если активная дала сбой."""
-        if not self.active_model:
-            return False
-
-        current_index = None
-        for i, name in enumerate(self.candidates):
-            if name.lower() in self.active_model.lower():
-                current_index = i
-                break
-
-        if current_index is not None and current_index + 1 < len(self.candidates):
-            backup_name = self.candidates[current_index + 1]
-            backup_path = os.path.join(self.models_root, backup_name)
-            if os.path.exists(backup_path):
-                print(f"🔁 Переключение на резервную модель: {backup_name}")
-                self.llm = Llama(model_path=backup_path, n_ctx=2048, n_threads=8, verbose=False)
-                self.active_model = backup_path
-                return True
-
-        return False
-
-    def generate_response(self, text: str) -> str:
-        """Создание ответа с автоматическим fallback при ошибке."""
+    def reset_session(self, session_id: str = "default"):
+        """Забывает историю диалога пользователя."""
+        self.sessions.pop(session_id, None)
+
+    def _run_model(self, handle: ModelHandle, text: str, stream: bool = False, session: ConversationSession = None):
+        """
+        Запускает модель в нужном формате.
+        Возвращает (результат, вид): вид "text" — completion, "chat" — chat completion.
+        """
+        llm = handle.llm
+        model_name = handle.name.lower()
+        self.speculative.begin(llm)
+
+        # Диалог — промпт уже в токенах, старые ходы берутся из KV-кэша
+        if session is not None:
+            prompt = session.build_prompt(llm, text, max_tokens=self.max_tokens)
+            result = llm.create_completion(
+                prompt,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                top_p=self.top_p,
+                stop=session.format["stop"],
+                stream=stream,
+            )
+            return result, "text"
+
+        # Mistral — особый формат
+        if "mistral" in model_name:
+            prompt = f"[INST] {text.strip()} [/INST]"
+            result = llm(
+                prompt,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                top_p=self.top_p,
+                stream=stream,
+            )
+            return result, "text"
+
+        # LLaMA — стандартный чат формат
+        elif "llama" in model_name:
+            if handle.prefix_key:
+                self.prompt_cache.restore(llm, handle.prefix_key)
+            result = llm.create_chat_completion(
+                messages=self._chat_messages(text),
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                top_p=self.top_p,
+                stream=stream,
+            )
+            return result, "chat"
+
+        # fallback для любых других GGUF
+        else:
+            result = llm(
+                text.strip(),
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                top_p=self.top_p,
+                stream=stream,
+            )
+            return result, "text"
+
+    def _generation_params(self) -> dict:
+        return {
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+        }
+
+    def _cache_key(self, text: str, session_id: str, model_path: str):
+        """Ключ кэша ответов или None, если запрос кэшировать нельзя."""
+        if session_id:
+            return None  # ответ зависит от истории диалога
+        params = self._generation_params()
+        if not self.response_cache.is_cacheable(params):
+            return None
+        return self.response_cache.make_key(text, model_path, params)
+
+    def _cached_reply(self, text: str, session_id: str):
+        """Готовый ответ активной модели — без очереди к модели и без acquire()."""
+        active = self.models.active
+        if active is None:
+            return None
+        cache_key = self._cache_key(text, session_id, active.path)
+        return self.response_cache.get(cache_key) if cache_key else None
+
+    def generate_response(
+        self,
+        text: str,
+        session_id: str = None,
+        priority: str = None,
+        user_id: str = None,
+        deadline: float = None,
+        cancelled=None,
+    ) -> str:
+        """
+        Создание ответа с автоматическим fallback при ошибке.
+        С session_id ответ учитывает предыдущие реплики этого диалога.
+        priority / user_id / deadline / cancelled — место в очереди к модели
+        (см. LlmScheduler); не дождался — SchedulerRejected. Без priority
+        запрос идёт как background (или vip по user_id) с его долгим
+        deadline — интерактивные вызовы передают priority="interactive".
+        """
         if not text.strip():
             return "Я ничего не услышал."
 
-        model_name = os.path.basename(self.active_model or "").lower()
+        # ответ из кэша не ждёт очереди к модели
+        cached = self._cached_reply(text, session_id)
+        if cached is not None:
+            return cached
+
+        error = None
+        # сначала очередь, потом модель: пока ждём, может случиться failover
+        with self.scheduler.slot(self.scheduler.classify(priority, user_id), deadline, cancelled), \
+                self.models.acquire() as handle:
+            session = self.get_session(session_id, handle) if session_id else None
+            cache_key = self._cache_key(text, session_id, handle.path)
+
+            try:
+                with handle.lock, session.lock if session is not None else contextlib.nullcontext():
+                    started = time.perf_counter()
+                    result, kind = self._run_model(handle, text, session=session)
+                    self.speculative.stats.record_generation(
+                        result.get("usage", {}).get("completion_tokens", 0), time.perf_counter() - started
+                    )
+                    if session is not None:
+                        session.commit(handle.llm)
+                if kind == "chat":
+                    response = result["choices"][0]["message"]["content"].strip()
+                else:
+                    response = result["choices"][0]["text"].strip()
+                self.models.report_success(handle)
+                if cache_key:
+                    self.response_cache.put(cache_key, response)
+                return response
+
+            except Exception as e:
+                print(f"⚠️ Ошибка модели ({handle.name}): {e}")
+                error = e
+
+        # старая модель и место в очереди освобождены — повтор уже на новой
+        if self.models.failover(handle, error):
+            return self.generate_response(text, session_id, priority, user_id, deadline, cancelled)
+        return f"Ошибка LLM: {error}"
+
+    def stream_response(
+        self,
+        text: str,
+        session_id: str = None,
+        priority: str = None,
+        user_id: str = None,
+        deadline: float = None,
+        cancelled=None,
+    ):
+        """
+        Потоковая генерация: отдаёт кусочки текста по мере появления токенов.
+        Если модель упала до первого токена — переключаемся на резервную,
+        как и в generate_response. Закрытие генератора или cancelled()
+        останавливает генерацию; очередь к модели (и priority по умолчанию)
+        — как в generate_response.
+        """
+        if not text.strip():
+            yield "Я ничего не услышал."
+            return
+
+        cached = self._cached_reply(text, session_id)
+        if cached is not None:
+            yield cached
+            return
+
+        produced = False
+        error = None
+
+        with self.scheduler.slot(self.scheduler.classify(priority, user_id), deadline, cancelled), \
+                self.models.acquire() as handle:
+            session = self.get_session(session_id, handle) if session_id else None
+            cache_key = self._cache_key(text, session_id, handle.path)
+            parts = []
+
+            try:
+                with handle.lock, session.lock if session is not None else contextlib.nullcontext():
+                    started = time.perf_counter()
+                    chunks, kind = self._run_model(handle, text, stream=True, session=session)
+                    n_chunks = 0
+                    interrupted = False
+                    try:
+                        for chunk in chunks:
+                            if cancelled is not None and cancelled():
+                                interrupted = True
+                                break
+                            n_chunks += 1  # в потоке llama.cpp — один токен на фрагмент
+                            choice = chunk["choices"][0]
+                            if kind == "chat":
+                                delta = choice.get("delta", {}).get("content")
+                            else:
+                                delta = choice.get("text")
+                            if not delta:
+                                continue
+                            if not produced:
+                                # как и strip() в generate_response — без ведущих пробелов
+                                delta = delta.lstrip()
+                                if not delta:
+                                    continue
+                            produced = True
+                            parts.append(delta)
+                            yield delta
+
+                        # генерация дошла до конца (не прервана) — можно кэшировать
+                        self.models.report_success(handle)
+                        if cache_key and not interrupted:
+                            self.response_cache.put(cache_key, "".join(parts).strip())
+                    finally:
+                        chunks.close()
+                        self.speculative.stats.record_generation(n_chunks, time.perf_counter() - started)
+                        # даже при прерывании запоминаем то, что успели сказать
+                        if session is not None:
+                            session.commit(handle.llm)
+
+            except Exception as e:
+                print(f"⚠️ Ошибка модели ({handle.name}): {e}")
+                error = e
 
+        if error is None or produced:
+            return
+        if self.models.failover(handle, error):
+            yield from self.stream_response(text, session_id, priority, user_id, deadline, cancelled)
+            return
+        yield f"Ошибка LLM: {error}"
+
+    def stream_reply(
+        self,
+        text: str,
+        session_id: str = None,
+        priority: str = None,
+        user_id: str = None,
+        deadline: float = None,
+        cancelled=None,
+    ):
+        """
+        Ответ через каскад: шаблон → малая модель → основная (stream_response).
+        Отдаёт кусочки текста, как stream_response; решение и задержки пишутся в лог каскада.
+        Очередь (priority и т.д.) нужна только основной модели.
+        С session_id ответы шаблона и малой модели тоже остаются в истории
+        диалога — иначе следующий ход не видит, о чём шла речь.
+        """
+        if not text.strip():
+            yield "Я ничего не услышал."
+            return
+
+        session = self.sessions.get(session_id) if session_id else None
+        decision = self.cascade.route(text, history_turns=session.turns if session else 0)
+        latency = {}
+        started = time.perf_counter()
+
+        if decision.tier == "template":
+            latency["template"] = (time.perf_counter() - started) * 1000.0
+            self.cascade.log(decision, "template", latency)
+            self._remember_turn(session_id, text, decision.reply)
+            yield decision.reply
+            return
+
+        confidence = None
+        if decision.tier == "small":
+            try:
+                response, confidence = self.cascade.small.answer(text)
+            except Exception as e:
+                print(f"⚠️ Ошибка малой модели: {e}")
+                response, confidence = "", 0.0
+            latency["small"] = (time.perf_counter() - started) * 1000.0
+            if confidence >= self.cascade.min_confidence:
+                self.cascade.log(decision, "small", latency, confidence)
+                self._remember_turn(session_id, text, response)
+                yield response
+                return
+
+        # основная модель (сразу или после неуверенного ответа малой)
+        large_started = time.perf_counter()
+        stream = self.stream_response(text, session_id, priority, user_id, deadline, cancelled)
         try:
-            # Mistral — особый формат
-            if "mistral" in model_name:
-                prompt = f"[INST] {text.strip()} [/INST]"
-                result = self.llm(
-                    prompt,
-                    max_tokens=256,
-                    temperature=0.7,
-                    top_p=0.95,
-                )
-                return result["choices"][0]["text"].strip()
-
-            # LLaMA — стандартный чат формат
-            elif "llama" in model_name:
-                messages = [
-                    {
-                        "role": "system",
-                        "content": (
-                            "Ты локальный мультиязычный голосовой ассистент. "
-                            "Отвечай естественно, кратко и понятно. "
-                            "Поддерживаешь русский, узбекский, английский и арабский языки."
-                        ),
-                    },
-                    {"role": "user", "content": text.strip()},
-                ]
-                result = self.llm.create_chat_completion(
-                    messages=messages,
-                    max_tokens=256,
-                    temperature=0.7,
-                )
-                return result["choices"][0]["message"]["content"].strip()
-
-            # fallback для любых других GGUF
-            else:
-                result = self.llm(
-                    text.strip(),
-                    max_tokens=256,
-                    temperature=0.7,
-                )
-                return result["choices"][0]["text"].strip()
+            for delta in stream:
+                if "large_first_token" not in latency:
+                    latency["large_first_token"] = (time.perf_counter() - large_started) * 1000.0
+                yield delta
+        finally:
+            stream.close()
+            latency["large"] = (time.perf_counter() - large_started) * 1000.0
+            self.cascade.log(decision, "large", latency, confidence)
 
-        except Exception as e:
-            print(f"⚠️ Ошибка модели ({model_name}): {e}")
-            if self._switch_to_backup_model():
-                return self.generate_response(text)
-            return f"Ошибка LLM: {e}"
+    def _remember_turn(self, session_id: str, text: str, reply: str):
+        """Ход, ответ на который дала не основная модель, — в историю диалога."""
+        if not session_id:
+            return
+        session = self.get_session(session_id)
+        with session.lock:
+            session.add_text_turn(text, reply)
@@ -0,0 +1,392 @@
+import itertools
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+from core.llm_scheduler import SchedulerRejected
+from core.text_chunker import SentenceChunker
+
+
+class PipelineJob:
+    """Одна реплика пользователя, проходящая по стадиям конвейера."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, text: str):
+        self.id = next(self._ids)
+        self.text = text
+        self.intent = None
+        self.response = None
+        self.created = time.monotonic()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+
+class VoicePipeline:
+    """
+    Конвейер STT → роутер/NLP → TTS на отдельных потоках:
+    - распознавание (VoiceListener) только кладёт текст в очередь и сразу
+      продолжает слушать, пока ассистент думает и говорит
+    - стадии связаны ограниченными очередями: при переполнении входа
+      выбрасывается самая старая реплика, стадия «думать» ждёт места
+      в очереди речи (backpressure)
+    - ответ LLM идёт потоком: каждое готовое предложение сразу уходит
+      в очередь речи, не дожидаясь конца генерации
+    - каждую стадию можно отменить отдельно (cancel_stage) или всё сразу
+    - nlp/tts можно подключить позже (attach), пока модели грузятся в фоне:
+      ранние реплики ждут в очереди
+    - стадия «говорить» только ставит фразы в очередь TTS-воркера, который
+      синтезирует следующую, пока звучит текущая
+    - barge-in: новая реплика или начало речи пользователя (промежуточная
+      гипотеза из barge_in_min_words слов) обрывает текущий ответ.
+      Подавления эха нет: включать только с гарнитурой/наушниками, иначе
+      ассистент услышит себя из динамиков и перебьёт сам себя
+    - без barge-in микрофон всё равно открыт, поэтому реплики, услышанные
+      пока ассистент говорит (и echo_guard секунд после), считаются эхом
+      и отбрасываются (on_final)
+    """
+
+    STAGES = ("think", "speak")
+
+    def __init__(
+        self,
+        router,
+        skills,
+        nlp,
+        tts,
+        is_online: Callable[[], bool] = lambda: False,
+        on_user_text: Optional[Callable[[str], None]] = None,
+        on_response: Optional[Callable[[str], None]] = None,
+        max_pending: int = 4,
+        session_id: Optional[str] = "voice",
+        barge_in: bool = False,
+        barge_in_min_words: int = 2,
+        echo_guard: float = 0.8,
+    ):
+        self.router = router
+        self.skills = skills
+        self.nlp = None
+        self.tts = None
+        self._ready = {"nlp": threading.Event(), "tts": threading.Event()}
+        self._errors = {}
+        self.attach("nlp", nlp)
+        self.attach("tts", tts)
+        self.is_online = is_online
+        self.on_user_text = on_user_text
+        self.on_response = on_response
+        self.session_id = session_id  # диалог с памятью для голосовых реплик
+        self.barge_in = barge_in
+        self.barge_in_min_words = barge_in_min_words
+        self.echo_guard = echo_guard
+        self._last_speech = float("-inf")  # когда TTS последний раз был занят
+
+        self._queues = {
+            "think": queue.Queue(maxsize=max_pending),
+            "speak": queue.Queue(maxsize=max_pending),
+        }
+        self._current = {stage: None for stage in self.STAGES}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+        self.dropped = 0
+        self.echo_dropped = 0
+        self.interrupted = 0
+
+    # -----------------------------
+    # Жизненный цикл
+    # -----------------------------
+    def start(self):
+        if self._threads:
+            return
+        self._stop_event.clear()
+        for stage, target in (("think", self._think_loop), ("speak", self._speak_loop)):
+            thread = threading.Thread(target=target, name=f"pipeline-{stage}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop_event.set()
+        self.cancel_all()
+        self._threads = []
+
+    def attach(self, name: str, component, error: Exception = None):
+        """
+        Подключает загруженный компонент ("nlp" или "tts").
+        С error — компонент не загрузился, ждущие реплики получат ошибку.
+        """
+        if component is None and error is None:
+            return
+        setattr(self, name, component)
+        self._errors[name] = error
+        self._ready[name].set()
+
+    def is_ready(self, name: str) -> bool:
+        return self._ready[name].is_set()
+
+    # -----------------------------
+    # Вход
+    # -----------------------------
+    def submit(self, text: str) -> Optional[PipelineJob]:
+        """Вызывается из потока распознавания; никогда не блокирует его."""
+        if not text or not text.strip():
+            return None
+
+        job = PipelineJob(text.strip())
+        self._notify(self.on_user_text, job.text)
+        if self.barge_in:
+            # новая реплика важнее недоговорённого ответа
+            self.interrupt()
+
+        q = self._queues["think"]
+        while True:
+            try:
+                q.put_nowait((job, job.text))
+                return job
+            except queue.Full:
+                # ассистент не успевает — самая старая реплика теряет смысл
+                try:
+                    stale, _ = q.get_nowait()
+                    stale.cancel()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    # -----------------------------
+    # Отмена
+    # -----------------------------
+    def cancel_stage(self, stage: str):
+        """Отменяет текущую и ожидающие задачи одной стадии."""
+        with self._lock:
+            job = self._current.get(stage)
+        if job is not None:
+            job.cancel()
+        self._drain(self._queues[stage])
+        if stage == "speak":
+            stop = getattr(self.tts, "stop", None)
+            if stop:
+                try:
+                    stop()
+                except Exception:
+                    pass
+
+    def cancel_all(self):
+        for stage in self.STAGES:
+            self.cancel_stage(stage)
+
+    def interrupt(self):
+        """Пользователь перебил ассистента: обрываем речь и текущий ответ."""
+        if self.is_busy():
+            self.cancel_all()
+            self.interrupted += 1
+
+    def on_partial(self, text: str):
+        """Промежуточная гипотеза STT: пользователь заговорил поверх ответа."""
+        if not self.barge_in:
+            self.hearing_self()  # отмечаем время речи ассистента для on_final
+            return
+        if len(text.split()) >= self.barge_in_min_words:
+            self.interrupt()
+
+    def on_final(self, text: str) -> Optional[PipelineJob]:
+        """
+        Законченная фраза с микрофона. Без barge-in фраза, услышанная
+        во время ответа, — это голос самого ассистента из динамиков.
+        """
+        if not self.barge_in and self.hearing_self():
+            self.echo_dropped += 1
+            return None
+        return self.submit(text)
+
+    def hearing_self(self) -> bool:
+        """TTS говорит сейчас или замолчал меньше echo_guard секунд назад."""
+        now = time.monotonic()
+        if getattr(self.tts, "is_speaking", False):
+            self._last_speech = now
+            return True
+        return now - self._last_speech < self.echo_guard
+
+    def is_busy(self) -> bool:
+        with self._lock:
+            if any(job is not None for job in self._current.values()):
+                return True
+        if any(not q.empty() for q in self._queues.values()):
+            return True
+        return bool(getattr(self.tts, "is_speaking", False))
+
+    def stats(self) -> dict:
+        return {
+            "pending_think": self._queues["think"].qsize(),
+            "pending_speak": self._queues["speak"].qsize(),
+            "dropped": self.dropped,
+            "interrupted": self.interrupted,
+            "echo_dropped": self.echo_dropped,
+        }
+
+    # -----------------------------
+    # Стадии
+    # -----------------------------
+    def _think_loop(self):
+        while not self._stop_event.is_set():
+            job, _ = self._next("think")
+            if job is None:
+                continue
+
+            parts = []
+            try:
+                for chunk in self._respond(job):
+                    if job.cancelled:
+                        break
+                    parts.append(chunk)
+                    self._put("speak", job, chunk)
+            except SchedulerRejected as e:
+                # очередь к модели переполнена или не дождались — говорим как есть
+                if not job.cancelled:
+                    parts.append(str(e))
+                    self._put("speak", job, str(e))
+            except Exception as e:
+                error = f"Ошибка при обработке: {e}"
+                parts.append(error)
+                self._put("speak", job, error)
+            finally:
+                self._set_current("think", None)
+
+            job.response = " ".join(parts)
+            if job.response and not job.cancelled:
+                self._notify(self.on_response, job.response)
+
+    def _speak_loop(self):
+        while not self._stop_event.is_set():
+            job, chunk = self._next("speak")
+            if job is None:
+                continue
+            try:
+                if self._wait_ready("tts", job) and self.tts is not None:
+                    self._speak(job, chunk)
+            except Exception:
+                pass
+            finally:
+                self._set_current("speak", None)
+
+    def _speak(self, job: PipelineJob, chunk: str):
+        enqueue = getattr(self.tts, "enqueue", None)
+        if not chunk.strip():
+            return
+        if enqueue is None:
+            self.tts.speak(chunk)  # синхронный движок
+            return
+        # ждём только места в очереди воркера, а не конца озвучивания
+        while not (job.cancelled or self._stop_event.is_set()):
+            if enqueue(chunk, timeout=0.5) is not None:
+                return
+
+    def _respond(self, job: PipelineJob):
+        """Генератор кусков ответа, готовых к озвучиванию."""
+        try:
+            command = self.router.match(job.text)
+        except Exception:
+            command = None
+        if command is not None and command.skill not in self.skills:
+            command = None  # у навыка нет обработчика — пусть ответит модель
+        job.intent = "command" if command else "chat"
+
+        if command:
+            # навык выполняется в пуле SkillManager; отмена задачи останавливает и его
+            response = self.skills.execute(
+                job.text,
+                is_online=self.is_online(),
+                skill=command.skill,
+                cancelled=lambda: job.cancelled,
+            )
+            if job.cancelled:
+                return
+            yield response or "Команда выполнена."
+            return
+
+        if not self._wait_ready("nlp", job):
+            return
+        if self.nlp is None:
+            yield f"Языковая модель недоступна: {self._errors.get('nlp')}"
+            return
+
+        chunker = SentenceChunker()
+        # каскад: шаблон / малая модель / основная LLM
+        # голосовые реплики — первыми в очереди к модели; отмена задачи снимает и запрос
+        stream = self.nlp.stream_reply(
+            job.text,
+            session_id=self.session_id,
+            priority="interactive",
+            cancelled=lambda: job.cancelled,
+        )
+        try:
+            for delta in stream:
+                if job.cancelled:
+                    return
+                yield from chunker.feed(delta)
+        finally:
+            # закрытие генератора останавливает llama.cpp
+            stream.close()
+
+        rest = chunker.flush()
+        if rest:
+            yield rest
+
+    # -----------------------------
+    # Внутреннее
+    # -----------------------------
+    def _next(self, stage: str):
+        """Берёт (задача, данные) из очереди стадии; (None, None) — ничего нет."""
+        try:
+            job, payload = self._queues[stage].get(timeout=0.5)
+        except queue.Empty:
+            return None, None
+        if job.cancelled:
+            return None, None
+        self._set_current(stage, job)
+        return job, payload
+
+    def _put(self, stage: str, job: PipelineJob, payload):
+        """Ждёт места в очереди стадии, пока задачу не отменили."""
+        q = self._queues[stage]
+        while not (job.cancelled or self._stop_event.is_set()):
+            try:
+                q.put((job, payload), timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _wait_ready(self, name: str, job: PipelineJob) -> bool:
+        """Ждёт загрузки компонента; False — задачу отменили или конвейер остановлен."""
+        event = self._ready[name]
+        while not event.wait(0.5):
+            if job.cancelled or self._stop_event.is_set():
+                return False
+        return not job.cancelled
+
+    def _set_current(self, stage: str, job: Optional[PipelineJob]):
+        with self._lock:
+            self._current[stage] = job
+
+    @staticmethod
+    def _drain(q: queue.Queue):
+        while True:
+            try:
+                job, _ = q.get_nowait()
+                job.cancel()
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def _notify(callback, text: str):
+        if callback:
+            try:
+                callback(text)
+            except Exception:
+                pass
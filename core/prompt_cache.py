@@ -0,0 +1,160 @@
+import hashlib
+import os
+import pickle
+
+
+class PromptPrefixCache:
+    """
+    Кэш вычисленного префикса промпта (системный промпт) для llama.cpp:
+    - префикс вычисляется один раз, его KV-состояние (save_state) хранится
+      в памяти и на диске
+    - ключ: файл модели (имя, размер, дата) + n_ctx + хэш промпта
+    - при старте состояние восстанавливается с диска, и в каждом запросе
+      llama.cpp досчитывает только токены пользователя
+
+    Границы префикса не зависят от формата чата: прогоняются два пробных
+    запроса с разными репликами, общий префикс их токенов и есть
+    «системная часть» промпта.
+    """
+
+    VERSION = 1
+
+    def __init__(self, cache_dir: str = os.path.join("data", "cache", "prompt_state"), enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self._states = {}  # key -> LlamaState
+
+        self.hits = 0
+        self.restores = 0
+
+    # -----------------------------
+    # Ключ
+    # -----------------------------
+    def make_key(self, model_path: str, n_ctx: int, prompt: str) -> str:
+        try:
+            st = os.stat(model_path)
+            model_id = f"{os.path.basename(model_path)}:{st.st_size}:{int(st.st_mtime)}"
+        except OSError:
+            model_id = os.path.basename(model_path)
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        raw = f"v{self.VERSION}|{model_id}|{n_ctx}|{prompt_hash}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    # -----------------------------
+    # Использование
+    # -----------------------------
+    def prepare(self, llm, key: str, warmup) -> bool:
+        """
+        Готовит префикс: память → диск → вычисление через warmup(llm, text).
+        Возвращает True, если состояние префикса есть.
+        """
+        if not self.enabled:
+            return False
+
+        state = self._states.get(key) or self._load(key)
+        if state is None:
+            state = self._compute(llm, warmup)
+            if state is None:
+                return False
+            self._save(key, state)
+        else:
+            try:
+                llm.load_state(state)
+            except Exception as e:
+                print(f"⚠️ Не удалось восстановить кэш промпта: {e}")
+                self._forget(key)
+                return False
+
+        self._states[key] = state
+        return True
+
+    def restore(self, llm, key: str) -> bool:
+        """
+        Перед запросом: если KV модели уже начинается с префикса — ничего не
+        делаем (llama.cpp сам переиспользует совпадение), иначе загружаем его.
+        """
+        state = self._states.get(key)
+        if state is None:
+            return False
+
+        n = state.n_tokens
+        if llm.n_tokens >= n and list(llm.input_ids[:n]) == list(state.input_ids[:n]):
+            self.hits += 1
+            return True
+
+        try:
+            llm.load_state(state)
+            self.restores += 1
+            return True
+        except Exception as e:
+            print(f"⚠️ Не удалось восстановить кэш промпта: {e}")
+            self._states.pop(key, None)
+            return False
+
+    def stats(self) -> dict:
+        return {"prefixes": len(self._states), "hits": self.hits, "restores": self.restores}
+
+    # -----------------------------
+    # Внутреннее
+    # -----------------------------
+    def _compute(self, llm, warmup):
+        try:
+            warmup(llm, "1")
+            first = list(llm.input_ids[: llm.n_tokens])
+            warmup(llm, "2")
+            second = list(llm.input_ids[: llm.n_tokens])
+        except Exception as e:
+            print(f"⚠️ Не удалось вычислить префикс промпта: {e}")
+            return None
+
+        common = 0
+        for a, b in zip(first, second):
+            if a != b:
+                break
+            common += 1
+        if not common:
+            return None
+
+        # оставляем в KV только общий префикс
+        llm.n_tokens = common
+        llm._ctx.kv_cache_seq_rm(-1, common, -1)
+        state = llm.save_state()
+
+        # логиты префикса не нужны: последний токен всегда пересчитывается
+        state.scores = state.scores[-1:, :].copy()
+        return state
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.state")
+
+    def _load(self, key: str):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                payload = pickle.load(f)
+            if payload.get("key") != key:
+                return None
+            return payload["state"]
+        except Exception as e:
+            print(f"⚠️ Кэш промпта повреждён, пересчитываю: {e}")
+            self._forget(key)
+            return None
+
+    def _save(self, key: str, state):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump({"key": key, "state": state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить кэш промпта: {e}")
+
+    def _forget(self, key: str):
+        self._states.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
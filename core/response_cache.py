@@ -0,0 +1,228 @@
+import collections
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+class ResponseCache:
+    """
+    Кэш готовых ответов LLM по точному совпадению нормализованного запроса:
+    - нормализация: регистр, пунктуация, пробелы, ё→е (для каждого языка своя)
+    - ключ: текст + язык + модель + параметры генерации
+    - горячий уровень в памяти (LRU + TTL), постоянный — в SQLite,
+      переживает перезапуск
+    - счётчики попаданий/промахов
+
+    Кэшируются только детерминированные настройки (temperature == 0);
+    ответы с сэмплированием — только если включено cache_sampled.
+    Запросы с историей диалога (session_id, conversation_memory) не кэшируются.
+
+    Кэш включается вручную (enabled): при настройках по умолчанию
+    (temperature 0.7, голос с памятью диалога) ему нечего кэшировать.
+    Полезен для API без session_id с temperature 0 или cache_sampled.
+    """
+
+    DEFAULTS = {
+        "enabled": False,
+        "max_entries": 512,
+        "ttl_seconds": 7 * 24 * 3600,
+        "cache_sampled": False,
+        "persistent": True,
+        "path": os.path.join("data", "cache", "responses.sqlite3"),
+        "max_disk_entries": 20000,
+    }
+
+    _PUNCT = re.compile(r"[^\w\s]", re.UNICODE)
+    _SPACES = re.compile(r"\s+")
+
+    def __init__(self, config: dict = None):
+        settings = dict(self.DEFAULTS)
+        settings.update((config or {}).get("response_cache", {}) or {})
+        self.settings = settings
+
+        self.enabled = bool(settings["enabled"])
+        self.max_entries = int(settings["max_entries"])
+        self.ttl = float(settings["ttl_seconds"])
+        self.cache_sampled = bool(settings["cache_sampled"])
+        self.max_disk_entries = int(settings["max_disk_entries"])
+
+        self._memory = collections.OrderedDict()  # key -> (ответ, время записи)
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+        if self.enabled and settings["persistent"]:
+            self._open_db(settings["path"])
+
+    # -----------------------------
+    # Ключ
+    # -----------------------------
+    @staticmethod
+    def guess_language(text: str) -> str:
+        """Грубое определение по письменности — для нормализации и ключа."""
+        for ch in text:
+            if "\u0400" <= ch <= "\u04ff":
+                return "cyrl"
+            if "\u0600" <= ch <= "\u06ff":
+                return "arab"
+            if "\u4e00" <= ch <= "\u9fff":
+                return "hani"
+            if ch.isalpha():
+                return "latn"
+        return ""
+
+    @classmethod
+    def normalize(cls, text: str, language: str = "") -> str:
+        text = unicodedata.normalize("NFKC", text).casefold()
+        if language in ("ru", "cyrl"):
+            text = text.replace("ё", "е")
+        elif language in ("uz", "latn"):
+            # узбекская латиница: oʻ / o‘ / o' пишут по-разному
+            text = re.sub(r"[ʻʼ‘’`']", "", text)
+        text = cls._PUNCT.sub(" ", text)
+        return cls._SPACES.sub(" ", text).strip()
+
+    def make_key(self, text: str, model: str, params: dict, language: str = None) -> str:
+        if language is None:
+            language = self.guess_language(text)
+        raw = json.dumps(
+            [self.normalize(text, language), language, os.path.basename(model or ""), params],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, params: dict) -> bool:
+        if not self.enabled:
+            return False
+        return float(params.get("temperature", 1.0)) == 0.0 or self.cache_sampled
+
+    # -----------------------------
+    # Чтение / запись
+    # -----------------------------
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                response, created = item
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._memory[key]
+                self.expired += 1
+
+            row = self._db_get(key, now)
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created = row
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, response, created)
+            return response
+
+    def put(self, key: str, response: str):
+        if not response:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            self._db_put(key, response, now)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+    # -----------------------------
+    # Внутреннее
+    # -----------------------------
+    def _remember(self, key: str, response: str, created: float):
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _open_db(self, path: str):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON responses(last_used)")
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            self._db.commit()
+        except Exception as e:
+            print(f"⚠️ Кэш ответов на диске недоступен: {e}")
+            self._db = None
+
+    def _db_get(self, key: str, now: float):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created = row
+            if now - created > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self.expired += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return response, created
+        except Exception as e:
+            print(f"⚠️ Ошибка чтения кэша ответов: {e}")
+            return None
+
+    def _db_put(self, key: str, response: str, now: float):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            # держим размер таблицы в пределах — выкидываем давно не использованные
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+            self._db.commit()
+        except Exception as e:
+            print(f"⚠️ Ошибка записи кэша ответов: {e}")
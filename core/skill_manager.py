@@ -1,27 +1,214 @@
-﻿import os
+﻿import concurrent.futures
 import datetime
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+from core.intent_matcher import IntentMatcher
+from core.intent_router import load_intents
+
+
+class SkillContext:
+    """То, что получает обработчик навыка: текст команды, сеть и флаг отмены."""
+
+    def __init__(self, text: str, is_online: bool = False):
+        self.text = text
+        self.is_online = is_online
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+
+class Skill:
+    def __init__(self, name: str, handler: Callable[[SkillContext], str], timeout: float):
+        self.name = name
+        self.handler = handler
+        self.timeout = timeout
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
 
 
 class SkillManager:
     """
-    Примитивные локальные команды:
+    Реестр локальных навыков:
+    - навык регистрирует обработчик; триггеры по умолчанию — шаблоны его
+      навыка из intents.json (тот же файл, что у IntentRouter)
+    - IntentRouter может назвать навык, у которого нет обработчика
+      (open, launch, ...): такие реплики конвейер отдаёт в разговор
+    - выбор навыка — поиск по словарю (имя навыка от IntentRouter) или один
+      проход автомата по триггерам, поэтому новые навыки не замедляют остальные
+    - каждый навык выполняется в пуле потоков с таймаутом и отменой;
+      поток конвейера не блокируется
+    - файловые операции выполняются в процессе (без shell), внешние
+      программы запускаются неблокирующим subprocess
+
+    Встроенные навыки:
     - сказать время
     - очистить временные файлы
     - открыть текущую папку
     """
 
-    def execute(self, command: str, is_online: bool = False) -> str:
-        cmd = command.lower()
+    DEFAULT_TIMEOUT = 10.0
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        tmp_dir: str = os.path.join("data", "tmp"),
+        intents_path: str = os.path.join("config", "intents.json"),
+    ):
+        self.tmp_dir = tmp_dir
+        self._skills = {}
+        self._matcher = IntentMatcher()
+        self._lock = threading.Lock()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="skill")
+
+        # навык -> [(шаблон, язык, вес, exact)] из intents.json
+        self._intent_patterns = {}
+        for entry in load_intents(intents_path):
+            if entry.get("intent") != "command" or not entry.get("skill"):
+                continue
+            patterns = self._intent_patterns.setdefault(entry["skill"], [])
+            for language, texts in (entry.get("patterns") or {}).items():
+                for text in texts:
+                    patterns.append((text, language, entry.get("weight", 1.0), entry.get("exact", False)))
 
-        if "время" in cmd:
-            return f"Сейчас {datetime.datetime.now().strftime('%H:%M')}"
+        self.register("time", self._skill_time, timeout=1.0)
+        self.register("clear_temp", self._skill_clear_temp)
+        self.register("open_folder", self._skill_open_folder, timeout=3.0)
 
-        if "очисти временные" in cmd or "очисти временные файлы" in cmd:
-            os.system('del /q data\\tmp\\*')
+    # -----------------------------
+    # Реестр
+    # -----------------------------
+    def register(self, name: str, handler: Callable[[SkillContext], str], triggers: list = None, timeout: float = None):
+        """
+        Добавляет (или заменяет) навык; триггеры попадают в общий автомат.
+        Без triggers — шаблоны навыка из intents.json.
+        """
+        with self._lock:
+            self._skills[name] = Skill(name, handler, timeout or self.DEFAULT_TIMEOUT)
+            if triggers is None:
+                for text, language, weight, exact in self._intent_patterns.get(name, []):
+                    self._matcher.add(text, "skill", skill=name, language=language, weight=weight, exact=exact)
+            else:
+                for trigger in triggers:
+                    self._matcher.add(trigger, "skill", skill=name)
+            self._matcher.build()
+
+    def skills(self) -> list:
+        return sorted(self._skills)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._skills
+
+    def resolve(self, text: str, skill: str = None) -> Optional[Skill]:
+        """Навык по имени (от IntentRouter) или, без имени, по триггерам в тексте."""
+        if skill:
+            return self._skills.get(skill)
+        found = self._matcher.match(text)
+        return self._skills.get(found.skill) if found else None
+
+    # -----------------------------
+    # Выполнение
+    # -----------------------------
+    def submit(self, command: str, is_online: bool = False, skill: str = None):
+        """Запускает навык в пуле: (навык, контекст, future) или None, если навыка нет."""
+        found = self.resolve(command, skill)
+        if found is None:
+            return None
+        context = SkillContext(command, is_online)
+        found.calls += 1
+        return found, context, self._pool.submit(found.handler, context)
+
+    def execute(
+        self,
+        command: str,
+        is_online: bool = False,
+        skill: str = None,
+        cancelled: Callable[[], bool] = None,
+    ) -> str:
+        """
+        Выполняет навык и ждёт результат не дольше его таймаута.
+        cancelled() — внешний флаг отмены (например, задача конвейера отменена).
+        """
+        submitted = self.submit(command, is_online, skill)
+        if submitted is None:
+            return "Команда не распознана."
+        found, context, future = submitted
+
+        deadline = time.monotonic() + found.timeout
+        while True:
+            try:
+                return future.result(timeout=min(0.1, max(deadline - time.monotonic(), 0.0)))
+            except concurrent.futures.TimeoutError:
+                if cancelled is not None and cancelled():
+                    context.cancel()
+                    future.cancel()
+                    return ""
+                if time.monotonic() >= deadline:
+                    context.cancel()
+                    future.cancel()
+                    found.timeouts += 1
+                    return "Команда выполняется слишком долго и была остановлена."
+            except Exception as e:
+                found.errors += 1
+                return f"Ошибка навыка: {e}"
+
+    def stats(self) -> dict:
+        return {
+            name: {"calls": s.calls, "timeouts": s.timeouts, "errors": s.errors}
+            for name, s in self._skills.items()
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # -----------------------------
+    # Встроенные навыки
+    # -----------------------------
+    @staticmethod
+    def _skill_time(context: SkillContext) -> str:
+        return f"Сейчас {datetime.datetime.now().strftime('%H:%M')}"
+
+    def _skill_clear_temp(self, context: SkillContext) -> str:
+        if not os.path.isdir(self.tmp_dir):
             return "Временные файлы очищены."
+        removed = 0
+        failed = 0
+        # как del /q: только файлы, вложенные папки не трогаем
+        with os.scandir(self.tmp_dir) as entries:
+            for entry in entries:
+                if context.cancelled:
+                    break
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError:
+                    failed += 1
+        if failed:
+            return f"Временные файлы очищены ({removed}), не удалось удалить: {failed}."
+        return "Временные файлы очищены."
+
+    def _skill_open_folder(self, context: SkillContext) -> str:
+        launch(["explorer", os.path.abspath(".")] if sys.platform == "win32" else ["xdg-open", os.path.abspath(".")])
+        return "Открываю текущую папку."
 
-        if "папку" in cmd or "открой папку" in cmd:
-            os.system("start explorer .")
-            return "Открываю текущую папку."
 
-        return "Команда не распознана."
+def launch(args: list):
+    """Запускает внешнюю программу, не дожидаясь её завершения."""
+    kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    return subprocess.Popen(args, close_fds=True, **kwargs)
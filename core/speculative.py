@@ -0,0 +1,206 @@
+import os
+import threading
+
+import numpy as np
+
+
+class SpeculativeStats:
+    """Счётчики спекулятивного декодирования и скорости генерации."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.drafts = 0
+        self.proposed = 0
+        self.accepted = 0
+        self.requests = 0
+        self.generated_tokens = 0
+        self.generation_seconds = 0.0
+
+    def record_draft(self, proposed: int, accepted: int):
+        with self._lock:
+            self.drafts += 1
+            self.proposed += proposed
+            self.accepted += accepted
+
+    def record_generation(self, tokens: int, seconds: float):
+        with self._lock:
+            self.requests += 1
+            self.generated_tokens += tokens
+            self.generation_seconds += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "generated_tokens": self.generated_tokens,
+                "tokens_per_second": round(self.generated_tokens / self.generation_seconds, 2)
+                if self.generation_seconds else 0.0,
+                "drafts": self.drafts,
+                "proposed_tokens": self.proposed,
+                "accepted_tokens": self.accepted,
+                "acceptance_rate": round(self.accepted / self.proposed, 3) if self.proposed else 0.0,
+            }
+
+
+class TrackingDraft:
+    """
+    Обёртка над черновой моделью llama.cpp: считает, сколько предложенных
+    токенов основная модель приняла. Предложение сверяется при следующем
+    вызове — к этому моменту в input_ids уже лежат принятые токены.
+    """
+
+    def __init__(self, draft, stats: SpeculativeStats, mode: str):
+        self.draft = draft
+        self.stats = stats
+        self.mode = mode
+        self._pending = None  # (позиция начала предложения, токены)
+
+    def begin(self):
+        """Новая генерация: незакрытое предложение прошлой не считаем."""
+        self._pending = None
+
+    def __call__(self, input_ids, /, **kwargs):
+        if self._pending is not None:
+            start, proposal = self._pending
+            actual = input_ids[start:]
+            accepted = 0
+            for a, b in zip(proposal, actual):
+                if int(a) != int(b):
+                    break
+                accepted += 1
+            self.stats.record_draft(len(proposal), accepted)
+
+        proposal = self.draft(input_ids, **kwargs)
+        self._pending = (len(input_ids), [int(t) for t in proposal]) if len(proposal) else None
+        return proposal
+
+
+class GgufDraftModel:
+    """
+    Черновик от маленькой GGUF-модели того же семейства (общий словарь):
+    жадно предсказывает num_pred_tokens токенов, совпадающий с прошлым
+    вызовом префикс берётся из её KV-кэша.
+    """
+
+    def __init__(self, model_path: str, num_pred_tokens: int = 4, n_ctx: int = 2048, n_threads: int = None):
+        from llama_cpp import Llama
+
+        self.model_path = model_path
+        self.num_pred_tokens = num_pred_tokens
+        self.llm = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, verbose=False)
+        self._eos = self.llm.token_eos()
+
+    def n_vocab(self) -> int:
+        return self.llm.n_vocab()
+
+    def __call__(self, input_ids, /, **kwargs):
+        llm = self.llm
+        tokens = [int(t) for t in input_ids]
+        # место под черновик в контексте
+        room = llm.n_ctx() - len(tokens)
+        count = min(self.num_pred_tokens, room)
+        if count <= 0:
+            return np.array([], dtype=np.intc)
+
+        common = 0
+        for a, b in zip(llm.input_ids[: llm.n_tokens], tokens):
+            if int(a) != b:
+                break
+            common += 1
+        # последний токен пересчитываем всегда — нужны его логиты
+        llm.n_tokens = min(common, len(tokens) - 1)
+        llm.eval(tokens[llm.n_tokens:])
+
+        draft = []
+        for _ in range(count):
+            token = int(np.argmax(llm.scores[llm.n_tokens - 1]))
+            if token == self._eos:
+                break
+            draft.append(token)
+            if len(draft) < count:
+                llm.eval([token])
+        return np.array(draft, dtype=np.intc)
+
+
+class SpeculativeDecoding:
+    """
+    Спекулятивное декодирование llama.cpp (по умолчанию выключено):
+    - prompt_lookup — черновик из n-грамм уже имеющегося текста (промпт,
+      история диалога), без дополнительной модели
+    - draft_model — маленькая GGUF-модель того же семейства; при другом
+      словаре откатываемся на prompt_lookup
+    Основная модель проверяет черновик одним пакетом и сэмплирует каждую
+    позицию из своих логитов, поэтому ответ тот же, что и без ускорения
+    (при temperature 0 — тот же самый текст, с точностью до округления
+    пакетного вычисления).
+    """
+
+    DEFAULTS = {
+        "enabled": False,
+        "mode": "prompt_lookup",
+        "draft_model": "",
+        "num_pred_tokens": 10,
+        "max_ngram_size": 2,
+        "draft_tokens": 4,
+    }
+
+    MODES = ("prompt_lookup", "draft_model")
+
+    def __init__(self, config: dict = None, models_root: str = os.path.join("models", "llm")):
+        settings = dict(self.DEFAULTS)
+        settings.update((config or {}).get("llm_speculative", {}) or {})
+        self.settings = settings
+        self.models_root = models_root
+
+        self.enabled = bool(settings["enabled"])
+        self.mode = settings["mode"] if settings["mode"] in self.MODES else "prompt_lookup"
+        self.stats = SpeculativeStats()
+
+    def make_draft(self, target_path: str):
+        """Черновая модель для загрузки основной (None — выключено)."""
+        if not self.enabled:
+            return None
+
+        if self.mode == "draft_model":
+            draft_path = os.path.join(self.models_root, self.settings["draft_model"] or "")
+            if not self.settings["draft_model"] or not os.path.exists(draft_path):
+                print(f"⚠️ Черновая модель не найдена ({draft_path}), использую prompt lookup")
+            elif os.path.abspath(draft_path) == os.path.abspath(target_path):
+                print("⚠️ Черновая модель совпадает с основной, использую prompt lookup")
+            else:
+                try:
+                    print(f"🧠 Загружаю черновую модель: {draft_path}")
+                    draft = GgufDraftModel(draft_path, num_pred_tokens=int(self.settings["draft_tokens"]))
+                    return TrackingDraft(draft, self.stats, "draft_model")
+                except Exception as e:
+                    print(f"⚠️ Черновая модель не загрузилась ({e}), использую prompt lookup")
+
+        return TrackingDraft(self._prompt_lookup(), self.stats, "prompt_lookup")
+
+    def validate(self, llm):
+        """После загрузки: словарь черновой модели должен совпадать с основной."""
+        draft = getattr(llm, "draft_model", None)
+        if not isinstance(draft, TrackingDraft) or not isinstance(draft.draft, GgufDraftModel):
+            return
+        if draft.draft.n_vocab() != llm.n_vocab():
+            print("⚠️ У черновой модели другой словарь, использую prompt lookup")
+            llm.draft_model = TrackingDraft(self._prompt_lookup(), self.stats, "prompt_lookup")
+
+    @staticmethod
+    def begin(llm):
+        draft = getattr(llm, "draft_model", None)
+        if isinstance(draft, TrackingDraft):
+            draft.begin()
+
+    @staticmethod
+    def active_mode(llm) -> str:
+        draft = getattr(llm, "draft_model", None)
+        return draft.mode if isinstance(draft, TrackingDraft) else "off"
+
+    def _prompt_lookup(self):
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+
+        return LlamaPromptLookupDecoding(
+            max_ngram_size=int(self.settings["max_ngram_size"]),
+            num_pred_tokens=int(self.settings["num_pred_tokens"]),
+        )
@@ -0,0 +1,151 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import psutil
+
+
+REPORT_PATH = os.path.join("logs", "startup_profile.json")
+
+
+class StartupProfiler:
+    """
+    Профиль запуска приложения:
+    - фазы (импорты, конфиг, реестр, STT, LLM, TTS, первый кадр окна)
+      с временем начала, длительностью и RSS до/после
+    - отметки (mark) — моменты времени без длительности, например «окно
+      показано» или «все модели готовы»
+    - фазы могут идти параллельно в разных потоках (фоновая загрузка моделей)
+    - отчёт в JSON (logs/startup_profile.json) для сравнения между версиями
+
+    Время отсчитывается от импорта модуля; сколько процесс жил до этого
+    (запуск интерпретатора), пишется отдельно в process_start_offset_ms.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_wall = time.time()
+        self._process = psutil.Process()
+        self._phases = []
+        self._marks = {}
+        self._lock = threading.Lock()
+        self.peak_rss = self._rss()
+
+    # -----------------------------
+    # Запись
+    # -----------------------------
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Замеряет блок кода: with PROFILER.phase("config"): ..."""
+        rss_before = self._rss()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            end = time.perf_counter()
+            rss_after = self._rss()
+            entry = {
+                "name": name,
+                "start_ms": self._ms(start - self.started),
+                "duration_ms": self._ms(end - start),
+                "rss_before_mb": self._mb(rss_before),
+                "rss_after_mb": self._mb(rss_after),
+                "rss_delta_mb": self._mb(rss_after - rss_before),
+                "thread": threading.current_thread().name,
+            }
+            if error:
+                entry["error"] = error
+            with self._lock:
+                self._phases.append(entry)
+                self.peak_rss = max(self.peak_rss, rss_after)
+
+    def mark(self, name: str):
+        """Отмечает момент (повторная отметка с тем же именем игнорируется)."""
+        rss = self._rss()
+        with self._lock:
+            if name in self._marks:
+                return
+            self._marks[name] = {
+                "at_ms": self._ms(time.perf_counter() - self.started),
+                "rss_mb": self._mb(rss),
+            }
+            self.peak_rss = max(self.peak_rss, rss)
+
+    def elapsed_ms(self) -> float:
+        return self._ms(time.perf_counter() - self.started)
+
+    # -----------------------------
+    # Отчёт
+    # -----------------------------
+    def report(self) -> dict:
+        rss = self._rss()
+        with self._lock:
+            phases = sorted(self._phases, key=lambda p: p["start_ms"])
+            marks = dict(self._marks)
+            peak = max(self.peak_rss, rss)
+
+        try:
+            offset = self._ms(self.started_wall - self._process.create_time())
+        except Exception:
+            offset = None
+
+        return {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "pid": os.getpid(),
+            "process_start_offset_ms": offset,
+            "total_ms": self.elapsed_ms(),
+            "rss_mb": self._mb(rss),
+            "peak_rss_mb": self._mb(peak),
+            "phases": phases,
+            "marks": marks,
+        }
+
+    def save(self, path: str = REPORT_PATH, report: dict = None) -> dict:
+        if report is None:
+            report = self.report()
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить профиль запуска: {e}")
+        return report
+
+    def reset(self):
+        """Начинает новый замер (повторный «тёплый» запуск в том же процессе)."""
+        with self._lock:
+            self.started = time.perf_counter()
+            self.started_wall = time.time()
+            self._phases = []
+            self._marks = {}
+            self.peak_rss = self._rss()
+
+    # -----------------------------
+    # Внутреннее
+    # -----------------------------
+    def _rss(self) -> int:
+        try:
+            return self._process.memory_info().rss
+        except Exception:
+            return 0
+
+    @staticmethod
+    def _ms(seconds: float) -> float:
+        return round(seconds * 1000.0, 2)
+
+    @staticmethod
+    def _mb(value: int) -> float:
+        return round(value / (1024 * 1024), 1)
+
+
+# Общий профиль процесса: импортируется первым в main.py
+PROFILER = StartupProfiler()
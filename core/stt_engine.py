@@ -1,59 +1,349 @@
-﻿import sounddevice as sd
-import vosk
+﻿import vosk
+import io
 import json
-import queue
 import os
-from langdetect import detect
+import threading
+import wave
+
+import numpy as np
+
+from core.audio_buffer import AudioRingBuffer
+from core.model_pool import VoskModelPool
+from core.multilang_decoder import LanguageResult, MultiLanguageDecoder
+from core.vad import VoiceActivityDetector
 
 
 class SpeechToText:
-    def __init__(self, config):
-        self.language = config.get("language", "ru")
+    # Модели для разных языков — ИМЕННО ТАК, КАК НАЗВАНЫ ПАПКИ У ТЕБЯ
+    MODEL_DIRS = {
+        "ru": "vosk-model-ru-0.42",
+        "uz": "vosk-model-small-uz-0.22",
+        "en": "vosk-model-en-us-0.15",          # ← исправлено (без small)
+        "ar": "vosk-model-ar-0.22-linto-1.1.0",
+        "cn": "vosk-model-cn-0.22",
+    }
 
-        # Модели для разных языков — ИМЕННО ТАК, КАК НАЗВАНЫ ПАПКИ У ТЕБЯ
-        model_dir = {
-            "ru": "vosk-model-ru-0.42",
-            "uz": "vosk-model-small-uz-0.22",
-            "en": "vosk-model-en-us-0.15",          # ← исправлено (без small)
-            "ar": "vosk-model-ar-0.22-linto-1.1.0",
-            "cn": "vosk-model-cn-0.22",
-        }
+    # Fallback по умолчанию — НОВАЯ русская модель
+    DEFAULT_LANGUAGE = "ru"
 
-        # Fallback по умолчанию — НОВАЯ русская модель
-        default_model = "vosk-model-ru-0.42"
+    def __init__(self, config):
+        self.language = config.get("language", self.DEFAULT_LANGUAGE)
 
-        model_name = model_dir.get(self.language, default_model)
-        self.model_path = os.path.join("models", "stt", model_name)
+        model_dir = self.model_dirs(config)
+        if self.language not in model_dir:
+            self.language = self.DEFAULT_LANGUAGE
 
-        if not os.path.exists(self.model_path):
-            raise FileNotFoundError(f"Модель не найдена: {self.model_path}")
+        # Пул: модели грузятся по первому обращению, лишние выгружаются по LRU
+        pool_cfg = config.get("stt_pool", {}) or {}
+        self.pool = VoskModelPool(
+            os.path.join("models", "stt"),
+            model_dir,
+            memory_budget_mb=pool_cfg.get("memory_budget_mb", 0),
+        )
+        self.model_path = self.pool.model_path(self.language)
+        self.model = self.pool.get(self.language)
+        self.pool.pin(self.language)
+        self._lang_lock = threading.Lock()
+
+        # Остальные «горячие» языки подгружаем в фоне
+        preload = [lang for lang in pool_cfg.get("preload", []) if lang != self.language]
+        if preload:
+            self.pool.preload(preload)
 
-        self.model = vosk.Model(self.model_path)
-        self.q = queue.Queue()
         self.sample_rate = config.get("sample_rate", 16000)
 
+        # Захват: мелкие блоки (20–30 мс) в заранее выделенный кольцевой буфер
+        audio_cfg = config.get("audio", {}) or {}
+        block_ms = audio_cfg.get("block_ms", 30)
+        buffer_seconds = audio_cfg.get("buffer_seconds", 10)
+        self.block_size = max(1, int(self.sample_rate * block_ms / 1000))
+        self.buffer = AudioRingBuffer(
+            self.block_size,
+            max(1, int(buffer_seconds * 1000 / block_ms)),
+        )
+
+        # VAD: в распознаватель идёт только речь, тишина отбрасывается
+        self.vad = VoiceActivityDetector(config, self.sample_rate)
+
+        # Постоянная сессия (см. start_stream / stop_stream)
+        self._stream = None
+        self._recognizer = None
+        self._stop_event = threading.Event()
+
+        # Автоопределение языка: фраза параллельно распознаётся несколькими
+        # моделями, язык-победитель закрепляется, пока уверенность не упадёт.
+        # Нужен VAD — именно он отмечает границы фразы.
+        langid_cfg = config.get("language_id", {}) or {}
+        candidates = [
+            lang for lang in langid_cfg.get("candidates", ["ru", "uz", "en"])
+            if lang in model_dir and os.path.exists(self.pool.model_path(lang))
+        ]
+        self.pin_confidence = langid_cfg.get("pin_confidence", 0.8)
+        self.drop_confidence = langid_cfg.get("drop_confidence", 0.6)
+        self.text_tie_margin = langid_cfg.get("text_tie_margin", 0.05)
+        self.langid = None
+        self.candidates = candidates
+        self._pinned_language = self.language
+        if config.get("auto_language_detect", False) and self.vad.enabled and len(candidates) > 1:
+            self.langid = MultiLanguageDecoder(
+                self.pool,
+                self.sample_rate,
+                candidates,
+                max_workers=langid_cfg.get("max_workers") or None,
+            )
+            self._pinned_language = None
+            self.pool.preload([lang for lang in candidates if lang != self.language])
+
+    @classmethod
+    def model_dirs(cls, config: dict) -> dict:
+        """Язык → папка модели: languages_supported из settings.json дополняет/переопределяет таблицу."""
+        model_dir = dict(cls.MODEL_DIRS)
+        model_dir.update(config.get("languages_supported", {}) or {})
+        return model_dir
+
     def _callback(self, indata, frames, time, status):
-        self.q.put(bytes(indata))
+        self.buffer.write(indata, bool(status and status.input_overflow))
 
-    def listen_and_recognize(self):
+    # -----------------------------
+    # Язык
+    # -----------------------------
+    def set_language(self, lang: str):
+        """
+        Переключает язык распознавания без перезапуска.
+        Модель берётся из пула (загружается при первом обращении),
+        в открытой сессии распознаватель пересоздаётся на лету.
+        """
+        if lang == self.language:
+            return
+
+        model = self.pool.get(lang)
+        with self._lang_lock:
+            self.pool.unpin(self.language)
+            self.pool.pin(lang)
+            self.language = lang
+            self.model = model
+            self.model_path = self.pool.model_path(lang)
+            if self._recognizer is not None:
+                self._recognizer = self._new_recognizer()
+
+    def _new_recognizer(self):
+        rec = vosk.KaldiRecognizer(self.model, self.sample_rate)
+        # слова с conf нужны для оценки уверенности при автоопределении языка
+        rec.SetWords(True)
+        return rec
+
+    # -----------------------------
+    # Готовый звук (файлы, клиенты сервера)
+    # -----------------------------
+    def new_recognizer(self, language: str = None, sample_rate: int = None):
+        """Отдельный распознаватель со своим состоянием; модель — общая из пула."""
+        rec = vosk.KaldiRecognizer(self.pool.get(language or self.language), sample_rate or self.sample_rate)
+        rec.SetWords(True)
+        return rec
+
+    def transcribe(self, pcm: bytes, sample_rate: int = None, language: str = None) -> LanguageResult:
+        """
+        Распознаёт записанный звук (16 бит, моно).
+        language="auto" — все языки автоопределения, побеждает самый уверенный.
+        """
+        if language == "auto":
+            languages = self.candidates or [self.language]
+        else:
+            languages = [language or self.language]
+
+        results = []
+        for lang in languages:
+            rec = self.new_recognizer(lang, sample_rate)
+            results.append(MultiLanguageDecoder.parse_result(lang, self.decode_all(rec, pcm)))
+        results.sort(key=lambda r: r.confidence, reverse=True)
+        return self._break_tie(results)
+
+    @staticmethod
+    def decode_all(rec, pcm: bytes, chunk_bytes: int = 8000) -> dict:
+        """
+        Прогоняет весь звук через распознаватель. Vosk сам режет длинную
+        запись на фразы — собираем текст и слова всех фраз.
+        """
+        texts, words = [], []
+
+        def collect(raw: str):
+            result = json.loads(raw)
+            if result.get("text"):
+                texts.append(result["text"])
+                words.extend(result.get("result", []) or [])
+
+        for start in range(0, len(pcm), chunk_bytes):
+            if rec.AcceptWaveform(pcm[start:start + chunk_bytes]):
+                collect(rec.Result())
+        collect(rec.FinalResult())
+        return {"text": " ".join(texts), "result": words}
+
+    @staticmethod
+    def pcm_from_wav(data: bytes):
+        """WAV → (16-битный моно PCM, частота). Стерео сводится в моно."""
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError("нужен WAV 16 бит PCM")
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+        if channels > 1:
+            samples = np.frombuffer(frames, dtype="<i2").reshape(-1, channels)
+            frames = samples.mean(axis=1).astype("<i2").tobytes()
+        return frames, rate
+
+    def _pin_language(self, lang: str):
+        if lang != self.language:
+            print(f"🌐 Язык распознавания: {lang}")
+        self.set_language(lang)
+        self._pinned_language = lang
+
+    def _finish_detection(self):
+        """Фраза распознана всеми языками — выбираем самый уверенный."""
+        results = self.langid.finish()
+        if not results:
+            return MultiLanguageDecoder.parse_result(self.language, "{}")
+        best = self._break_tie(results)
+        if best.text and best.confidence >= self.pin_confidence:
+            self._pin_language(best.language)
+        return best
+
+    def _break_tie(self, results: list):
+        return MultiLanguageDecoder.break_tie(results, self.text_tie_margin)
+
+    def _finish_pinned(self, raw: str, segment: list):
+        """
+        Итог фразы на закреплённом языке. Если уверенность упала —
+        перепроверяем эту же фразу на всех языках и снимаем закрепление.
+        """
+        result = MultiLanguageDecoder.parse_result(self.language, raw)
+        if self.langid is None or not result.text or result.confidence >= self.drop_confidence:
+            return result
+
+        self._pinned_language = None
+        results = self.langid.decode(b"".join(segment))
+        if results and results[0].confidence > result.confidence:
+            result = self._break_tie(results)
+
+        if result.confidence >= self.pin_confidence:
+            self._pin_language(result.language)
+        return result
+
+    # -----------------------------
+    # Потоковая сессия распознавания
+    # -----------------------------
+    @property
+    def is_streaming(self) -> bool:
+        return self._stream is not None
+
+    def start_stream(self):
         """
-        Слушает микрофон, распознаёт речь.
-        (Автоопределение языка можно доработать позже, сейчас главное — стабильная работа.)
+        Открывает микрофон и распознаватель один раз на всю сессию.
+        Поток и KaldiRecognizer живут до stop_stream(), поэтому речь между
+        фразами не теряется и нет задержки на их пересоздание.
         """
-        with sd.RawInputStream(
+        if self._stream is not None:
+            return
+
+        # старые блоки от прошлой сессии не нужны
+        self.buffer.clear()
+
+        self._recognizer = self._new_recognizer()
+        self.vad.reset()
+        if self.langid is not None:
+            self.langid.reset()
+        self._stop_event.clear()
+
+        # микрофон нужен только живому режиму — пакетное распознавание
+        # (tools/batch_transcribe.py) работает и без звуковой подсистемы
+        import sounddevice as sd
+
+        stream = sd.RawInputStream(
             samplerate=self.sample_rate,
-            blocksize=8000,
+            blocksize=self.block_size,
             dtype="int16",
             channels=1,
             callback=self._callback,
-        ):
-            rec = vosk.KaldiRecognizer(self.model, self.sample_rate)
-
-            while True:
-                data = self.q.get()
-                if rec.AcceptWaveform(data):
-                    result = json.loads(rec.Result())
-                    text = result.get("text", "").strip()
-                    if not text:
-                        continue
-                    return text
+        )
+        stream.start()
+        self._stream = stream
+
+    def stop_stream(self):
+        """Закрывает микрофон и завершает генератор stream_results()."""
+        self._stop_event.set()
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception:
+                pass
+
+    def stream_results(self, timeout: float = 0.5):
+        """
+        Генератор результатов текущей сессии:
+        - ("partial", text) — промежуточная гипотеза (только при изменении)
+        - ("final", text)   — законченная фраза
+        Завершается после stop_stream().
+        """
+        last_partial = ""
+        segment = []  # звук текущей фразы — для перепроверки на других языках
+
+        while not self._stop_event.is_set():
+            data = self.buffer.read(timeout)
+            if data is None:
+                continue
+
+            if self._recognizer is None:
+                break
+
+            for event, chunk in self.vad.process(data):
+                detecting = self.langid is not None and self._pinned_language is None
+
+                if event == "end":
+                    # VAD сам определил конец фразы — забираем итог сразу
+                    last_partial = ""
+                    if detecting and self.langid.active:
+                        result = self._finish_detection()
+                    else:
+                        result = self._finish_pinned(self._recognizer.FinalResult(), segment)
+                    segment = []
+                    if result.text:
+                        yield "final", result.text
+                    continue
+
+                if self.langid is not None:
+                    segment.append(chunk)
+
+                if detecting:
+                    if not self.langid.active:
+                        self.langid.start()
+                    self.langid.accept(chunk)
+                    continue
+
+                rec = self._recognizer
+                if rec.AcceptWaveform(chunk):
+                    last_partial = ""
+                    result = self._finish_pinned(rec.Result(), segment)
+                    segment = []
+                    if result.text:
+                        yield "final", result.text
+                else:
+                    partial = json.loads(rec.PartialResult()).get("partial", "").strip()
+                    if partial and partial != last_partial:
+                        last_partial = partial
+                        yield "partial", partial
+
+    def listen_and_recognize(self):
+        """
+        Слушает микрофон, распознаёт одну фразу.
+        Использует постоянную сессию: если она ещё не открыта — открывает
+        и оставляет работать (закрывается через stop_stream()).
+        При auto_language_detect язык выбирается по уверенности распознавания.
+        """
+        self.start_stream()
+
+        for kind, text in self.stream_results():
+            if kind == "final":
+                return text
+        return None
@@ -0,0 +1,73 @@
+import re
+
+
+class SentenceChunker:
+    """
+    Режет поток текста от LLM на куски для озвучивания:
+    - законченное предложение (. ! ? …) отдаётся сразу
+    - длинное предложение режется по запятой/точке с запятой/тире,
+      чтобы синтез начинался, не дожидаясь его конца
+    - совсем длинный кусок без знаков режется по пробелу
+    """
+
+    SENTENCE_END = re.compile(r"[.!?…]+[\"»”')\]]*\s+")
+    CLAUSE_END = re.compile(r"(?:[,;:]|\s[—–-])\s+")
+
+    # Сокращения, после которых точка не означает конец предложения
+    ABBREVIATIONS = {
+        "т.е", "т.д", "т.п", "т.к", "др", "г", "гг", "см", "стр", "им", "ул", "д",
+        "e.g", "i.e", "mr", "mrs", "dr", "vs", "etc",
+    }
+
+    def __init__(self, min_chars: int = 12, clause_chars: int = 80, max_chars: int = 200):
+        self.min_chars = min_chars
+        self.clause_chars = clause_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, delta: str) -> list:
+        """Добавляет новый фрагмент и возвращает готовые куски (может быть пусто)."""
+        if not delta:
+            return []
+        self._buffer += delta
+
+        chunks = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            chunk, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:].lstrip()
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def flush(self) -> str:
+        """Возвращает остаток текста после окончания генерации."""
+        rest, self._buffer = self._buffer.strip(), ""
+        return rest
+
+    def _find_cut(self):
+        text = self._buffer
+
+        for m in self.SENTENCE_END.finditer(text):
+            if m.end() < self.min_chars or self._is_abbreviation(text, m.start()):
+                continue
+            return m.end()
+
+        if len(text) >= self.clause_chars:
+            for m in self.CLAUSE_END.finditer(text, self.min_chars):
+                return m.end()
+
+        if len(text) >= self.max_chars:
+            space = text.rfind(" ", self.min_chars, self.max_chars)
+            return space + 1 if space > 0 else self.max_chars
+
+        return None
+
+    def _is_abbreviation(self, text: str, dot_pos: int) -> bool:
+        if text[dot_pos] != ".":
+            return False
+        start = dot_pos
+        while start > 0 and not text[start - 1].isspace():
+            start -= 1
+        return text[start:dot_pos].lower() in self.ABBREVIATIONS
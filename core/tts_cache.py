@@ -0,0 +1,236 @@
+import collections
+import hashlib
+import io
+import json
+import os
+import threading
+import wave
+
+import numpy as np
+
+
+class AudioClip:
+    """Готовый фрагмент речи: PCM-сэмплы и частота дискретизации."""
+
+    def __init__(self, samples: np.ndarray, sample_rate: int):
+        self.samples = samples
+        self.sample_rate = sample_rate
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.samples.nbytes)
+
+    def to_wav(self) -> bytes:
+        buffer = io.BytesIO()
+        channels = 1 if self.samples.ndim == 1 else self.samples.shape[1]
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(self.samples.astype("<i2").tobytes())
+        return buffer.getvalue()
+
+    @classmethod
+    def from_wav(cls, data: bytes) -> "AudioClip":
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            width = wav.getsampwidth()
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+        if width == 2:
+            samples = np.frombuffer(frames, dtype="<i2")
+        elif width == 1:
+            samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8
+        else:
+            raise ValueError(f"неподдерживаемый формат WAV: {width * 8} бит")
+        if channels > 1:
+            samples = samples.reshape(-1, channels)
+        return cls(samples, rate)
+
+
+class AudioCache:
+    """
+    Кэш синтезированной речи:
+    - ключ: текст + голос + скорость
+    - горячий уровень в памяти (LRU, ограничен по мегабайтам) с готовыми сэмплами
+    - постоянный уровень — WAV-файлы на диске (LRU по времени последнего
+      использования, ограничен по мегабайтам), переживает перезапуск
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        "path": os.path.join("data", "cache", "tts"),
+        "max_disk_mb": 128,
+        "max_memory_mb": 16,
+        "max_text_chars": 300,
+        "prerender": True,
+    }
+
+    def __init__(self, config: dict = None):
+        settings = dict(self.DEFAULTS)
+        settings.update((config or {}).get("tts_cache", {}) or {})
+        self.settings = settings
+
+        self.enabled = bool(settings["enabled"])
+        self.path = settings["path"]
+        self.max_disk_bytes = int(float(settings["max_disk_mb"]) * 1024 * 1024)
+        self.max_memory_bytes = int(float(settings["max_memory_mb"]) * 1024 * 1024)
+        self.max_text_chars = int(settings["max_text_chars"])
+
+        self._memory = collections.OrderedDict()  # key -> AudioClip
+        self._memory_bytes = 0
+        self._disk = collections.OrderedDict()    # key -> размер файла (старые первыми)
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.enabled:
+            self._scan_disk()
+
+    # -----------------------------
+    # Ключ
+    # -----------------------------
+    @staticmethod
+    def make_key(text: str, voice: str, rate) -> str:
+        raw = json.dumps([" ".join(text.split()), voice or "", rate], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, text: str) -> bool:
+        # длинные ответы LLM почти не повторяются — их озвучиваем сразу
+        return self.enabled and 0 < len(text.strip()) <= self.max_text_chars
+
+    def file_for(self, key: str) -> str:
+        return os.path.join(self.path, key + ".wav")
+
+    # -----------------------------
+    # Чтение / запись
+    # -----------------------------
+    def get(self, key: str):
+        with self._lock:
+            clip = self._memory.get(key)
+            if clip is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return clip
+            if key not in self._disk:
+                self.misses += 1
+                return None
+
+        path = self.file_for(key)
+        try:
+            with open(path, "rb") as f:
+                clip = AudioClip.from_wav(f.read())
+            os.utime(path)
+        except Exception as e:
+            print(f"⚠️ Повреждённый файл кэша речи, удаляю: {e}")
+            self._forget(key)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._disk.move_to_end(key)
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, clip)
+        return clip
+
+    def put(self, key: str, wav_path: str):
+        """Переносит синтезированный WAV в кэш и возвращает AudioClip."""
+        with open(wav_path, "rb") as f:
+            clip = AudioClip.from_wav(f.read())
+        target = self.file_for(key)
+        os.makedirs(self.path, exist_ok=True)
+        os.replace(wav_path, target)
+        size = os.path.getsize(target)
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._disk_bytes += size
+            evicted = self._evict_disk()
+            self._remember(key, clip)
+        for old in evicted:
+            self._remove_file(old)
+        return clip
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._disk)
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._disk.clear()
+            self._disk_bytes = 0
+        for key in keys:
+            self._remove_file(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_mb": round(self._memory_bytes / (1024 * 1024), 2),
+                "disk_entries": len(self._disk),
+                "disk_mb": round(self._disk_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+    # -----------------------------
+    # Внутреннее
+    # -----------------------------
+    def _scan_disk(self):
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            files = []
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(".wav"):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        except Exception as e:
+            print(f"⚠️ Кэш речи на диске недоступен: {e}")
+            return
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self._disk_bytes += size
+        for old in self._evict_disk():
+            self._remove_file(old)
+
+    def _remember(self, key: str, clip: AudioClip):
+        if clip.nbytes > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old.nbytes
+        self._memory[key] = clip
+        self._memory_bytes += clip.nbytes
+        while self._memory_bytes > self.max_memory_bytes:
+            _, dropped = self._memory.popitem(last=False)
+            self._memory_bytes -= dropped.nbytes
+
+    def _evict_disk(self) -> list:
+        evicted = []
+        while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            evicted.append(key)
+        return evicted
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(key, 0)
+            clip = self._memory.pop(key, None)
+            if clip is not None:
+                self._memory_bytes -= clip.nbytes
+        self._remove_file(key)
+
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self.file_for(key))
+        except OSError:
+            pass
@@ -1,17 +1,84 @@
-﻿import pyttsx3
-from langdetect import detect
+﻿import os
+import queue
+import sys
+import threading
+
+import pyttsx3
+import sounddevice as sd
+
+from core.language_id import LANGUAGE_ID
+from core.tts_cache import AudioCache, AudioClip
+
+
+class Utterance:
+    """Фраза в очереди озвучивания."""
+
+    def __init__(self, text: str, generation: int, play: bool = True):
+        self.text = text
+        self.generation = generation
+        self.play = play  # False — только синтез (synthesize)
+        self.clip = None
+        self.done = threading.Event()  # проиграна или отменена
+
 
 class TextToSpeech:
     """
     Локальный синтез речи с автоопределением языка.
     Работает полностью офлайн.
+
+    Язык определяется общим LanguageIdentifier, голос для каждого языка
+    выбирается один раз при запуске (индекс язык → голос).
+
+    Два своих потока:
+    - синтез: единственный владелец движка pyttsx3, рендерит фразы из
+      очереди в WAV (save_to_file)
+    - воспроизведение: проигрывает готовый звук через sounddevice
+    Пока звучит фраза N, синтезируется N+1. enqueue() не блокирует
+    вызывающего (кроме переполненной очереди), stop() сразу обрывает
+    звук и выбрасывает всё, что ждёт в очереди.
+
+    Короткие фразы кэшируются (core/tts_cache.py): повторная фраза с тем
+    же голосом и скоростью проигрывается сразу, без синтеза. Частые
+    служебные ответы синтезируются заранее, пока очередь пуста.
     """
 
+    PRERENDER = [
+        "Я ничего не услышал.",
+        "Команда не распознана.",
+        "Команда выполнена.",
+        "Временные файлы очищены.",
+        "Открываю текущую папку.",
+    ]
+
+    QUEUE_SIZE = 8   # фраз в очереди синтеза
+    PREFETCH = 1     # готовых фраз, ждущих воспроизведения
+
     def __init__(self, config):
         self.config = config
-        self.engine = pyttsx3.init()
         self.voice_gender = config.get("voice", "female")
-        self._setup_default_voice()
+        self.cache = AudioCache(config)
+        self.engine = None
+        self.default_voice = None
+        self.voice_index = {}
+
+        self._synth_queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._play_queue = queue.Queue(maxsize=self.PREFETCH)
+        self._prerender = list(self.PRERENDER) if self.cache.enabled and self.cache.settings["prerender"] else []
+        self._generation = 0
+        self._play_lock = threading.Lock()
+        self._playing = None
+        self._saying = False
+        self._stop_event = threading.Event()
+        self._ready = threading.Event()
+        self._init_error = None
+
+        # движок создаётся в потоке синтеза и используется только им
+        threading.Thread(target=self._synth_loop, name="tts-synth", daemon=True).start()
+        threading.Thread(target=self._play_loop, name="tts-play", daemon=True).start()
+        self._ready.wait()
+        if self._init_error is not None:
+            self._stop_event.set()
+            raise self._init_error
 
     def _setup_default_voice(self):
         """Выбираем подходящий голос по умолчанию"""
@@ -22,33 +89,244 @@ class TextToSpeech:
                 return
         self.engine.setProperty("voice", voices[0].id)
 
-    def _set_voice_by_language(self, lang_code: str):
-        """Подбирает голос по языку (ru, en, ar, uz)"""
-        voices = self.engine.getProperty("voices")
+    # соответствие языков
+    LANGUAGE_TAGS = {
+        "ru": ["ru", "russian"],
+        "en": ["en", "english"],
+        "uz": ["uz", "uzbek"],
+        "ar": ["ar", "arabic"],
+        "cn": ["zh", "chinese"],
+    }
 
-        # соответствие языков
-        lang_map = {
-            "ru": ["ru", "russian"],
-            "en": ["en", "english"],
-            "uz": ["uz", "uzbek"],
-            "ar": ["ar", "arabic"]
-        }
+    def _build_voice_index(self) -> dict:
+        """Язык → id голоса; голоса перебираются один раз при запуске."""
+        want_female = "female" in self.voice_gender
+        index = {}
+        for v in self.engine.getProperty("voices"):
+            name = (v.name or "").lower()
+            # espeak отдаёт языки байтами вида b"\x05en-us"
+            codes = [
+                (lang.decode("utf-8", "ignore") if isinstance(lang, bytes) else str(lang)).strip("\x00\x05").lower()
+                for lang in (getattr(v, "languages", None) or [])
+            ]
+            gender_match = ("female" in (getattr(v, "gender", None) or name).lower()) == want_female
+            for lang, (code, word) in self.LANGUAGE_TAGS.items():
+                if not (any(c.startswith(code) for c in codes) or word in name):
+                    continue
+                # при нескольких голосах одного языка — первый с нужным полом
+                if lang not in index or (gender_match and not index[lang][0]):
+                    index[lang] = (gender_match, v.id)
+        return {lang: voice for lang, (_, voice) in index.items()}
 
-        for v in voices:
-            name = v.name.lower()
-            for key, tags in lang_map.items():
-                if lang_code.startswith(key) or any(t in name for t in tags):
-                    self.engine.setProperty("voice", v.id)
-                    return True
-        return False
+    def _set_voice_by_language(self, lang_code: str) -> bool:
+        """Ставит голос для языка (ru, en, ar, uz, cn) из готового индекса."""
+        voice = self.voice_index.get(lang_code, self.default_voice)
+        if voice != self.engine.getProperty("voice"):
+            self.engine.setProperty("voice", voice)
+        return lang_code in self.voice_index
+
+    def _select_voice(self, text: str):
+        self._set_voice_by_language(LANGUAGE_ID.detect(text))
+
+    # -----------------------------
+    # Публичное
+    # -----------------------------
+    def enqueue(self, text: str, timeout: float = None):
+        """
+        Ставит фразу в очередь и сразу возвращает Utterance
+        (None — пустой текст или очередь так и не освободилась за timeout).
+        """
+        if not text or not text.strip():
+            return None
+        item = Utterance(text.strip(), self._generation)
+        try:
+            self._synth_queue.put(item, timeout=timeout)
+        except queue.Full:
+            return None
+        return item
 
     def speak(self, text: str):
-        """Озвучивает текст на нужном языке"""
+        """Озвучивает текст на нужном языке и ждёт окончания (или stop())."""
+        item = self.enqueue(text)
+        if item is not None:
+            item.done.wait()
+
+    def synthesize(self, text: str, timeout: float = None):
+        """Синтез без воспроизведения: AudioClip или None (ошибка, stop(), таймаут)."""
+        if not text or not text.strip():
+            return None
+        item = Utterance(text.strip(), self._generation, play=False)
         try:
-            lang = detect(text)
-            self._set_voice_by_language(lang)
-        except Exception:
-            pass  # fallback на стандартный голос
+            self._synth_queue.put(item, timeout=timeout)
+        except queue.Full:
+            return None
+        item.done.wait(timeout)
+        return item.clip
 
-        self.engine.say(text)
-        self.engine.runAndWait()
+    @property
+    def is_speaking(self) -> bool:
+        return self._playing is not None or not self._synth_queue.empty() or not self._play_queue.empty()
+
+    def stop(self):
+        """Прерывает текущее озвучивание и очищает очередь."""
+        with self._play_lock:
+            self._generation += 1
+            try:
+                sd.stop()
+            except Exception:
+                pass
+        for q in (self._synth_queue, self._play_queue):
+            self._drain(q)
+        if self._saying:
+            # фраза озвучивается напрямую (say), а не из готового звука
+            try:
+                self.engine.stop()
+            except Exception:
+                pass
+
+    def close(self):
+        self._stop_event.set()
+        self.stop()
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+
+    # -----------------------------
+    # Поток синтеза
+    # -----------------------------
+    def _synth_loop(self):
+        try:
+            if sys.platform == "win32":
+                import comtypes  # SAPI5: COM нужен в потоке, который владеет движком
+                comtypes.CoInitialize()
+            self.engine = pyttsx3.init()
+            self._setup_default_voice()
+            self.default_voice = self.engine.getProperty("voice")
+            self.voice_index = self._build_voice_index()
+        except Exception as e:
+            self._init_error = e
+            return
+        finally:
+            self._ready.set()
+
+        while not self._stop_event.is_set():
+            try:
+                item = self._synth_queue.get(timeout=0.2)
+            except queue.Empty:
+                # очередь пуста — готовим частые фразы заранее
+                if self._prerender:
+                    self._prerender_one(self._prerender.pop(0))
+                continue
+
+            if item.generation != self._generation:
+                item.done.set()
+                continue
+            try:
+                self._select_voice(item.text)
+                item.clip = self._clip_for(item.text)
+            except Exception as e:
+                print(f"⚠️ Ошибка синтеза речи: {e}")
+
+            if not item.play:
+                item.done.set()
+                continue
+            if item.clip is None:
+                # синтез в файл не удался — говорим напрямую, дождавшись тишины
+                self._play_queue.join()
+                if item.generation == self._generation:
+                    self._saying = True
+                    try:
+                        self.engine.say(item.text)
+                        self.engine.runAndWait()
+                    except Exception as e:
+                        print(f"⚠️ Ошибка озвучивания: {e}")
+                    finally:
+                        self._saying = False
+                item.done.set()
+                continue
+            self._put_play(item)
+
+    def _put_play(self, item: Utterance):
+        # очередь воспроизведения короткая: синтез опережает звук на PREFETCH фраз
+        while not self._stop_event.is_set():
+            if item.generation != self._generation:
+                item.done.set()
+                return
+            try:
+                self._play_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _prerender_one(self, text: str):
+        try:
+            self._select_voice(text)
+            self._clip_for(text)
+        except Exception as e:
+            print(f"⚠️ Не удалось подготовить фразу «{text}»: {e}")
+
+    def _clip_for(self, text: str):
+        key = self.cache.make_key(text, self.engine.getProperty("voice"), self.engine.getProperty("rate"))
+        if self.cache.is_cacheable(text):
+            clip = self.cache.get(key)
+            if clip is not None:
+                return clip
+        return self._render(text, key)
+
+    def _render(self, text: str, key: str):
+        """Синтез в WAV через pyttsx3; короткие фразы сохраняются в кэш."""
+        os.makedirs(self.cache.path, exist_ok=True)
+        tmp_path = os.path.join(self.cache.path, f"{key}.{threading.get_ident()}.tmp.wav")
+        try:
+            self.engine.save_to_file(text, tmp_path)
+            self.engine.runAndWait()
+            if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
+                return None
+            if self.cache.is_cacheable(text):
+                return self.cache.put(key, tmp_path)
+            with open(tmp_path, "rb") as f:
+                return AudioClip.from_wav(f.read())
+        except Exception as e:
+            print(f"⚠️ Ошибка синтеза речи в файл: {e}")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    # -----------------------------
+    # Поток воспроизведения
+    # -----------------------------
+    def _play_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                item = self._play_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                with self._play_lock:
+                    # stop() мог сработать, пока фраза ждала в очереди
+                    if item.generation != self._generation:
+                        continue
+                    self._playing = item
+                    sd.play(item.clip.samples, item.clip.sample_rate)
+                sd.wait()
+            except Exception as e:
+                print(f"⚠️ Ошибка воспроизведения: {e}")
+            finally:
+                self._playing = None
+                item.done.set()
+                self._play_queue.task_done()
+
+    @staticmethod
+    def _drain(q: queue.Queue):
+        while True:
+            try:
+                item = q.get_nowait()
+            except queue.Empty:
+                return
+            item.done.set()
+            if q.unfinished_tasks:
+                q.task_done()
@@ -0,0 +1,130 @@
+import collections
+
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """
+    Детектор речи (VAD) перед KaldiRecognizer:
+    - режет поток int16 на кадры и считает энергию (RMS) и частоту
+      пересечений нуля (ZCR) сразу для всех кадров через NumPy
+    - пропускает в распознаватель только речь + паддинг до и после
+    - сам сообщает о конце фразы после паузы (hangover)
+
+    Настройки берутся из settings.json, раздел "vad".
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        "frame_ms": 30,
+        "energy_threshold": 0.01,  # RMS в долях от полной шкалы int16
+        "noise_ratio": 3.0,        # порог = max(energy_threshold, шум * noise_ratio)
+        "zcr_max": 0.35,           # выше — скорее шум/шипение, чем голос
+        "min_speech_ms": 90,       # столько речи подряд нужно, чтобы начать фразу
+        "hangover_ms": 600,        # столько тишины подряд завершает фразу
+        "padding_ms": 300,         # сколько звука до начала речи отдать распознавателю
+    }
+
+    def __init__(self, config: dict = None, sample_rate: int = 16000):
+        settings = dict(self.DEFAULTS)
+        settings.update((config or {}).get("vad", {}) or {})
+        self.settings = settings
+
+        self.enabled = bool(settings["enabled"])
+        self.sample_rate = sample_rate
+        self.frame_len = max(1, int(sample_rate * settings["frame_ms"] / 1000))
+        self.energy_threshold = float(settings["energy_threshold"])
+        self.noise_ratio = float(settings["noise_ratio"])
+        self.zcr_max = float(settings["zcr_max"])
+
+        frame_ms = settings["frame_ms"]
+        self.min_speech_frames = max(1, int(round(settings["min_speech_ms"] / frame_ms)))
+        self.hangover_frames = max(1, int(round(settings["hangover_ms"] / frame_ms)))
+        self.padding_frames = max(0, int(round(settings["padding_ms"] / frame_ms)))
+
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает состояние (новая сессия микрофона)."""
+        self._remainder = np.zeros(0, dtype=np.int16)
+        self._preroll = collections.deque(maxlen=self.padding_frames + self.min_speech_frames)
+        self._in_speech = False
+        self._speech_run = 0
+        self._silence_run = 0
+        self._noise_floor = None
+
+    @property
+    def in_speech(self) -> bool:
+        return self._in_speech
+
+    def _classify(self, frames: np.ndarray) -> np.ndarray:
+        """Возвращает маску речевых кадров для матрицы (кадры × отсчёты)."""
+        samples = frames.astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frames.shape[1] - 1 or 1)
+
+        # Адаптивный уровень шума: обновляем только по тихим кадрам
+        quiet = rms[rms < self.energy_threshold]
+        if quiet.size:
+            level = float(np.median(quiet))
+            if self._noise_floor is None:
+                self._noise_floor = level
+            else:
+                self._noise_floor = 0.95 * self._noise_floor + 0.05 * level
+
+        threshold = self.energy_threshold
+        if self._noise_floor is not None:
+            threshold = max(threshold, self._noise_floor * self.noise_ratio)
+
+        return (rms >= threshold) & (zcr <= self.zcr_max)
+
+    def process(self, data):
+        """
+        Принимает блок PCM int16 (bytes/memoryview/ndarray) и выдаёт события:
+        - ("speech", bytes) — звук, который нужно отдать распознавателю
+        - ("end", None)     — фраза закончилась, пора забирать результат
+        """
+        if not self.enabled:
+            yield "speech", bytes(data)
+            return
+
+        block = np.frombuffer(data, dtype=np.int16) if not isinstance(data, np.ndarray) else data
+        if self._remainder.size:
+            block = np.concatenate((self._remainder, block))
+
+        n_frames = block.size // self.frame_len
+        used = n_frames * self.frame_len
+        self._remainder = block[used:].copy()
+        if not n_frames:
+            return
+
+        frames = block[:used].reshape(n_frames, self.frame_len)
+        is_speech = self._classify(frames)
+
+        # Непрерывные куски речи отдаём одним вызовом, а не по кадру
+        pending = []
+
+        for frame, speech in zip(frames, is_speech):
+            if not self._in_speech:
+                # копия: исходный буфер может быть переиспользован
+                self._preroll.append(frame.copy())
+                self._speech_run = self._speech_run + 1 if speech else 0
+                if self._speech_run >= self.min_speech_frames:
+                    self._in_speech = True
+                    self._silence_run = 0
+                    pending.extend(self._preroll)
+                    self._preroll.clear()
+                continue
+
+            pending.append(frame)
+            self._silence_run = 0 if speech else self._silence_run + 1
+            if self._silence_run >= self.hangover_frames:
+                yield "speech", np.concatenate(pending).tobytes()
+                pending = []
+                yield "end", None
+                self._in_speech = False
+                self._speech_run = 0
+
+        if pending:
+            yield "speech", np.concatenate(pending).tobytes()
@@ -1,44 +1,60 @@
 import threading
-from typing import Callable
+from typing import Callable, Optional
 
 
 class VoiceListener:
     """
     Фоновый голосовой слушатель:
-    - постоянно вызывает stt.listen_and_recognize()
-    - при получении текста вызывает callback(text)
+    - держит одну потоковую сессию stt (микрофон + распознаватель)
+    - при получении законченной фразы вызывает callback(text)
+    - промежуточные гипотезы отдаёт в on_partial(text), если он задан
     """
 
-    def __init__(self, stt_engine, on_text: Callable[[str], None]):
+    def __init__(
+        self,
+        stt_engine,
+        on_text: Callable[[str], None],
+        on_partial: Optional[Callable[[str], None]] = None,
+    ):
         self.stt_engine = stt_engine
         self.on_text = on_text
+        self.on_partial = on_partial
         self._stop_event = threading.Event()
         self._thread = None
 
     def _loop(self):
         while not self._stop_event.is_set():
             try:
-                text = self.stt_engine.listen_and_recognize()
+                self.stt_engine.start_stream()
+                for kind, text in self.stt_engine.stream_results():
+                    if self._stop_event.is_set():
+                        break
+                    if not text:
+                        continue
+
+                    callback = self.on_text if kind == "final" else self.on_partial
+                    if callback:
+                        try:
+                            callback(text)
+                        except Exception:
+                            # не даём потоку упасть
+                            continue
             except Exception as e:
                 # при желании можно логировать в файл
-                continue
-
-            if not text:
-                continue
-
-            if self.on_text:
-                try:
-                    self.on_text(text)
-                except Exception:
-                    # не даём потоку упасть
-                    continue
+                # сессия сломалась (например, отключили микрофон) — переоткрываем
+                self.stt_engine.stop_stream()
+                self._stop_event.wait(1.0)
 
     def start(self):
         if self._thread and self._thread.is_alive():
-            return
+            if not self._stop_event.is_set():
+                return
+            # предыдущий поток ещё выходит из сессии — дожидаемся
+            self._thread.join(timeout=2.0)
         self._stop_event.clear()
         self._thread = threading.Thread(target=self._loop, daemon=True)
         self._thread.start()
 
     def stop(self):
         self._stop_event.set()
+        self.stt_engine.stop_stream()
@@ -1,6 +1,6 @@
 import json
 import os
-from PyQt6.QtCore import Qt, pyqtSignal, QObject
+from PyQt6.QtCore import Qt, pyqtSignal, QObject, QTimer
 from PyQt6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -13,38 +13,47 @@ from PyQt6.QtWidgets import (
     QMessageBox,
 )
 
-from core.stt_engine import SpeechToText
-from core.tts_engine import TextToSpeech
-from core.nlp_engine import NlpProcessor
 from core.intent_router import IntentRouter
 from core.skill_manager import SkillManager
 from core.license_manager import LicenseManager
 from core.network_manager import NetworkManager
 from core.voice_listener import VoiceListener
+from core.pipeline import VoicePipeline
+from core.component_loader import ComponentLoader
+from core.startup_profiler import PROFILER
 from core.autostart_manager import add_autostart, remove_autostart, is_autostart_enabled
 
 
 class GuiSignals(QObject):
     append_log = pyqtSignal(str)
     update_net_status = pyqtSignal(bool)
+    component_status = pyqtSignal(str, str, str)
 
 
 class VoiceAssistantGUI(QMainWindow):
-    def __init__(self, config: dict, parent=None):
+    # Все компоненты загружены (или не загрузились); аргумент — профиль запуска
+    startup_finished = pyqtSignal(dict)
+
+    def __init__(self, config: dict, parent=None, factories: dict = None):
         super().__init__(parent)
         self.setWindowTitle("Power Voice — Мультиязычный ИИ Голосовой Ассистент")
         self.resize(900, 600)
 
         self.config = config
+        # фабрики компонентов можно подменить (бенчмарк запуска со заглушками)
+        self.factories = factories or {}
         self.is_listening = False
         self.is_online = False
 
         self.signals = GuiSignals()
         self.signals.append_log.connect(self._append_log)
         self.signals.update_net_status.connect(self._update_network_label)
+        self.signals.component_status.connect(self._on_component_status)
 
-        self._init_ui()
-        self._init_ai()
+        with PROFILER.phase("ui"):
+            self._init_ui()
+        with PROFILER.phase("ai_init"):
+            self._init_ai()
 
     # -----------------------------
     # UI
@@ -63,7 +72,11 @@ class VoiceAssistantGUI(QMainWindow):
         self.license_label = QLabel("Лицензия: проверка...")
         self.license_label.setAlignment(Qt.AlignmentFlag.AlignRight)
 
+        self.models_label = QLabel()
+        self.models_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
         status_layout.addWidget(self.net_label)
+        status_layout.addWidget(self.models_label)
         status_layout.addWidget(self.license_label)
 
         # Лог
@@ -95,16 +108,14 @@ class VoiceAssistantGUI(QMainWindow):
     # AI инициализация
     # -----------------------------
     def _init_ai(self):
-        try:
-            self.stt = SpeechToText(self.config)
-        except Exception as e:
-            QMessageBox.warning(self, "Ошибка STT", f"Не удалось загрузить модель речи:\n{e}")
-            self.stt = None
-
-        self.tts = TextToSpeech(self.config)
-        self.nlp = NlpProcessor(self.config)
-        self.router = IntentRouter()
-        self.skills = SkillManager()
+        # Модели (STT, TTS, LLM) грузятся в фоне — окно показывается сразу
+        self.stt = None
+        self.tts = None
+        self.nlp = None
+        self.voice_listener = None
+
+        self.router = IntentRouter(self.config)
+        self.skills = SkillManager(intents_path=self.router.intents_path)
         self.license = LicenseManager(self.config)
 
         self.license_label.setText(f"Лицензия: {self.license.get_status()}")
@@ -113,13 +124,90 @@ class VoiceAssistantGUI(QMainWindow):
         self.network = NetworkManager(check_interval=600)
         self.network.start(callback=self._on_network_status_changed)
 
-        # Слушатель
-        if self.stt:
-            self.voice_listener = VoiceListener(self.stt, self._on_voice_text)
-        else:
-            self.voice_listener = None
-
-        self._append_log("🤖 Ассистент готов к работе.")
+        # Конвейер: роутер/NLP и TTS работают в своих потоках,
+        # поэтому микрофон не простаивает, пока ассистент думает и говорит.
+        # NLP и TTS подключаются по мере загрузки, реплики до этого ждут в очереди
+        barge_in = self.config.get("barge_in", {}) or {}
+        self.pipeline = VoicePipeline(
+            self.router,
+            self.skills,
+            None,
+            None,
+            is_online=lambda: self.is_online,
+            on_user_text=lambda t: self.signals.append_log.emit(f"👤 Вы: {t}"),
+            on_response=lambda t: self.signals.append_log.emit(f"🤖 Ассистент: {t}"),
+            # без памяти диалога ответы могут браться из кэша ответов
+            session_id="voice" if self.config.get("conversation_memory", True) else None,
+            # перебивать голосом — только с гарнитурой (эхо не подавляется)
+            barge_in=barge_in.get("enabled", False),
+            barge_in_min_words=barge_in.get("min_words", 2),
+            echo_guard=barge_in.get("echo_guard_ms", 800) / 1000.0,
+        )
+        self.pipeline.start()
+
+        self.loader = ComponentLoader(on_status=self.signals.component_status.emit)
+        self.loader.add("stt", self._profiled("stt_load", self.factories.get("stt", self._load_stt)))
+        self.loader.add("tts", self._profiled("tts_init", self.factories.get("tts", self._load_tts)))
+        self.loader.add("nlp", self._profiled("llm_load", self.factories.get("nlp", self._load_nlp)))
+        self._update_models_label()
+        self.loader.start()
+
+        self._append_log("⏳ Модели загружаются в фоне...")
+
+    @staticmethod
+    def _profiled(phase: str, factory):
+        def load():
+            with PROFILER.phase(phase):
+                return factory()
+        return load
+
+    # Тяжёлые библиотеки (vosk, llama_cpp, pyttsx3) импортируются только здесь,
+    # в фоновых потоках загрузчика
+    def _load_stt(self):
+        from core.stt_engine import SpeechToText
+        return SpeechToText(self.config)
+
+    def _load_tts(self):
+        from core.tts_engine import TextToSpeech
+        return TextToSpeech(self.config)
+
+    def _load_nlp(self):
+        from core.nlp_engine import NlpProcessor
+        return NlpProcessor(self.config, router=self.router)
+
+    def _on_component_status(self, name: str, status: str, detail: str):
+        if status == ComponentLoader.READY:
+            component = self.loader.get(name, timeout=0)
+            setattr(self, name, component)
+            if name == "stt":
+                self.voice_listener = VoiceListener(self.stt, self._on_voice_text, on_partial=self.pipeline.on_partial)
+            else:
+                self.pipeline.attach(name, component)
+            self._append_log(f"✅ {name.upper()} загружен ({self.loader.timings().get(name, 0):.1f} с).")
+        elif status == ComponentLoader.ERROR:
+            if name == "stt":
+                QMessageBox.warning(self, "Ошибка STT", f"Не удалось загрузить модель речи:\n{detail}")
+            else:
+                self.pipeline.attach(name, None, self.loader.error(name))
+            self._append_log(f"❌ {name.upper()} не загружен: {detail}")
+
+        self._update_models_label()
+        if all(s in (ComponentLoader.READY, ComponentLoader.ERROR) for s in self.loader.statuses().values()):
+            PROFILER.mark("models_ready")
+            report = PROFILER.report()
+            self._append_log(f"🤖 Ассистент готов к работе ({report['total_ms'] / 1000:.1f} с).")
+            self.startup_finished.emit(report)
+
+    def _update_models_label(self):
+        icons = {
+            ComponentLoader.PENDING: "⏳",
+            ComponentLoader.LOADING: "⏳",
+            ComponentLoader.READY: "✅",
+            ComponentLoader.ERROR: "❌",
+        }
+        statuses = self.loader.statuses()
+        parts = [f"{name.upper()} {icons[statuses.get(name, ComponentLoader.PENDING)]}" for name in ("stt", "tts", "nlp")]
+        self.models_label.setText("Модели: " + " ".join(parts))
 
     # -----------------------------
     # Автозапуск
@@ -174,7 +262,11 @@ class VoiceAssistantGUI(QMainWindow):
     # Прослушивание
     # -----------------------------
     def _start_listening(self):
-        if self.is_listening or not self.voice_listener:
+        if self.is_listening:
+            return
+        if not self.voice_listener:
+            if not self.loader.is_ready("stt") and self.loader.status("stt") != ComponentLoader.ERROR:
+                self._append_log("⏳ STT ещё загружается, подождите...")
             return
         self.is_listening = True
         self.btn_listen.setText("⏸ Остановить прослушивание")
@@ -201,29 +293,8 @@ class VoiceAssistantGUI(QMainWindow):
     def _on_voice_text(self, text: str):
         if not text.strip():
             return
-        self.signals.append_log.emit(f"👤 Вы: {text}")
-
-        try:
-            intent = self.router.detect_intent(text)
-        except Exception:
-            intent = "chat"
-
-        try:
-            if intent == "command":
-                response = self.skills.execute(text, is_online=self.is_online)
-                if not response:
-                    response = "Команда выполнена."
-            else:
-                response = self.nlp.generate_response(text)
-        except Exception as e:
-            response = f"Ошибка при обработке: {e}"
-
-        self.signals.append_log.emit(f"🤖 Ассистент: {response}")
-
-        try:
-            self.tts.speak(response)
-        except Exception:
-            pass
+        # только ставим в очередь — поток распознавания сразу слушает дальше
+        self.pipeline.on_final(text)
 
     # -----------------------------
     # Лог
@@ -240,20 +311,27 @@ class VoiceAssistantGUI(QMainWindow):
                 self.voice_listener.stop()
         except Exception:
             pass
+        try:
+            self.pipeline.stop()
+        except Exception:
+            pass
         try:
             self.network.stop()
         except Exception:
             pass
+        try:
+            self.skills.shutdown()
+        except Exception:
+            pass
+        try:
+            if self.tts:
+                self.tts.close()
+        except Exception:
+            pass
         event.accept()
 
 
-def start_gui():
-    import sys
-    try:
-        from gui.tray_icon import TrayManager
-    except Exception:
-        TrayManager = None
-
+def _read_config() -> dict:
     config_path = os.path.join("config", "settings.json")
     if not os.path.exists(config_path) or os.path.getsize(config_path) == 0:
         config = {
@@ -278,9 +356,26 @@ def start_gui():
         except Exception:
             config = {}
 
-    app = QApplication(sys.argv)
+    return config
+
+
+def start_gui(config: dict = None):
+    import sys
+    try:
+        from gui.tray_icon import TrayManager
+    except Exception:
+        TrayManager = None
+
+    if config is None:
+        config = _read_config()
+
+    with PROFILER.phase("qt_app"):
+        app = QApplication(sys.argv)
     window = VoiceAssistantGUI(config)
     if TrayManager:
         tray = TrayManager(app, window)
+    window.startup_finished.connect(lambda report: PROFILER.save(report=report))
     window.show()
+    # первый кадр: отложенный вызов выполнится, когда цикл событий отрисует окно
+    QTimer.singleShot(0, lambda: PROFILER.mark("first_frame"))
     sys.exit(app.exec())
@@ -114,6 +114,10 @@ class TrayManager:
                 self.main_window.voice_listener.stop()
             except Exception:
                 pass
+            try:
+                self.main_window.pipeline.stop()
+            except Exception:
+                pass
             try:
                 self.main_window.network.stop()
             except Exception:
@@ -1,23 +1,63 @@
-﻿from core.autostart_manager import (
-    load_config,
-    ensure_autostart,
-    log_startup,
-    show_notification,
-)
-from gui.main_window import start_gui
+﻿import argparse
 
+from core.startup_profiler import PROFILER
 
-if __name__ == "__main__":
-    # Загружаем настройки
-    config = load_config()
+with PROFILER.phase("imports"):
+    from core.autostart_manager import (
+        load_config,
+        ensure_autostart,
+        log_startup,
+        show_notification,
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Power Voice")
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="безголовый режим: локальный HTTP/WebSocket API без окна (настройки — раздел server)",
+    )
+    parser.add_argument("--host", help="адрес API (по умолчанию server.host)")
+    parser.add_argument("--port", type=int, help="порт API (по умолчанию server.port)")
+    return parser.parse_args()
+
+
+def run_gui(config: dict):
+    with PROFILER.phase("gui_imports"):
+        from gui.main_window import start_gui
 
     # Обеспечиваем автозапуск, если включен в настройках
     if config.get("autostart", True):
-        ensure_autostart()
+        with PROFILER.phase("registry"):
+            ensure_autostart()
 
     # Лог + уведомление
-    log_startup("✅ Power Voice запущен успешно.")
-    show_notification("Power Voice", "✅ Ассистент запущен и готов к работе!")
+    with PROFILER.phase("startup_log"):
+        log_startup("✅ Power Voice запущен успешно.")
+        show_notification("Power Voice", "✅ Ассистент запущен и готов к работе!")
+
+    # Запускаем GUI (настройки уже прочитаны — второй раз не читаем)
+    start_gui(config)
+
+
+def run_server(config: dict, host: str = None, port: int = None):
+    # Одна загрузка моделей на компьютер, клиенты подключаются по сети;
+    # Qt не нужен, автозапуск GUI не трогаем
+    from server.api_server import start_server
+
+    log_startup("✅ Power Voice API запущен.")
+    start_server(config, host, port)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # Загружаем настройки
+    with PROFILER.phase("config"):
+        config = load_config()
 
-    # Запускаем GUI
-    start_gui()
+    if args.server:
+        run_server(config, args.host, args.port)
+    else:
+        run_gui(config)
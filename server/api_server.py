@@ -0,0 +1,375 @@
+import asyncio
+import contextlib
+import json
+import queue
+import threading
+import time
+from typing import Optional
+
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+from core.component_loader import ComponentLoader
+from core.intent_router import IntentRouter
+from core.llm_scheduler import SchedulerRejected
+from core.multilang_decoder import MultiLanguageDecoder
+
+
+class TextRequest(BaseModel):
+    text: str
+
+
+class GenerateRequest(BaseModel):
+    text: str
+    session_id: Optional[str] = None
+    stream: bool = False
+    cascade: bool = True  # шаблон / малая модель / основная, как в голосовом режиме
+    # очередь к модели (LlmScheduler): interactive | vip | background;
+    # без priority класс определяется по user_id (vip_users / owner_id),
+    # а остальные идут как background — с его долгим deadline
+    priority: Optional[str] = None
+    user_id: Optional[str] = None
+    deadline_seconds: Optional[float] = None
+
+
+class SynthesizeRequest(BaseModel):
+    text: str
+
+
+class AssistantServices:
+    """
+    Общие для всех клиентов экземпляры моделей: один SpeechToText,
+    NlpProcessor и TextToSpeech на процесс. Грузятся в фоне (ComponentLoader),
+    сервер принимает запросы сразу; пока модель не готова — 503.
+    """
+
+    DEFAULTS = {
+        "host": "127.0.0.1",
+        "port": 8765,
+        "components": ["stt", "tts", "nlp"],
+        "wait_ready_seconds": 0,
+    }
+
+    def __init__(self, config: dict, factories: dict = None):
+        settings = dict(self.DEFAULTS)
+        settings.update(config.get("server", {}) or {})
+        self.settings = settings
+        self.config = config
+        self.wait_ready = float(settings["wait_ready_seconds"])
+
+        self.router = IntentRouter(config)
+        self.loader = ComponentLoader(on_status=self._on_status)
+        factories = factories or {}
+        defaults = {"stt": self._load_stt, "tts": self._load_tts, "nlp": self._load_nlp}
+        for name in settings["components"]:
+            if name in defaults:
+                self.loader.add(name, factories.get(name, defaults[name]))
+
+    def start(self):
+        self.loader.start()
+
+    def get(self, name: str):
+        """Загруженный компонент или HTTPException 503."""
+        component = self.loader.get(name, timeout=self.wait_ready)
+        if component is not None:
+            return component
+        status = self.loader.status(name)
+        if name not in self.loader.statuses():
+            raise HTTPException(503, f"{name} отключён в настройках сервера")
+        if status == ComponentLoader.ERROR:
+            raise HTTPException(503, f"{name} не загружен: {self.loader.error(name)}")
+        raise HTTPException(503, f"{name} ещё загружается")
+
+    def health(self) -> dict:
+        return {
+            "components": self.loader.statuses(),
+            "load_seconds": {k: round(v, 2) for k, v in self.loader.timings().items()},
+        }
+
+    # Тяжёлые библиотеки импортируются только в фоновых потоках загрузчика
+    def _load_stt(self):
+        from core.stt_engine import SpeechToText
+        return SpeechToText(self.config)
+
+    def _load_tts(self):
+        from core.tts_engine import TextToSpeech
+        return TextToSpeech(self.config)
+
+    def _load_nlp(self):
+        from core.nlp_engine import NlpProcessor
+        return NlpProcessor(self.config, router=self.router)
+
+    @staticmethod
+    def _on_status(name: str, status: str, detail: str):
+        if status == ComponentLoader.READY:
+            print(f"✅ {name.upper()} загружен")
+        elif status == ComponentLoader.ERROR:
+            print(f"❌ {name.upper()} не загружен: {detail}")
+
+
+async def _iterate_in_thread(make_iterator):
+    """
+    Генератор llama.cpp держит блокировку модели между токенами, поэтому
+    весь он крутится в одном своём потоке; сюда токены приходят через очередь.
+    Отключение клиента закрывает генератор (генерация останавливается);
+    make_iterator(cancelled) получает флаг отмены — запрос, ещё ждущий
+    очереди к модели, из неё уходит.
+    """
+    items = queue.Queue(maxsize=64)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        iterator = None
+        try:
+            iterator = make_iterator(stop.is_set)
+            for item in iterator:
+                if not put(item):
+                    break
+        except Exception as e:
+            put(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+            put(done)
+
+    threading.Thread(target=run, name="api-stream", daemon=True).start()
+    try:
+        while True:
+            try:
+                item = await asyncio.to_thread(items.get, True, 0.5)
+            except queue.Empty:
+                continue
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def create_app(config: dict, services: AssistantServices = None) -> FastAPI:
+    """
+    Локальный API ассистента:
+    - GET  /health             — статус загрузки моделей
+    - POST /stt                — распознать WAV (16 бит); ?language=ru|uz|...|auto
+    - WS   /stt/stream         — поток PCM 16 бит моно, в ответ partial/final
+    - POST /intent             — команда или разговор (IntentRouter)
+    - POST /generate           — ответ LLM; stream=true — server-sent events
+    - GET  /llm/stats          — очередь к модели, модели, скорость генерации
+    - POST /tts                — синтез речи, ответ — audio/wav
+    """
+    services = services or AssistantServices(config)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: FastAPI):
+        services.start()
+        yield
+
+    app = FastAPI(title="Power Voice API", lifespan=lifespan)
+    app.state.services = services
+
+    @app.get("/health")
+    def health():
+        return services.health()
+
+    # -----------------------------
+    # Распознавание
+    # -----------------------------
+    def check_language(stt, language: Optional[str], allow_auto: bool):
+        """Язык из запроса — только из таблицы моделей (иначе 400)."""
+        if language is None or (allow_auto and language == "auto"):
+            return
+        supported = sorted(stt.model_dirs(config))
+        if language not in supported:
+            options = supported + (["auto"] if allow_auto else [])
+            raise HTTPException(400, f"Неизвестный язык: {language} (доступны: {', '.join(options)})")
+
+    @app.post("/stt")
+    def transcribe(file: UploadFile = File(...), language: Optional[str] = Query(None)):
+        stt = services.get("stt")
+        check_language(stt, language, allow_auto=True)
+        try:
+            pcm, rate = stt.pcm_from_wav(file.file.read())
+        except Exception as e:
+            raise HTTPException(400, f"Не удалось прочитать WAV: {e}")
+        started = time.perf_counter()
+        try:
+            result = stt.transcribe(pcm, sample_rate=rate, language=language)
+        except FileNotFoundError as e:
+            raise HTTPException(503, f"Модель не установлена: {e}")
+        return {
+            "text": result.text,
+            "language": result.language,
+            "confidence": round(result.confidence, 3),
+            "audio_seconds": round(len(pcm) / 2 / rate, 2),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1),
+        }
+
+    @app.websocket("/stt/stream")
+    async def transcribe_stream(websocket: WebSocket, language: Optional[str] = None, sample_rate: int = 16000):
+        await websocket.accept()
+        try:
+            stt = await asyncio.to_thread(services.get, "stt")
+            # один распознаватель на поток — auto здесь не поддерживается
+            check_language(stt, language, allow_auto=False)
+            rec = await asyncio.to_thread(stt.new_recognizer, language, sample_rate)
+        except FileNotFoundError as e:
+            await websocket.send_json({"type": "error", "error": f"Модель не установлена: {e}"})
+            await websocket.close()
+            return
+        except Exception as e:
+            await websocket.send_json({"type": "error", "error": getattr(e, "detail", str(e))})
+            await websocket.close()
+            return
+
+        lang = language or stt.language
+        last_partial = ""
+        try:
+            while True:
+                message = await websocket.receive()
+                if message.get("type") == "websocket.disconnect":
+                    return
+                chunk = message.get("bytes")
+                if chunk is None:
+                    # текстовое сообщение "eof" — конец записи
+                    if (message.get("text") or "").strip().lower() == "eof":
+                        break
+                    continue
+                if await asyncio.to_thread(rec.AcceptWaveform, chunk):
+                    result = MultiLanguageDecoder.parse_result(lang, rec.Result())
+                    last_partial = ""
+                    if result.text:
+                        await websocket.send_json(
+                            {"type": "final", "text": result.text, "confidence": round(result.confidence, 3)}
+                        )
+                else:
+                    partial = json.loads(rec.PartialResult()).get("partial", "").strip()
+                    if partial and partial != last_partial:
+                        last_partial = partial
+                        await websocket.send_json({"type": "partial", "text": partial})
+
+            result = MultiLanguageDecoder.parse_result(lang, await asyncio.to_thread(rec.FinalResult))
+            if result.text:
+                await websocket.send_json(
+                    {"type": "final", "text": result.text, "confidence": round(result.confidence, 3)}
+                )
+            await websocket.send_json({"type": "eof"})
+            await websocket.close()
+        except WebSocketDisconnect:
+            return
+
+    # -----------------------------
+    # Намерения и LLM
+    # -----------------------------
+    @app.post("/intent")
+    def intent(request: TextRequest):
+        command = services.router.match(request.text)
+        return {
+            "intent": "command" if command else "chat",
+            "skill": command.skill if command else None,
+            "score": command.score if command else None,
+            "smalltalk": services.router.detect_smalltalk(request.text),
+        }
+
+    @app.post("/generate")
+    def generate(request: GenerateRequest):
+        nlp = services.get("nlp")
+
+        options = {
+            "session_id": request.session_id,
+            "priority": request.priority,
+            "user_id": request.user_id,
+            "deadline": request.deadline_seconds,
+        }
+
+        def make_stream(cancelled=None):
+            if request.cascade:
+                return nlp.stream_reply(request.text, cancelled=cancelled, **options)
+            return nlp.stream_response(request.text, cancelled=cancelled, **options)
+
+        if not request.stream:
+            started = time.perf_counter()
+            try:
+                if request.cascade:
+                    stream = make_stream()
+                    try:
+                        text = "".join(stream).strip()
+                    finally:
+                        stream.close()
+                else:
+                    text = nlp.generate_response(request.text, **options)
+            except SchedulerRejected as e:
+                raise HTTPException(429 if e.reason == SchedulerRejected.QUEUE_FULL else 503, str(e))
+            return {"text": text, "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1)}
+
+        async def events():
+            parts = []
+            try:
+                async for delta in _iterate_in_thread(make_stream):
+                    parts.append(delta)
+                    yield _sse("token", {"text": delta})
+            except SchedulerRejected as e:
+                yield _sse("error", {"error": str(e), "reason": e.reason})
+                return
+            except Exception as e:
+                yield _sse("error", {"error": str(e)})
+                return
+            yield _sse("done", {"text": "".join(parts).strip()})
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    @app.get("/llm/stats")
+    def llm_stats():
+        nlp = services.get("nlp")
+        return {
+            "scheduler": nlp.scheduler.stats(),
+            "models": nlp.models.stats(),
+            "generation": nlp.generation_stats(),
+        }
+
+    @app.post("/sessions/{session_id}/reset")
+    def reset_session(session_id: str):
+        services.get("nlp").reset_session(session_id)
+        return {"ok": True}
+
+    # -----------------------------
+    # Синтез речи
+    # -----------------------------
+    @app.post("/tts")
+    def synthesize(request: SynthesizeRequest):
+        tts = services.get("tts")
+        clip = tts.synthesize(request.text, timeout=60)
+        if clip is None:
+            raise HTTPException(500, "Не удалось синтезировать речь")
+        return Response(content=clip.to_wav(), media_type="audio/wav")
+
+    return app
+
+
+def start_server(config: dict, host: str = None, port: int = None):
+    """Безголовый режим: модели загружаются один раз, клиенты ходят по HTTP/WebSocket."""
+    import uvicorn
+
+    services = AssistantServices(config)
+    app = create_app(config, services)
+    host = host or services.settings["host"]
+    port = int(port or services.settings["port"])
+    print(f"🌐 Power Voice API: http://{host}:{port}")
+    uvicorn.run(app, host=host, port=port, log_level="info")
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+from core.intent_router import IntentRouter, load_intents
+from core.skill_manager import SkillManager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTENTS = os.path.join(ROOT, "config", "intents.json")
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter({"intents_path": INTENTS})
+
+
+def skill_of(router, text):
+    found = router.match(text)
+    return found.skill if found else None
+
+
+@pytest.mark.parametrize(
+    "text, skill",
+    [
+        ("открой папку", "open_folder"),
+        ("Пожалуйста, открой папку", "open_folder"),
+        ("can you open the folder?", "open_folder"),
+        ("который час", "time"),
+        ("Который час?", "time"),
+        ("what time is it", "time"),
+        ("очисти временные файлы", "clear_temp"),
+    ],
+)
+def test_commands_route_to_skill(router, text, skill):
+    assert skill_of(router, text) == skill
+    assert router.detect_intent(text) == "command"
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "почему он удалил файл?",
+        "удалить файлы",
+        "запустил ли ты браузер",
+        "сколько времени займёт дорога?",
+        "расскажи про открытие Америки",
+        "open source is great",
+    ],
+)
+def test_questions_and_statements_are_chat(router, text):
+    assert router.detect_intent(text) == "chat"
+
+
+def test_command_for_unregistered_skill(router, tmp_path):
+    found = router.match("запусти браузер")
+    assert found is not None and found.skill == "launch"
+    # навыка launch нет — конвейер отвечает на такую реплику как на разговор
+    assert "launch" not in SkillManager(tmp_dir=str(tmp_path), intents_path=INTENTS)
+
+
+@pytest.mark.parametrize(
+    "text, category",
+    [
+        ("привет", "greeting"),
+        ("Спасибо большое!", "thanks"),
+        ("как дела", "how_are_you"),
+        ("goodbye", "bye"),
+        ("ок", "ack"),
+    ],
+)
+def test_smalltalk_exact(router, text, category):
+    assert router.detect_smalltalk(text) == category
+
+
+@pytest.mark.parametrize("text", ["привет, расскажи как устроен двигатель", "как дела у твоего брата сегодня утром"])
+def test_smalltalk_needs_whole_phrase(router, text):
+    assert router.detect_smalltalk(text) is None
+
+
+def test_missing_intents_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        IntentRouter({"intents_path": str(tmp_path / "nope.json")})
+
+
+def test_malformed_intents_file_raises(tmp_path):
+    path = tmp_path / "intents.json"
+    path.write_text(json.dumps({"patterns": []}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_intents(str(path))
+
+
+def test_skill_manager_takes_triggers_from_intents(tmp_path):
+    skills = SkillManager(tmp_dir=str(tmp_path), intents_path=INTENTS)
+    assert skills.resolve("открой папку").name == "open_folder"
+    assert skills.resolve("который час").name == "time"
+    # имя от роутера: только зарегистрированные навыки
+    assert skills.resolve("запусти браузер", skill="launch") is None
+    assert "time" in skills
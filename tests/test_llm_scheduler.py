@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+from core.llm_scheduler import LlmScheduler, SchedulerRejected
+
+
+def make_scheduler(**settings):
+    return LlmScheduler({"llm_scheduler": settings, "owner_id": "owner", "vip_users": ["vip-user"]})
+
+
+class Waiter(threading.Thread):
+    """Ждёт слот в своём потоке; имя попадает в order в момент допуска."""
+
+    def __init__(self, scheduler, name, priority, order, **kwargs):
+        super().__init__(daemon=True)
+        self.scheduler = scheduler
+        self.label = name
+        self.priority = priority
+        self.order = order
+        self.kwargs = kwargs
+        self.error = None
+
+    def run(self):
+        try:
+            with self.scheduler.slot(self.priority, **self.kwargs):
+                self.order.append(self.label)
+        except SchedulerRejected as e:
+            self.error = e
+
+
+def queue_waiter(scheduler, name, priority, order, **kwargs):
+    """Запускает Waiter и дожидается, пока он встанет в очередь (порядок seq детерминирован)."""
+    before = len(scheduler._waiting)
+    waiter = Waiter(scheduler, name, priority, order, **kwargs)
+    waiter.start()
+    limit = time.monotonic() + 2.0
+    while len(scheduler._waiting) <= before:
+        assert time.monotonic() < limit, "запрос не встал в очередь"
+        time.sleep(0.005)
+    return waiter
+
+
+def join_all(waiters):
+    for waiter in waiters:
+        waiter.join(2.0)
+        assert not waiter.is_alive()
+
+
+def test_classify():
+    scheduler = make_scheduler()
+    assert scheduler.classify("interactive", "anyone") == "interactive"
+    assert scheduler.classify(None, "owner") == "vip"
+    assert scheduler.classify(None, "vip-user") == "vip"
+    assert scheduler.classify(None, "stranger") == "background"
+    assert scheduler.classify("unknown") == "background"
+
+
+def test_priority_order_then_fifo():
+    scheduler = make_scheduler()
+    order = []
+    with scheduler.slot("interactive"):
+        waiters = [
+            queue_waiter(scheduler, "bg", "background", order),
+            queue_waiter(scheduler, "vip", "vip", order),
+            queue_waiter(scheduler, "voice-1", "interactive", order),
+            queue_waiter(scheduler, "voice-2", "interactive", order),
+        ]
+        assert order == []
+    join_all(waiters)
+    assert order == ["voice-1", "voice-2", "vip", "bg"]
+    assert scheduler.stats()["interactive"]["admitted"] == 3
+
+
+def test_queue_full_rejects_per_class():
+    scheduler = make_scheduler(max_queue={"interactive": 1, "background": 1})
+    order = []
+    with scheduler.slot("interactive"):
+        waiters = [queue_waiter(scheduler, "voice", "interactive", order)]
+        with pytest.raises(SchedulerRejected) as rejected:
+            with scheduler.slot("interactive"):
+                pass
+        assert rejected.value.reason == SchedulerRejected.QUEUE_FULL
+        # у другого класса своя глубина
+        waiters.append(queue_waiter(scheduler, "bg", "background", order))
+    join_all(waiters)
+    assert order == ["voice", "bg"]
+    assert scheduler.stats()["interactive"]["rejected"] == 1
+
+
+def test_free_model_is_not_rejected():
+    scheduler = make_scheduler(max_queue={"interactive": 0})
+    with scheduler.slot("interactive") as ticket:
+        assert ticket is not None
+
+
+def test_deadline_expires_while_waiting():
+    scheduler = make_scheduler()
+    with scheduler.slot("interactive"):
+        started = time.monotonic()
+        with pytest.raises(SchedulerRejected) as rejected:
+            with scheduler.slot("background", deadline=0.05):
+                pass
+        assert time.monotonic() - started < 1.0
+    assert rejected.value.reason == SchedulerRejected.DEADLINE
+    assert scheduler._waiting == []
+    assert scheduler.stats()["background"]["timed_out"] == 1
+
+
+def test_cancelled_request_leaves_queue():
+    scheduler = make_scheduler()
+    order = []
+    stop = threading.Event()
+    with scheduler.slot("interactive"):
+        waiter = queue_waiter(scheduler, "bg", "background", order, cancelled=stop.is_set)
+        stop.set()
+        join_all([waiter])
+        assert waiter.error is not None and waiter.error.reason == SchedulerRejected.CANCELLED
+        assert scheduler._waiting == []
+    assert order == []
+    assert scheduler.stats()["background"]["cancelled"] == 1
+
+
+def test_aging_lifts_old_background_request():
+    scheduler = make_scheduler(aging_seconds=10)
+    order = []
+    with scheduler.slot("interactive"):
+        waiters = [queue_waiter(scheduler, "bg", "background", order)]
+        with scheduler._cond:
+            # ждёт уже 25 с: два шага старения — background → interactive
+            scheduler._waiting[0].enqueued -= 25
+        waiters.append(queue_waiter(scheduler, "voice", "interactive", order))
+    join_all(waiters)
+    # при равном классе раньше тот, кто раньше встал в очередь
+    assert order == ["bg", "voice"]
+
+
+def test_disabled_scheduler_does_not_queue():
+    scheduler = make_scheduler(enabled=False)
+    with scheduler.slot("background") as outer, scheduler.slot("background") as inner:
+        assert outer is None and inner is None
@@ -0,0 +1,323 @@
+"""
+Пакетное распознавание архива голосовых заметок (WAV, 16 бит).
+
+Файлы распределяются по пулу процессов; каждый процесс один раз грузит
+модели Vosk (таблица язык → модель — та же, что у SpeechToText:
+MODEL_DIRS + languages_supported из settings.json) и дальше только
+распознаёт. Результаты по мере готовности пишутся в JSONL — по строке
+на файл, со словами, их временем и уверенностью. Повторный запуск с тем же
+--out продолжает с места остановки: уже распознанные файлы пропускаются.
+С --retry-errors файлы с ошибкой распознаются заново (актуальна последняя
+строка по пути).
+
+В конце — коэффициент реального времени (RTF): сколько секунд работы
+уходит на секунду звука (по стене и суммарно по процессам).
+
+Каждый процесс держит свои копии моделей в памяти — большая русская
+модель занимает несколько ГБ. Без --workers процессов столько, сколько
+копий моделей (по размеру на диске) влезает в свободную RAM, но не больше
+числа ядер. Если процесс всё же упадёт (например, от нехватки памяти),
+инструмент перечислит нераспознанные файлы — их распознает повторный запуск.
+
+Запуск из корня проекта:
+    python tools/batch_transcribe.py notes/ --out logs/notes.jsonl
+    python tools/batch_transcribe.py manifest.jsonl --language auto --workers 2
+Манифест — текстовый файл со списком путей (по строке на файл) или JSONL
+со строками {"path": "...", "language": "uz"}.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# состояние процесса-исполнителя (см. init_worker)
+_WORKER = {}
+
+
+# -----------------------------
+# Список файлов
+# -----------------------------
+def collect_inputs(source: str, default_language: str) -> list:
+    """[(путь, язык)] из папки (рекурсивно, *.wav) или манифеста."""
+    if os.path.isdir(source):
+        items = []
+        for folder, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(".wav"):
+                    items.append((os.path.join(folder, name), default_language))
+        return sorted(items)
+
+    base = os.path.dirname(os.path.abspath(source))
+    items = []
+    with open(source, encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                path, language = entry["path"], entry.get("language") or default_language
+            else:
+                path, language = line, default_language
+            # относительные пути — от папки манифеста
+            items.append((os.path.join(base, path), language))
+    return items
+
+
+def load_done(out_path: str, retry_errors: bool) -> set:
+    """Пути, уже записанные в JSONL прошлым запуском."""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # строка, оборванная при прерывании
+            if retry_errors and row.get("error"):
+                continue
+            done.add(row.get("path"))
+    return done
+
+
+# -----------------------------
+# Процесс-исполнитель
+# -----------------------------
+def init_worker(config: dict, languages: list, tie_margin: float):
+    """Один раз на процесс: пул моделей и загрузка нужных языков."""
+    from core.model_pool import VoskModelPool
+    from core.stt_engine import SpeechToText
+
+    pool_cfg = config.get("stt_pool", {}) or {}
+    pool = VoskModelPool(
+        os.path.join(ROOT, "models", "stt"),
+        SpeechToText.model_dirs(config),
+        memory_budget_mb=pool_cfg.get("memory_budget_mb", 0),
+    )
+    for lang in languages:
+        pool.get(lang)
+    _WORKER.update(pool=pool, tie_margin=tie_margin)
+
+
+def transcribe_file(path: str, languages: list) -> dict:
+    """Распознаёт один файл; несколько языков — побеждает самый уверенный."""
+    import vosk
+
+    from core.multilang_decoder import MultiLanguageDecoder
+    from core.stt_engine import SpeechToText
+
+    started = time.perf_counter()
+    row = {"path": path}
+    try:
+        with open(path, "rb") as f:
+            pcm, rate = SpeechToText.pcm_from_wav(f.read())
+        row["audio_seconds"] = round(len(pcm) / 2 / rate, 3)
+
+        results = []
+        for lang in languages:
+            rec = vosk.KaldiRecognizer(_WORKER["pool"].get(lang), rate)
+            rec.SetWords(True)
+            results.append(MultiLanguageDecoder.parse_result(lang, SpeechToText.decode_all(rec, pcm)))
+        results.sort(key=lambda r: r.confidence, reverse=True)
+        best = MultiLanguageDecoder.break_tie(results, _WORKER["tie_margin"])
+
+        row.update(
+            language=best.language,
+            text=best.text,
+            confidence=round(best.confidence, 3),
+            words=[
+                {
+                    "word": w.get("word", ""),
+                    "start": round(float(w.get("start", 0)), 2),
+                    "end": round(float(w.get("end", 0)), 2),
+                    "conf": round(float(w.get("conf", 0)), 3),
+                }
+                for w in best.words
+            ],
+        )
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    if row.get("audio_seconds"):
+        row["rtf"] = round(row["elapsed_seconds"] / row["audio_seconds"], 3)
+    return row
+
+
+# -----------------------------
+# Запуск
+# -----------------------------
+def resolve_languages(language: str, config: dict) -> list:
+    """Язык из аргумента/манифеста → список языков для распознавания."""
+    if language == "auto":
+        langid_cfg = config.get("language_id", {}) or {}
+        return list(langid_cfg.get("candidates", ["ru", "uz", "en"]))
+    return [language]
+
+
+def workers_for_memory(config: dict, languages: list) -> int:
+    """Сколько процессов с копиями моделей этих языков влезает в свободную RAM."""
+    from core.model_pool import VoskModelPool
+    from core.stt_engine import SpeechToText
+
+    pool = VoskModelPool(os.path.join(ROOT, "models", "stt"), SpeechToText.model_dirs(config))
+    per_worker = sum(pool.disk_size(lang) for lang in languages)
+    if not per_worker:
+        return 1  # моделей нет на диске — каждый файл всё равно завершится ошибкой
+    # запас на сам Python, буферы звука и остальную систему
+    return max(1, int(psutil.virtual_memory().available * 0.8 // per_worker))
+
+
+def run(items: list, config: dict, out_path: str, workers: int) -> dict:
+    queue = [(path, resolve_languages(language, config)) for path, language in items]
+    # каждый процесс заранее грузит все языки, которые встретятся в пакете
+    all_languages = sorted({lang for _, languages in queue for lang in languages})
+    tie_margin = (config.get("language_id", {}) or {}).get("text_tie_margin", 0.05)
+
+    totals = {"files": 0, "errors": 0, "audio_seconds": 0.0, "cpu_seconds": 0.0, "unprocessed": []}
+    started = time.perf_counter()
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    if os.path.exists(out_path) and os.path.getsize(out_path):
+        with open(out_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                # прошлый запуск оборвался посреди строки — новые идут с новой
+                with open(out_path, "a", encoding="utf-8") as out:
+                    out.write("\n")
+    with open(out_path, "a", encoding="utf-8") as out, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(config, all_languages, tie_margin),
+    ) as executor:
+        pending = set()
+        paths = {}  # future -> путь к файлу
+        position = 0
+        try:
+            while position < len(queue) or pending:
+                # в очереди пула не больше нескольких файлов на процесс
+                while position < len(queue) and len(pending) < workers * 4:
+                    path, languages = queue[position]
+                    future = executor.submit(transcribe_file, path, languages)
+                    paths[future] = path
+                    pending.add(future)
+                    position += 1
+
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    try:
+                        row = future.result()
+                    except BrokenProcessPool:
+                        # процесс убит (чаще всего — нехватка памяти), пул больше не работает
+                        totals["unprocessed"].append(paths.pop(future))
+                        continue
+                    paths.pop(future)
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    out.flush()
+
+                    totals["files"] += 1
+                    totals["cpu_seconds"] += row["elapsed_seconds"]
+                    totals["audio_seconds"] += row.get("audio_seconds", 0.0)
+                    if row.get("error"):
+                        totals["errors"] += 1
+                        print(f"⚠️ {row['path']}: {row['error']}")
+                    elif totals["files"] % 50 == 0:
+                        print(f"… {totals['files']}/{len(queue)} файлов")
+
+                if totals["unprocessed"]:
+                    totals["unprocessed"] += [paths[future] for future in pending]
+                    totals["unprocessed"] += [path for path, _ in queue[position:]]
+                    break
+        except KeyboardInterrupt:
+            print("\n⏹ Прервано — готовые результаты сохранены, повторный запуск продолжит с этого места")
+            for future in pending:
+                future.cancel()
+            raise
+
+    totals["wall_seconds"] = time.perf_counter() - started
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетное распознавание WAV (Vosk, пул процессов)")
+    parser.add_argument("source", help="папка с WAV или манифест (список путей / JSONL)")
+    parser.add_argument("--out", default="logs/transcripts.jsonl", help="JSONL с результатами")
+    parser.add_argument(
+        "--language",
+        help="язык распознавания (ru, uz, en, ...) или auto; по умолчанию — language из settings.json",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=0, help="процессов (0 — по свободной RAM, не больше числа ядер)"
+    )
+    parser.add_argument("--config", default="config/settings.json", help="настройки (languages_supported, language_id)")
+    parser.add_argument("--retry-errors", action="store_true", help="заново распознать файлы с ошибками")
+    args = parser.parse_args()
+
+    # пути — абсолютные: по ним же узнаются готовые файлы при продолжении
+    source = os.path.abspath(args.source)
+    out_path = os.path.abspath(args.out)
+    config_path = os.path.abspath(args.config) if os.path.exists(args.config) else os.path.join(ROOT, args.config)
+    os.chdir(ROOT)
+    # settings.json читается напрямую: autostart_manager нужен только Windows-приложению
+    with open(config_path, encoding="utf-8-sig") as f:
+        config = json.load(f)
+    language = args.language or config.get("language", "ru")
+
+    items = collect_inputs(source, language)
+    done = load_done(out_path, args.retry_errors)
+    todo = [(path, lang) for path, lang in items if path not in done]
+    print(f"🎧 Файлов: {len(items)}, уже готово: {len(items) - len(todo)}, к распознаванию: {len(todo)}")
+    if not todo:
+        return
+
+    from core.stt_engine import SpeechToText
+
+    needed = {name for _, lang in todo for name in resolve_languages(lang, config)}
+    unknown = sorted(needed - set(SpeechToText.model_dirs(config)))
+    if unknown:
+        parser.error(f"нет модели для языков: {', '.join(unknown)} (см. languages_supported)")
+
+    # каждый процесс грузит модели всех языков пакета
+    fit = workers_for_memory(config, sorted(needed))
+    if args.workers > fit:
+        print(f"⚠️ Моделей в свободной RAM хватит примерно на {fit} процесс(ов), запрошено {args.workers}")
+    workers = args.workers or min(fit, os.cpu_count() or 1)
+
+    totals = run(todo, config, out_path, min(workers, len(todo)))
+
+    audio = totals["audio_seconds"]
+    wall = totals["wall_seconds"]
+    print(
+        f"\n✅ Распознано файлов: {totals['files']} (ошибок: {totals['errors']}), "
+        f"звука {audio / 60:.1f} мин за {wall:.1f} с"
+    )
+    if audio:
+        print(f"RTF по стене: {wall / audio:.3f} (x{audio / wall:.1f} быстрее реального времени)")
+        print(f"RTF на процесс: {totals['cpu_seconds'] / audio:.3f}")
+    print(f"📄 Результаты: {out_path}")
+
+    unprocessed = sorted(totals["unprocessed"])
+    if unprocessed:
+        print(
+            f"\n⚠️ Процесс-исполнитель упал (вероятно, не хватило памяти) — "
+            f"не распознано файлов: {len(unprocessed)}"
+        )
+        for path in unprocessed[:20]:
+            print(f"   {path}")
+        if len(unprocessed) > 20:
+            print(f"   … и ещё {len(unprocessed) - 20}")
+        print("Повторный запуск (лучше с меньшим --workers) распознает только их.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Бенчмарк распознавания намерений: автомат Ахо–Корасик (IntentMatcher)
+против старого способа — проверки каждой подстроки по очереди.
+
+Показывает, что время поиска растёт линейно с длиной текста и почти не
+зависит от числа шаблонов (сотни → десятки тысяч), а у перебора растёт
+с числом шаблонов.
+
+Запуск из корня проекта:
+    python tools/intent_benchmark.py
+    python tools/intent_benchmark.py --patterns 100 1000 10000 --lengths 100 1000 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from core.intent_matcher import IntentMatcher  # noqa: E402
+
+ALPHABETS = {
+    "ru": "абвгдежзийклмнопрстуфхцчшщыэюя",
+    "uz": "abdefghijklmnopqrstuvxyzo'",
+    "en": "abcdefghijklmnopqrstuvwxyz",
+}
+
+
+def random_word(rng: random.Random, alphabet: str) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 9)))
+
+
+def make_patterns(count: int, rng: random.Random) -> list:
+    patterns = []
+    languages = list(ALPHABETS)
+    for i in range(count):
+        language = languages[i % len(languages)]
+        words = [random_word(rng, ALPHABETS[language]) for _ in range(rng.randint(1, 3))]
+        text = " ".join(words)
+        if rng.random() < 0.3:
+            text += "*"
+        patterns.append((text, language))
+    return patterns
+
+
+def make_text(length: int, patterns: list, rng: random.Random) -> str:
+    words = []
+    size = 0
+    while size < length:
+        if rng.random() < 0.05:
+            word = patterns[rng.randrange(len(patterns))][0].rstrip("*")
+        else:
+            word = random_word(rng, ALPHABETS[rng.choice(list(ALPHABETS))])
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:length]
+
+
+def timed(fn, repeat: int) -> float:
+    """Лучшее время одного вызова, мкс."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1e6
+
+
+def run(pattern_counts: list, lengths: list, repeat: int, seed: int) -> list:
+    rows = []
+    for count in pattern_counts:
+        rng = random.Random(seed)
+        patterns = make_patterns(count, rng)
+
+        matcher = IntentMatcher()
+        started = time.perf_counter()
+        for text, language in patterns:
+            matcher.add(text, "command", skill=text, language=language)
+        matcher.build()
+        build_ms = (time.perf_counter() - started) * 1000.0
+
+        plain = [IntentMatcher.normalize(text.rstrip("*")) for text, _ in patterns]
+
+        for length in lengths:
+            text = IntentMatcher.normalize(make_text(length, patterns, rng))
+            ac_us = timed(lambda: matcher.find_all(text, normalized=True), repeat)
+            # старый способ: все шаблоны по очереди (и без границ слов)
+            naive_us = timed(lambda: [p for p in plain if p in text], repeat)
+            rows.append({
+                "patterns": count,
+                "text_chars": len(text),
+                "build_ms": round(build_ms, 1),
+                "aho_corasick_us": round(ac_us, 1),
+                "aho_corasick_ns_per_char": round(ac_us * 1000.0 / max(len(text), 1), 1),
+                "naive_scan_us": round(naive_us, 1),
+                "speedup": round(naive_us / ac_us, 1) if ac_us else None,
+                "matches": len(matcher.find_all(text, normalized=True)),
+            })
+    return rows
+
+
+def run_router(repeat: int) -> dict:
+    """Реальные шаблоны из config/intents.json на типичных репликах."""
+    os.chdir(ROOT)
+    from core.intent_router import IntentRouter
+
+    started = time.perf_counter()
+    router = IntentRouter()
+    build_ms = (time.perf_counter() - started) * 1000.0
+    samples = [
+        "Открой папку с документами, пожалуйста",
+        "Какая сегодня погода в Ташкенте?",
+        "papkani ochib ber",
+        "please launch the browser",
+        "спасибо",
+        "Расскажи подробно, почему небо голубое и как это связано с рассеянием света",
+    ]
+    per_call = [timed(lambda s=s: router.detect_intent(s), repeat) for s in samples]
+    return {
+        "patterns": len(router.matcher),
+        "build_ms": round(build_ms, 2),
+        "detect_intent_us_avg": round(sum(per_call) / len(per_call), 2),
+        "detect_intent_us_max": round(max(per_call), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк IntentMatcher (Ахо–Корасик)")
+    parser.add_argument("--patterns", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    rows = run(args.patterns, args.lengths, args.repeat, args.seed)
+    print(f"{'шаблонов':>9} {'символов':>9} {'постр., мс':>11} {'AC, мкс':>10} {'нс/симв':>8} {'перебор, мкс':>13} {'ускор.':>7}")
+    for row in rows:
+        print(
+            f"{row['patterns']:>9} {row['text_chars']:>9} {row['build_ms']:>11} {row['aho_corasick_us']:>10} "
+            f"{row['aho_corasick_ns_per_char']:>8} {row['naive_scan_us']:>13} {row['speedup']:>7}"
+        )
+
+    router = run_router(args.repeat)
+    print(
+        f"\nIntentRouter: {router['patterns']} шаблонов, построение {router['build_ms']} мс, "
+        f"detect_intent в среднем {router['detect_intent_us_avg']} мкс"
+    )
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"synthetic": rows, "router": router}, f, ensure_ascii=False, indent=2)
+        print(f"📄 Результаты: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
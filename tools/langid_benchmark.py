@@ -0,0 +1,132 @@
+"""
+Бенчмарк определения языка: LanguageIdentifier (core/language_id.py)
+против langdetect на коротких репликах ассистента (ru / uz / en / ar / cn).
+
+Показывает точность по языкам, среднее время вызова и стабильность
+(langdetect случаен: один и тот же текст может дать разные ответы).
+
+Запуск из корня проекта:
+    python tools/langid_benchmark.py
+    python tools/langid_benchmark.py --repeat 50 --out logs/langid_benchmark.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from core.language_id import LanguageIdentifier  # noqa: E402
+
+# фразы не из обучающих текстов LanguageIdentifier
+SAMPLES = {
+    "ru": [
+        "Да", "Нет, спасибо", "Включи свет", "Сколько стоит билет?", "Я устал",
+        "Покажи мне расписание поездов", "Где мои очки?", "Сделай погромче",
+        "Какой курс доллара?", "Найди рецепт борща", "Мне скучно", "Запиши заметку",
+        "Купи молоко и хлеб", "Кто выиграл матч вчера?", "Ответь коротко",
+    ],
+    "uz": [
+        "Ha", "Yo'q, rahmat", "Chiroqni yoq", "Chipta qancha turadi?", "Men charchadim",
+        "Poyezdlar jadvalini ko'rsat", "Ko'zoynagim qayerda?", "Ovozni baland qil",
+        "Dollar kursi qancha?", "Osh retseptini top", "Menga zerikarli", "Eslatma yoz",
+        "Sut va non sotib ol", "Kecha o'yinda kim yutdi?", "Qisqa javob ber",
+    ],
+    "en": [
+        "Yes", "No, thanks", "Turn on the light", "How much is the ticket?", "I am tired",
+        "Show me the train schedule", "Where are my glasses?", "Make it louder",
+        "What is the dollar rate?", "Find a pancake recipe", "I am bored", "Take a note",
+        "Buy milk and bread", "Who won the game yesterday?", "Answer briefly",
+    ],
+    "ar": ["مرحبا", "كيف حالك؟", "افتح المجلد", "شكرا جزيلا", "ما هو الوقت الآن؟"],
+    "cn": ["你好", "现在几点了？", "打开文件夹", "谢谢你", "今天天气怎么样？"],
+}
+
+# langdetect пишет китайский как zh-cn / zh-tw
+LANGDETECT_ALIASES = {"zh-cn": "cn", "zh-tw": "cn"}
+
+
+def load_langdetect():
+    try:
+        from langdetect import detect
+    except ImportError:
+        return None
+    return detect
+
+
+def evaluate(name: str, detect, repeat: int) -> dict:
+    per_language = {}
+    answers = {}
+    started = time.perf_counter()
+    calls = 0
+    for lang, phrases in SAMPLES.items():
+        correct = 0
+        for text in phrases:
+            seen = set()
+            for _ in range(repeat):
+                try:
+                    guess = detect(text)
+                except Exception:
+                    guess = "error"
+                seen.add(LANGDETECT_ALIASES.get(guess, guess))
+                calls += 1
+            answers[text] = sorted(seen)
+            # считаем верным, только если ответ стабилен и правилен
+            if seen == {lang}:
+                correct += 1
+        per_language[lang] = round(correct / len(phrases), 3)
+    elapsed = time.perf_counter() - started
+    unstable = [text for text, seen in answers.items() if len(seen) > 1]
+    total = sum(len(p) for p in SAMPLES.values())
+    return {
+        "name": name,
+        "accuracy": round(sum(per_language[l] * len(p) for l, p in SAMPLES.items()) / total, 3),
+        "per_language": per_language,
+        "us_per_call": round(elapsed / calls * 1e6, 1),
+        "unstable": unstable,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LanguageIdentifier против langdetect")
+    parser.add_argument("--repeat", type=int, default=10, help="повторов каждой фразы (проверка стабильности)")
+    parser.add_argument("--out", help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    results = []
+    started = time.perf_counter()
+    identifier = LanguageIdentifier()
+    build_ms = (time.perf_counter() - started) * 1000.0
+    # без кэша результатов — меряем само определение
+    results.append(evaluate("LanguageIdentifier", lambda t: identifier._detect(t, "unknown")[0], args.repeat))
+
+    detect = load_langdetect()
+    if detect is None:
+        print("⚠️ langdetect не установлен (pip install langdetect) — сравнение пропущено")
+    else:
+        results.append(evaluate("langdetect", detect, args.repeat))
+
+    print(f"LanguageIdentifier: модель построена за {build_ms:.1f} мс\n")
+    languages = list(SAMPLES)
+    print(f"{'детектор':<20} {'точность':>9} " + " ".join(f"{l:>6}" for l in languages) + f" {'мкс/вызов':>10} {'нестаб.':>8}")
+    for row in results:
+        print(
+            f"{row['name']:<20} {row['accuracy']:>9} "
+            + " ".join(f"{row['per_language'][l]:>6}" for l in languages)
+            + f" {row['us_per_call']:>10} {len(row['unstable']):>8}"
+        )
+    if len(results) == 2 and results[0]["us_per_call"]:
+        print(f"\nУскорение: x{results[1]['us_per_call'] / results[0]['us_per_call']:.1f}")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"build_ms": round(build_ms, 2), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"📄 Результаты: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""
+Бенчмарк LLM: корпус реплик на всех языках ассистента прогоняется через
+NlpProcessor (stream_response — тот же путь, что у голоса и API).
+
+Для каждой модели и набора параметров:
+- время загрузки (вместе с подбором параметров llama.cpp)
+- скорость обработки промпта и генерации, токенов/с
+- время до первого токена (TTFT) и полная задержка: p50 / p95 / p99
+- задержка по языкам (p50)
+
+Результаты — JSON (--out). С --baseline сравнивает с сохранённым прогоном
+и завершается с кодом 1, если метрика ухудшилась больше допуска.
+
+--stub подменяет llama.cpp заглушкой с постоянной скоростью — так бенчмарк
+(и сравнение с базой) работает на любой машине без GGUF-моделей.
+
+Кэш ответов, каскад и тёплый резерв на время замеров выключены.
+Токены промпта считаются по KV-кэшу модели после ответа (n_tokens минус
+сгенерированные), поэтому с кэшем системного промпта скорость промпта —
+эффективная, с учётом переиспользованного префикса.
+
+Запуск из корня проекта:
+    python tools/llm_benchmark.py
+    python tools/llm_benchmark.py --models mistral-7b-instruct-v0.3.Q4_K_M.gguf --repeat 3
+    python tools/llm_benchmark.py --params params.json --out logs/llm_benchmark.json
+    python tools/llm_benchmark.py --stub --baseline logs/llm_baseline.json
+Наборы параметров (--params) — JSON вида
+{"быстрый": {"llm_generation": {"max_tokens": 64}, "llm_runtime": {"n_batch": 256}}}:
+разделы поверх settings.json.
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from core.nlp_engine import NlpProcessor  # noqa: E402
+
+PROMPTS = {
+    "ru": [
+        "Привет! Как дела?",
+        "Объясни простыми словами, почему небо голубое.",
+        "Придумай три идеи для подарка маме на день рождения.",
+        "Чем отличается вирус от бактерии?",
+        "Составь короткий план тренировки на утро.",
+        "Переведи на английский: завтра будет дождь.",
+    ],
+    "uz": [
+        "Salom! Qalaysan?",
+        "Nima uchun osmon ko'k ekanini oddiy so'zlar bilan tushuntir.",
+        "Onamning tug'ilgan kuniga uchta sovg'a g'oyasini ayt.",
+        "Toshkentda qaysi joylarni ko'rish kerak?",
+        "Ertalabki mashq uchun qisqa reja tuz.",
+    ],
+    "en": [
+        "Hi! How are you?",
+        "Explain in simple words why the sky is blue.",
+        "Suggest three birthday gift ideas for my mother.",
+        "What is the difference between a virus and bacteria?",
+        "Write a short morning workout plan.",
+        "Translate into Russian: it will rain tomorrow.",
+    ],
+    "ar": [
+        "مرحبا! كيف حالك؟",
+        "اشرح بكلمات بسيطة لماذا السماء زرقاء.",
+        "اقترح ثلاث أفكار لهدية عيد ميلاد أمي.",
+        "ما الفرق بين الفيروس والبكتيريا؟",
+    ],
+    "cn": [
+        "你好！你好吗？",
+        "用简单的话解释为什么天空是蓝色的。",
+        "给我妈妈的生日礼物提三个建议。",
+        "病毒和细菌有什么区别？",
+    ],
+}
+
+# метрика → True, если больше — лучше
+METRICS = {
+    "load_seconds": False,
+    "prompt_tokens_per_second": True,
+    "generation_tokens_per_second": True,
+    "ttft_ms_p50": False,
+    "ttft_ms_p95": False,
+    "latency_ms_p50": False,
+    "latency_ms_p95": False,
+    "latency_ms_p99": False,
+}
+
+
+# -----------------------------
+# Заглушка llama.cpp
+# -----------------------------
+class StubLlama:
+    """
+    Подмена llama_cpp.Llama для CI: тот же интерфейс, что использует
+    NlpProcessor, и постоянная скорость — промпт и генерация «считаются»
+    паузами, так что метрики воспроизводимы.
+    """
+
+    PROMPT_TOKENS_PER_SECOND = 800.0
+    GENERATION_TOKENS_PER_SECOND = 60.0
+    REPLY = "Это тестовый ответ заглушки, он нужен только для замеров скорости"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.n_tokens = 0
+
+    def n_ctx(self) -> int:
+        return 2048
+
+    def tokenize(self, data: bytes, add_bos: bool = True, special: bool = False) -> list:
+        # ~4 байта на токен — порядок величины для BPE-словарей
+        return list(range(int(add_bos) + max(1, len(data) // 4)))
+
+    def __call__(self, prompt: str, **kwargs):
+        return self.create_completion(prompt, **kwargs)
+
+    def create_completion(self, prompt, max_tokens: int = 16, stream: bool = False, **kwargs):
+        tokens = prompt if isinstance(prompt, list) else self.tokenize(prompt.encode("utf-8"))
+        chunks = self._generate(len(tokens), max_tokens)
+        if stream:
+            return ({"choices": [{"text": piece}]} for piece in chunks)
+        pieces = list(chunks)
+        return {
+            "choices": [{"text": "".join(pieces)}],
+            "usage": {"prompt_tokens": len(tokens), "completion_tokens": len(pieces)},
+        }
+
+    def create_chat_completion(self, messages: list, max_tokens: int = 16, stream: bool = False, **kwargs):
+        text = "\n".join(m["content"] for m in messages)
+        chunks = self._generate(len(self.tokenize(text.encode("utf-8"))), max_tokens)
+        if stream:
+            return ({"choices": [{"delta": {"content": piece}}]} for piece in chunks)
+        pieces = list(chunks)
+        return {
+            "choices": [{"message": {"content": "".join(pieces)}}],
+            "usage": {"prompt_tokens": self.n_tokens - len(pieces), "completion_tokens": len(pieces)},
+        }
+
+    def _generate(self, prompt_tokens: int, max_tokens: int):
+        time.sleep(prompt_tokens / self.PROMPT_TOKENS_PER_SECOND)
+        self.n_tokens = prompt_tokens
+        words = self.REPLY.split()
+        for i in range(max(1, min(max_tokens, len(words)))):
+            time.sleep(1.0 / self.GENERATION_TOKENS_PER_SECOND)
+            self.n_tokens += 1
+            yield (" " if i else "") + words[i]
+
+
+class StubNlpProcessor(NlpProcessor):
+    """NlpProcessor, у которого модель — StubLlama."""
+
+    def _load_llm(self, path: str):
+        return StubLlama(path)
+
+
+# -----------------------------
+# Замеры
+# -----------------------------
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def build_config(base: dict, model: str, overrides: dict) -> dict:
+    config = copy.deepcopy(base)
+    for section, values in overrides.items():
+        if isinstance(values, dict):
+            config[section] = {**(config.get(section) or {}), **values}
+        else:
+            config[section] = values
+    config.update(llm_primary=model, llm_secondary=None, llm_model=None)
+    # меряем саму модель: без готовых ответов, каскада и фоновой загрузки резерва
+    config["response_cache"] = {**(config.get("response_cache") or {}), "enabled": False}
+    config["cascade"] = {**(config.get("cascade") or {}), "enabled": False}
+    config["llm_standby"] = {**(config.get("llm_standby") or {}), "enabled": False}
+    return config
+
+
+def measure(nlp: NlpProcessor, text: str) -> dict:
+    """Один запрос через stream_response."""
+    stats = nlp.speculative.stats
+    tokens_before = stats.generated_tokens
+
+    started = time.perf_counter()
+    first = None
+    parts = []
+    # без priority запрос считался бы фоновым — меряем как интерактивный
+    for delta in nlp.stream_response(text, priority="interactive"):
+        if first is None:
+            first = time.perf_counter()
+        parts.append(delta)
+    finished = time.perf_counter()
+
+    generated = stats.generated_tokens - tokens_before
+    llm = nlp.llm
+    prompt_tokens = max(int(getattr(llm, "n_tokens", 0) or 0) - generated, 0)
+    first = first or finished
+    return {
+        "ttft": first - started,
+        "latency": finished - started,
+        "prompt_tokens": prompt_tokens,
+        "generated_tokens": generated,
+        "text": "".join(parts),
+    }
+
+
+def run_one(config: dict, model: str, models_root: str, prompts: dict, repeat: int, warmup: int, stub: bool) -> dict:
+    factory = StubNlpProcessor if stub else NlpProcessor
+    started = time.perf_counter()
+    nlp = factory(config, models_root=models_root)
+    load_seconds = time.perf_counter() - started
+
+    try:
+        if os.path.basename(nlp.active_model or "") != model:
+            raise RuntimeError(f"загрузилась {os.path.basename(nlp.active_model or '')} вместо {model}")
+
+        corpus = [(lang, text) for lang, texts in prompts.items() for text in texts]
+        for _, text in corpus[:warmup]:
+            measure(nlp, text)
+
+        samples = []
+        errors = 0
+        for _ in range(repeat):
+            for lang, text in corpus:
+                sample = measure(nlp, text)
+                if sample["text"].startswith("Ошибка LLM"):
+                    errors += 1
+                    continue
+                sample["language"] = lang
+                samples.append(sample)
+    finally:
+        nlp.models.stop()
+
+    ttft = [s["ttft"] * 1000.0 for s in samples]
+    latency = [s["latency"] * 1000.0 for s in samples]
+    # первый токен уходит в TTFT, остальные — генерация
+    gen_tokens = sum(max(s["generated_tokens"] - 1, 0) for s in samples)
+    gen_seconds = sum(s["latency"] - s["ttft"] for s in samples)
+    # TTFT = промпт + один шаг генерации; шаг вычитаем по измеренной скорости
+    step = gen_seconds / gen_tokens if gen_tokens else 0.0
+    prompt_tokens = sum(s["prompt_tokens"] for s in samples)
+    prompt_seconds = sum(max(s["ttft"] - step, 0.0) for s in samples)
+
+    result = {
+        "model": model,
+        "requests": len(samples),
+        "errors": errors,
+        "load_seconds": round(load_seconds, 3),
+        "prompt_tokens_per_second": round(prompt_tokens / prompt_seconds, 1) if prompt_seconds else 0.0,
+        "generation_tokens_per_second": round(gen_tokens / gen_seconds, 1) if gen_seconds else 0.0,
+        "tokens_per_reply": round(sum(s["generated_tokens"] for s in samples) / len(samples), 1) if samples else 0.0,
+        "per_language_latency_ms_p50": {
+            lang: round(percentile([s["latency"] * 1000.0 for s in samples if s["language"] == lang], 0.5), 1)
+            for lang in prompts
+        },
+    }
+    for q in (50, 95, 99):
+        result[f"ttft_ms_p{q}"] = round(percentile(ttft, q / 100), 1)
+        result[f"latency_ms_p{q}"] = round(percentile(latency, q / 100), 1)
+    return result
+
+
+# -----------------------------
+# Сравнение с базой
+# -----------------------------
+def compare(runs: dict, baseline: dict, tolerance: float) -> list:
+    """Строки сравнения; regression=True — хуже базы больше чем на tolerance."""
+    rows = []
+    for key, current in runs.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = base.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            rows.append({
+                "run": key,
+                "metric": metric,
+                "baseline": old,
+                "current": new,
+                "change": round(change, 3),
+                "regression": worse > tolerance,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк LLM через NlpProcessor")
+    parser.add_argument("--models", nargs="+", help="GGUF из models/llm (по умолчанию llm_primary и llm_secondary)")
+    parser.add_argument("--params", help="JSON с наборами параметров {имя: {раздел: {...}}}")
+    parser.add_argument("--languages", nargs="+", default=list(PROMPTS), help="языки корпуса")
+    parser.add_argument("--max-tokens", type=int, help="max_tokens для всех наборов")
+    parser.add_argument("--repeat", type=int, default=1, help="прогонов корпуса")
+    parser.add_argument("--warmup", type=int, default=2, help="запросов на прогрев (не считаются)")
+    parser.add_argument("--stub", action="store_true", help="заглушка вместо llama.cpp (CI без моделей)")
+    parser.add_argument("--config", default="config/settings.json")
+    parser.add_argument("--out", help="сохранить результаты в JSON")
+    parser.add_argument("--baseline", help="JSON прошлого прогона (--out) для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="допустимое ухудшение, доля")
+    args = parser.parse_args()
+
+    out_path = os.path.abspath(args.out) if args.out else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    params_path = os.path.abspath(args.params) if args.params else None
+    config_path = os.path.abspath(args.config) if os.path.exists(args.config) else os.path.join(ROOT, args.config)
+    os.chdir(ROOT)
+    # settings.json читается напрямую: autostart_manager нужен только Windows-приложению
+    with open(config_path, encoding="utf-8-sig") as f:
+        base_config = json.load(f)
+
+    param_sets = {"default": {}}
+    if params_path:
+        with open(params_path, encoding="utf-8-sig") as f:
+            param_sets = json.load(f)
+    if args.max_tokens:
+        for overrides in param_sets.values():
+            overrides["llm_generation"] = {**overrides.get("llm_generation", {}), "max_tokens": args.max_tokens}
+
+    prompts = {lang: PROMPTS[lang] for lang in args.languages if lang in PROMPTS}
+
+    stub_dir = None
+    if args.stub:
+        # заглушке нужны только файлы с именами моделей
+        stub_dir = tempfile.TemporaryDirectory(prefix="llm-stub-")
+        models_root = stub_dir.name
+        models = args.models or ["stub-model.gguf"]
+        for name in models:
+            open(os.path.join(models_root, name), "wb").close()
+        for overrides in param_sets.values():
+            # профили llama.cpp и кэш промпта заглушке не нужны
+            overrides.setdefault("llm_prompt_cache", False)
+            overrides["llm_runtime"] = {
+                **overrides.get("llm_runtime", {}),
+                "profiles_path": os.path.join(models_root, "llm_tuning.json"),
+            }
+    else:
+        models_root = os.path.join("models", "llm")
+        models = args.models or [
+            name for name in dict.fromkeys([base_config.get("llm_primary"), base_config.get("llm_secondary")])
+            if name
+        ]
+
+    runs = {}
+    try:
+        for model in models:
+            if not os.path.exists(os.path.join(models_root, model)):
+                print(f"❌ Файл не найден: {os.path.join(models_root, model)}")
+                continue
+            for name, overrides in param_sets.items():
+                key = f"{model} / {name}"
+                print(f"\n🔹 {key}")
+                config = build_config(base_config, model, overrides)
+                try:
+                    runs[key] = run_one(config, model, models_root, prompts, args.repeat, args.warmup, args.stub)
+                    runs[key]["params"] = overrides
+                except Exception as e:
+                    print(f"⚠️ Прогон не удался: {e}")
+                    runs[key] = {"model": model, "params": overrides, "error": str(e)}
+                gc.collect()
+    finally:
+        if stub_dir is not None:
+            stub_dir.cleanup()
+
+    print(
+        f"\n{'модель / параметры':<48} {'загр., с':>9} {'промпт т/с':>11} {'ген. т/с':>9} "
+        f"{'TTFT p50':>9} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}"
+    )
+    for key, row in runs.items():
+        if "error" in row:
+            print(f"{key:<48} ошибка: {row['error']}")
+            continue
+        print(
+            f"{key:<48} {row['load_seconds']:>9} {row['prompt_tokens_per_second']:>11} "
+            f"{row['generation_tokens_per_second']:>9} {row['ttft_ms_p50']:>9} "
+            f"{row['latency_ms_p50']:>9} {row['latency_ms_p95']:>9} {row['latency_ms_p99']:>9}"
+        )
+
+    regressions = []
+    comparison = []
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f).get("runs", {})
+        comparison = compare(runs, baseline, args.tolerance)
+        regressions = [row for row in comparison if row["regression"]]
+        if not comparison:
+            print("\n⚠️ В базе нет прогонов с такими же моделями и параметрами")
+        else:
+            print(f"\nСравнение с базой ({os.path.basename(baseline_path)}, допуск {args.tolerance:.0%}):")
+            for row in comparison:
+                mark = "❌" if row["regression"] else "  "
+                print(f"{mark} {row['run']:<48} {row['metric']:<30} {row['baseline']:>9} → {row['current']:<9} {row['change']:+.1%}")
+
+    if out_path:
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"stub": args.stub, "languages": list(prompts), "runs": runs, "comparison": comparison},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        print(f"📄 Результаты: {out_path}")
+
+    if regressions:
+        print(f"\n❌ Ухудшений сверх допуска: {len(regressions)}")
+        sys.exit(1)
+    if not runs or all("error" in row for row in runs.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Бенчмарк запуска Power Voice со заглушками вместо моделей.
+
+Холодный запуск — каждый раз новый процесс (импорты, конфиг, реестр,
+окно, фоновая загрузка компонентов). Тёплый — повторное создание окна
+в уже прогретом процессе. Для каждой фазы и отметки профиля считаются
+медиана / p95 / min / max, отчёт пишется в JSON.
+
+Запуск из корня проекта:
+    python tools/startup_benchmark.py --cold 5 --warm 5 --target-ms 1500
+    python tools/startup_benchmark.py --baseline logs/startup_benchmark_prev.json
+
+Код возврата 1 — цель по времени не выдержана или есть регрессия
+относительно baseline.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+RESULT_PREFIX = "STARTUP_REPORT "
+
+
+# -----------------------------
+# Заглушки моделей
+# -----------------------------
+class StubSTT:
+    def __init__(self, load_ms: float):
+        time.sleep(load_ms / 1000.0)
+
+    def is_streaming(self) -> bool:
+        return False
+
+    def start_stream(self):
+        pass
+
+    def stop_stream(self):
+        pass
+
+    def stream_results(self, timeout: float = 0.1):
+        return iter(())
+
+
+class StubTTS:
+    def __init__(self, load_ms: float):
+        time.sleep(load_ms / 1000.0)
+
+    def speak(self, text: str):
+        pass
+
+    def stop(self):
+        pass
+
+
+class StubNLP:
+    def __init__(self, load_ms: float):
+        time.sleep(load_ms / 1000.0)
+
+    def generate_response(self, text: str, session_id: str = None, **kwargs) -> str:
+        return text
+
+    def stream_response(self, text: str, session_id: str = None, **kwargs):
+        yield text
+
+    def stream_reply(self, text: str, session_id: str = None, **kwargs):
+        yield text
+
+
+def stub_factories(load_ms: dict) -> dict:
+    return {
+        "stt": lambda: StubSTT(load_ms["stt"]),
+        "tts": lambda: StubTTS(load_ms["tts"]),
+        "nlp": lambda: StubNLP(load_ms["nlp"]),
+    }
+
+
+# -----------------------------
+# Один запуск
+# -----------------------------
+def run_startup(load_ms: dict, timeout: float, app=None) -> dict:
+    """Повторяет шаги main.py (без записи в реестр) и ждёт готовности всех компонентов."""
+    from core.startup_profiler import PROFILER
+
+    with PROFILER.phase("imports"):
+        from core.autostart_manager import load_config, is_autostart_enabled
+        from gui.main_window import VoiceAssistantGUI
+        from PyQt6.QtCore import QTimer
+        from PyQt6.QtWidgets import QApplication
+
+    with PROFILER.phase("config"):
+        config = load_config()
+
+    if config.get("autostart", True):
+        with PROFILER.phase("registry"):
+            is_autostart_enabled()
+
+    if app is None:
+        with PROFILER.phase("qt_app"):
+            app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    result = {}
+
+    def finished(report):
+        result["report"] = report
+        QTimer.singleShot(0, app.quit)
+
+    window = VoiceAssistantGUI(config, factories=stub_factories(load_ms))
+    window.startup_finished.connect(finished)
+    window.show()
+    QTimer.singleShot(0, lambda: PROFILER.mark("first_frame"))
+    QTimer.singleShot(int(timeout * 1000), app.quit)
+    app.exec()
+
+    window.close()
+    window.deleteLater()
+    return result.get("report") or PROFILER.report()
+
+
+def run_child(args):
+    report = run_startup(load_ms_from(args), args.timeout)
+    print(RESULT_PREFIX + json.dumps(report, ensure_ascii=False), flush=True)
+    os._exit(0)  # не ждём фоновые потоки (сеть, слушатель)
+
+
+def run_cold(args) -> list:
+    reports = []
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--timeout", str(args.timeout)]
+    cmd += ["--stub-stt-ms", str(args.stub_stt_ms), "--stub-tts-ms", str(args.stub_tts_ms)]
+    cmd += ["--stub-llm-ms", str(args.stub_llm_ms)]
+    env = dict(os.environ)
+    if args.offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+
+    for i in range(args.cold):
+        started = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, encoding="utf-8")
+        wall_ms = round((time.perf_counter() - started) * 1000.0, 2)
+
+        report = None
+        for line in proc.stdout.splitlines():
+            if line.startswith(RESULT_PREFIX):
+                report = json.loads(line[len(RESULT_PREFIX):])
+        if report is None:
+            print(f"❌ Холодный запуск {i + 1}: нет отчёта (код {proc.returncode})\n{proc.stderr[-2000:]}")
+            continue
+
+        report["process_wall_ms"] = wall_ms
+        reports.append(report)
+        print(f"🧊 cold {i + 1}/{args.cold}: first_frame {mark_ms(report, 'first_frame')} мс, "
+              f"models_ready {mark_ms(report, 'models_ready')} мс, процесс {wall_ms} мс")
+    return reports
+
+
+def run_warm(args) -> list:
+    if args.offscreen:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from core.startup_profiler import PROFILER
+    from PyQt6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    load_ms = load_ms_from(args)
+
+    # прогрев: первый запуск в процессе не считаем
+    run_startup(load_ms, args.timeout, app)
+
+    reports = []
+    for i in range(args.warm):
+        PROFILER.reset()
+        report = run_startup(load_ms, args.timeout, app)
+        reports.append(report)
+        print(f"🔥 warm {i + 1}/{args.warm}: first_frame {mark_ms(report, 'first_frame')} мс, "
+              f"models_ready {mark_ms(report, 'models_ready')} мс")
+    return reports
+
+
+# -----------------------------
+# Статистика
+# -----------------------------
+def mark_ms(report: dict, name: str):
+    mark = report.get("marks", {}).get(name)
+    return mark["at_ms"] if mark else None
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def describe(values: list) -> dict:
+    return {
+        "runs": len(values),
+        "median": round(statistics.median(values), 2),
+        "p95": round(percentile(values, 0.95), 2),
+        "min": round(min(values), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def summarize(reports: list) -> dict:
+    phases = {}
+    marks = {}
+    extra = {"total_ms": [], "peak_rss_mb": [], "process_wall_ms": []}
+    for report in reports:
+        for phase in report.get("phases", []):
+            phases.setdefault(phase["name"], []).append(phase["duration_ms"])
+        for name, mark in report.get("marks", {}).items():
+            marks.setdefault(name, []).append(mark["at_ms"])
+        for key, values in extra.items():
+            if report.get(key) is not None:
+                values.append(report[key])
+
+    summary = {
+        "phases": {name: describe(values) for name, values in phases.items()},
+        "marks": {name: describe(values) for name, values in marks.items()},
+    }
+    summary.update({key: describe(values) for key, values in extra.items() if values})
+    return summary
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list:
+    """Медианы, выросшие больше чем на tolerance относительно baseline."""
+    regressions = []
+    for mode in ("cold", "warm"):
+        for group in ("phases", "marks"):
+            current = summary.get(mode, {}).get(group, {})
+            previous = baseline.get(mode, {}).get(group, {})
+            for name, stats in current.items():
+                if name not in previous:
+                    continue
+                before = previous[name]["median"]
+                after = stats["median"]
+                # мелочь в пару миллисекунд не считаем
+                if after > before * (1.0 + tolerance) and after - before > 5.0:
+                    regressions.append(f"{mode}/{name}: {before} → {after} мс")
+    return regressions
+
+
+def load_ms_from(args) -> dict:
+    return {"stt": args.stub_stt_ms, "tts": args.stub_tts_ms, "nlp": args.stub_llm_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного и тёплого запуска Power Voice")
+    parser.add_argument("--cold", type=int, default=5, help="число холодных запусков (новый процесс)")
+    parser.add_argument("--warm", type=int, default=5, help="число тёплых запусков (в одном процессе)")
+    parser.add_argument("--stub-stt-ms", type=float, default=0.0, help="имитация загрузки STT, мс")
+    parser.add_argument("--stub-tts-ms", type=float, default=0.0, help="имитация инициализации TTS, мс")
+    parser.add_argument("--stub-llm-ms", type=float, default=0.0, help="имитация загрузки LLM, мс")
+    parser.add_argument("--timeout", type=float, default=60.0, help="предел ожидания одного запуска, сек")
+    parser.add_argument("--target-ms", type=float, default=0.0, help="цель для медианы холодного запуска")
+    parser.add_argument("--target-mark", default="first_frame", help="по какой отметке проверять цель")
+    parser.add_argument("--baseline", help="предыдущий отчёт для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимый рост медианы (0.2 = 20%%)")
+    parser.add_argument("--out", default=os.path.join("logs", "startup_benchmark.json"))
+    parser.add_argument("--offscreen", action="store_true", help="без показа окон (QT_QPA_PLATFORM=offscreen)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    if args.child:
+        run_child(args)
+        return
+
+    cold = run_cold(args) if args.cold else []
+    warm = run_warm(args) if args.warm else []
+
+    result = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "stub_load_ms": load_ms_from(args),
+        "cold": summarize(cold) if cold else {},
+        "warm": summarize(warm) if warm else {},
+    }
+
+    failed = False
+    if args.target_ms and cold:
+        stats = result["cold"]["marks"].get(args.target_mark)
+        median = stats["median"] if stats else None
+        ok = median is not None and median <= args.target_ms
+        result["target"] = {"mark": args.target_mark, "target_ms": args.target_ms, "median_ms": median, "ok": ok}
+        print(f"{'✅' if ok else '❌'} cold {args.target_mark}: медиана {median} мс, цель {args.target_ms} мс")
+        failed = failed or not ok
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        result["regressions"] = regressions
+        for line in regressions:
+            print(f"⚠️ Регрессия {line}")
+        failed = failed or bool(regressions)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"📄 Отчёт: {args.out}")
+
+    # фоновые потоки окна (сеть) не держат процесс
+    sys.stdout.flush()
+    os._exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()